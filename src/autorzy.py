@@ -11,6 +11,7 @@ from openpyxl import load_workbook
 from wikibaseintegrator.wbi_config import config as wbi_config
 from wikidariahtools import format_date
 from wikidariahtools import element_search, gender_detector
+from wikidariahhttp import HTTP_SESSION, install as install_http
 
 
 # adresy
@@ -88,10 +89,10 @@ class Autor:
             self._alias = []
 
 
-def get_viaf_data(v_url: str) -> tuple:
+def get_viaf_data(v_url: str, session: requests.Session = HTTP_SESSION) -> tuple:
     """ get_viaf_data """
     v_id = v_birth = v_death = ''
-    response = requests.get(v_url + 'viaf.json')
+    response = session.get(v_url + 'viaf.json')
     result = response.json()
     if 'viafID' in result:
         v_id = result['viafID']
@@ -103,7 +104,7 @@ def get_viaf_data(v_url: str) -> tuple:
     return v_id, v_birth, v_death
 
 
-def viaf_search(name: str) -> tuple:
+def viaf_search(name: str, session: requests.Session = HTTP_SESSION) -> tuple:
     """ szukanie identyfikatora VIAF """
     info = id_url = birthDate = deathDate = ''
     result = False
@@ -114,7 +115,7 @@ def viaf_search(name: str) -> tuple:
         if WYJATKI[name].strip() == 'BRAK':
             return False, "NOT_FOUND", '', '', ''
 
-        info, birthDate, deathDate = get_viaf_data(WYJATKI[name])
+        info, birthDate, deathDate = get_viaf_data(WYJATKI[name], session)
         id_url = WYJATKI[name]
         VIAF_ID[name] = info
         if birthDate:
@@ -150,7 +151,7 @@ def viaf_search(name: str) -> tuple:
     sleep(0.05)
 
     try:
-        response = requests.get(adres)
+        response = session.get(adres)
         result = response.json()
         if 'records' in result['searchRetrieveResponse']:
             rekordy = result['searchRetrieveResponse']['records']
@@ -245,6 +246,9 @@ def load_wyjatki(path: str) -> dict:
 
 
 if __name__ == "__main__":
+    # wyszukiwanie w wikibase przez wspólną sesję HTTP
+    install_http()
+
     xlsx_path = Path('.').parent / 'data/autorzy.xlsx'
     uzup_path = Path('.').parent / 'data/autorzy_viaf_uzup.xlsx'
     output = Path('.').parent / 'out/autorzy.qs'
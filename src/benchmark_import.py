@@ -0,0 +1,167 @@
+""" benchmark importu property_import.py z lokalną atrapą API Wikibase """
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from wikidariahfake import FakeWikibase
+
+try:
+    import resource
+except ImportError:
+    # Windows - bez pomiaru pamięci
+    resource = None
+
+
+# skrypt importu i domyślne arkusze
+IMPORT_SCRIPT = Path(__file__).parent / "property_import.py"
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+# właściwości obecne w instancji Wikibase przed importem pierwszego arkusza
+# (BasicProp), dodawane do atrapy jeżeli nie podano migawki encji (--seed)
+BASIC_PROPERTIES = [("Wikidata ID", "external-id"), ("reference URL", "url")]
+
+# zmiana wyniku (w procentach) względem wyniku bazowego uznawana za istotną
+THRESHOLD = 5.0
+
+
+def peak_memory_mb() -> float:
+    """maksymalne zużycie pamięci (MB) procesów potomnych (importu)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux - kilobajty, macOS - bajty
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_import(workbooks: list, latency: float, workers: int, write: bool,
+               seed: list = None, keep: str = None) -> dict:
+    """import arkuszy w osobnym procesie (katalog roboczy z pustą pamięcią
+    podręczną) do nowej atrapy Wikibase, zwraca wyniki pomiaru
+    """
+    wikibase = FakeWikibase(latency=latency)
+    if seed:
+        wikibase.load(seed)
+    else:
+        for label, datatype in BASIC_PROPERTIES:
+            data = {"labels": {"en": {"language": "en", "value": label}}, "datatype": datatype}
+            wikibase.edit_entity({"new": "property", "data": json.dumps(data)})
+    url = wikibase.start()
+
+    work_dir = keep if keep else tempfile.mkdtemp(prefix="wikidariah-benchmark-")
+    Path(work_dir).mkdir(parents=True, exist_ok=True)
+    report_path = Path(work_dir) / "import_report.json"
+    log_path = Path(work_dir) / "import.log"
+    command = [sys.executable, str(IMPORT_SCRIPT.resolve())]
+    command += [str(Path(x).resolve()) for x in workbooks]
+    command += ["--report", str(report_path), "--changeset", str(Path(work_dir) / "changeset.json")]
+    env = dict(os.environ, WIKIDARIAH_URL=url, WIKIDARIAH_WORKERS=str(workers),
+               WIKIDARIAH_WRITE="1" if write else "0")
+
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.run(command, cwd=work_dir, env=env, stdout=log,
+                                 stderr=subprocess.STDOUT, check=False)
+    elapsed = time.perf_counter() - start
+    wikibase.stop()
+
+    report = {}
+    if report_path.is_file():
+        with open(report_path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+    total = report.get("total", {})
+    processed = total.get("done", 0) + total.get("errors", 0)
+    requests = sum(wikibase.requests.values())
+
+    return {
+        "latency": latency,
+        "workers": workers,
+        "write": write,
+        "exit_code": process.returncode,
+        "rows": total.get("rows", 0),
+        "processed": processed,
+        "time": round(elapsed, 2),
+        "rows_per_second": round(processed / elapsed, 2) if elapsed else None,
+        "requests": requests,
+        "requests_per_row": round(requests / processed, 2) if processed else None,
+        "requests_by_kind": dict(wikibase.requests),
+        "bytes_sent": wikibase.bytes_sent,
+        "bytes_received": wikibase.bytes_received,
+        "entities": len(wikibase.entities),
+        "peak_memory_mb": peak_memory_mb(),
+        "phases": report.get("stats", {}).get("phases", {}),
+        "log": str(log_path),
+    }
+
+
+def compare(result: dict, baseline: dict) -> list:
+    """porównanie z wynikiem bazowym: (miara, wynik, bazowo, zmiana w %)"""
+    output = []
+    for key in ("rows_per_second", "requests_per_row", "peak_memory_mb", "time"):
+        value, base = result.get(key), baseline.get(key)
+        if value is None or not base:
+            continue
+        output.append((key, value, base, round((value - base) / base * 100, 1)))
+
+    return output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="benchmark importu arkuszy (property_import.py) z lokalną atrapą API Wikibase"
+    )
+    parser.add_argument(
+        "filename",
+        nargs="*",
+        help="pliki xlsx lub katalogi z plikami xlsx (domyślnie: data/*.xlsx)",
+    )
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="opóźnienie odpowiedzi atrapy API w sekundach (domyślnie 0.02)")
+    parser.add_argument("--workers", type=int, default=4, help="liczba wątków importu")
+    parser.add_argument("--write", action="store_true",
+                        help="import z zapisem (wbeditentity, wbsetqualifier, wbsetreference) do atrapy")
+    parser.add_argument("--seed", help="encje początkowe atrapy - migawka (cache/snapshot.json)")
+    parser.add_argument("--repeat", type=int, default=1, help="liczba powtórzeń (wynik - najszybszy)")
+    parser.add_argument("--output", default="benchmark.json", help="plik json z wynikiem")
+    parser.add_argument("--baseline", help="plik json z wynikiem bazowym do porównania")
+    parser.add_argument("--keep", help="katalog roboczy importu (domyślnie katalog tymczasowy)")
+    args = parser.parse_args()
+
+    workbooks = [Path(x) for x in args.filename] if args.filename else [DATA_DIR]
+    seed_entities = []
+    if args.seed:
+        with open(args.seed, "r", encoding="utf-8") as f:
+            seed_entities = list(json.load(f).get("entities", {}).values())
+
+    results = []
+    for i in range(args.repeat):
+        # każdy przebieg z pustą pamięcią podręczną (osobny katalog roboczy)
+        keep_dir = str(Path(args.keep) / f"run{i + 1}") if args.keep else None
+        result = run_import(workbooks, args.latency, args.workers, args.write,
+                            seed_entities, keep_dir)
+        results.append(result)
+        print(
+            f"BENCHMARK: przebieg {i + 1}/{args.repeat}: wiersze: {result['processed']}, "
+            f"czas: {result['time']} s, wiersze/s: {result['rows_per_second']}, "
+            f"zapytania/wiersz: {result['requests_per_row']}, pamięć: {result['peak_memory_mb']} MB"
+        )
+        if result["exit_code"] not in (0, 1):
+            print(f"ERROR: import zakończony błędem ({result['exit_code']}), log: {result['log']}")
+
+    best = min(results, key=lambda x: x["time"])
+    print(f"BENCHMARK: zapytania: {best['requests_by_kind']}")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"workbooks": [str(x) for x in workbooks], "result": best, "runs": results},
+                  f, ensure_ascii=False, indent=1)
+    print(f"BENCHMARK: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline_result = json.load(f)["result"]
+        for key, value, base, change in compare(best, baseline_result):
+            mark = "" if abs(change) < THRESHOLD else " !"
+            print(f"BENCHMARK: {key}: {value} (bazowo: {base}, zmiana: {change:+.1f}%){mark}")
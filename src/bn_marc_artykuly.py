@@ -10,6 +10,8 @@ from wikibaseintegrator import wbi_core
 from wikibaseintegrator.wbi_config import config as wbi_config
 from wikibaseintegrator import wbi_login, wbi_datatype
 from dotenv import load_dotenv
+from wikidariahrate import RATE_LIMITER
+from wikidariahhttp import configure_session, install as install_http
 
 
 Q_TEST = 'Q79111'
@@ -253,7 +255,11 @@ if __name__ == '__main__':
     BOT_LOGIN = os.environ.get('WIKIDARIAH_USER')
     BOT_PASSWORD = os.environ.get('WIKIDARIAH_PWD')
 
+    install_http()
     login_instance = wbi_login.Login(user=BOT_LOGIN, pwd=BOT_PASSWORD)
+    configure_session(login_instance.session)
+    # zapisy w tempie dostosowywanym do obciążenia serwera (maxlag, Retry-After)
+    RATE_LIMITER.install(login_instance.session)
     file_marc = Path('.').parent / 'data/bibs-artykul.marc'
 
     with open(file_marc, 'rb') as fh:
@@ -321,7 +327,7 @@ if __name__ == '__main__':
                 wd_item.set_description('publication (article)', lang='en')
 
                 new_id = wd_item.write(login_instance, bot_account=True, entity_type='item', retry_after=20)
-                print(new_id)
+                print(f'{new_id} (tempo: {RATE_LIMITER.rate:.2f} zapytań/s)')
                 #print(label)
 
                 # tylko 100 pierwszych z dziedziny historia
@@ -330,3 +336,4 @@ if __name__ == '__main__':
 
         end = time.time()
         print(f'\nDodawanie bibliografii zakończone, czas: {end - start} s.')
+        print(f'Zapytania: {RATE_LIMITER.stats()}')
@@ -6,10 +6,9 @@ from pathlib import Path
 from wikibaseintegrator.wbi_config import config as wbi_config
 from wikibaseintegrator import wbi_login
 from wikibaseintegrator import wbi_core
-from wikibaseintegrator.wbi_functions import mediawiki_api_call_helper
 from wikibaseintegrator.wbi_exceptions import (MWApiError)
 from dotenv import load_dotenv
-from wikidariahtools import element_exists
+from wikidariahtools import element_exists, write_api_call
 
 # adresy
 wbi_config['MEDIAWIKI_API_URL'] = 'https://prunus-208.man.poznan.pl/api.php'
@@ -21,31 +20,7 @@ wbi_config['WIKIBASE_URL'] = 'https://prunus-208.man.poznan.pl'
 #wbi_config['DISTINCT_VALUES_CONSTRAINT_QID'] = 'Qxxx'
 
 
-def get_token(my_login) -> str:
-    """ zwraca token lub pusty string """
-    result = ''
-
-    token_params = {"action": "query",
-                    "meta": "tokens"}
-
-    try:
-        token_results = mediawiki_api_call_helper(
-            data=token_params,
-            login=my_login,
-            mediawiki_api_url=None,
-            user_agent=None,
-            allow_anonymous=False,
-        )
-
-        result = token_results["query"]["tokens"]["csrftoken"]
-
-    except MWApiError as wb_get_token_error:
-        print("Error (remove reference - token):", wb_get_token_error)
-
-    return result
-
-
-def add_reference(my_login, p_token: str, p_claim_id: str, prop_nr: str, prop_value: str) -> bool:
+def add_reference(my_login, p_claim_id: str, prop_nr: str, prop_value: str) -> bool:
     """dodaje odnośnik do deklaracji"""
     add_result = False
 
@@ -65,18 +40,11 @@ def add_reference(my_login, p_token: str, p_claim_id: str, prop_nr: str, prop_va
         "action": "wbsetreference",
         "statement": p_claim_id,
         "snaks": snak_encoded,
-        "token": p_token,
         "bot": True,
     }
 
     try:
-        results = mediawiki_api_call_helper(
-            data=params,
-            login=my_login,
-            mediawiki_api_url=None,
-            user_agent=None,
-            allow_anonymous=False,
-        )
+        results = write_api_call(params, my_login)
         if results["success"] == 1:
             add_result = True
     except MWApiError as wbsetreference_error:
@@ -136,11 +104,8 @@ if __name__ == "__main__":
 
                 # jeżeli nie istnieje to dodaje
                 if not reference_exists:
-                    # token
-                    token = get_token(login_data)
-                    
-                    # dołączanie referencji
-                    is_ok = add_reference(login_data, token, claim_id, g_ref_qid, g_ref_value)
+                    # dołączanie referencji (token CSRF sesji jest pobierany raz)
+                    is_ok = add_reference(login_data, claim_id, g_ref_qid, g_ref_value)
 
                     if is_ok:
                         print(f'Dodano referencję: {g_ref_qid} ({g_ref_value}) do deklaracji {statement_prop} ({statement_value})')
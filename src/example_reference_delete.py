@@ -5,10 +5,9 @@ from pathlib import Path
 from wikibaseintegrator.wbi_config import config as wbi_config
 from wikibaseintegrator import wbi_login
 from wikibaseintegrator import wbi_core
-from wikibaseintegrator.wbi_functions import mediawiki_api_call_helper
 from wikibaseintegrator.wbi_exceptions import (MWApiError)
 from dotenv import load_dotenv
-from wikidariahtools import element_exists
+from wikidariahtools import element_exists, write_api_call
 
 # adresy
 wbi_config['MEDIAWIKI_API_URL'] = 'https://prunus-208.man.poznan.pl/api.php'
@@ -20,31 +19,7 @@ wbi_config['WIKIBASE_URL'] = 'https://prunus-208.man.poznan.pl'
 #wbi_config['DISTINCT_VALUES_CONSTRAINT_QID'] = 'Qxxx'
 
 
-def get_token(my_login) -> str:
-    """ zwraca token lub pusty string """
-    result = ''
-
-    token_params = {"action": "query",
-                    "meta": "tokens"}
-
-    try:
-        token_results = mediawiki_api_call_helper(
-            data=token_params,
-            login=my_login,
-            mediawiki_api_url=None,
-            user_agent=None,
-            allow_anonymous=False,
-        )
-
-        result = token_results["query"]["tokens"]["csrftoken"]
-
-    except MWApiError as wb_get_token_error:
-        print("Error (remove reference - token):", wb_get_token_error)
-
-    return result
-
-
-def delete_reference(par_claim_id, par_reference_hash, par_token) -> bool:
+def delete_reference(par_claim_id, par_reference_hash) -> bool:
     """ usuwanie referencji """
     result = False
 
@@ -52,18 +27,11 @@ def delete_reference(par_claim_id, par_reference_hash, par_token) -> bool:
                 "action": "wbremovereferences",
                 "statement": par_claim_id,
                 "references": par_reference_hash,
-                "token": par_token,
                 "bot": True,
             }
 
     try:
-        p_results = mediawiki_api_call_helper(
-            data=p_params,
-            login=login_data,
-            mediawiki_api_url=None,
-            user_agent=None,
-            allow_anonymous=False,
-        )
+        p_results = write_api_call(p_params, login_data)
 
         if p_results["success"] == 1:
             result = True
@@ -108,9 +76,8 @@ if __name__ == "__main__":
                 if (stat_ref_qid == g_ref_qid and stat_ref_value == g_ref_value):
                     reference_hash = t_ref_blok[0].get_hash()
 
-                    # token
-                    token = get_token(login_data)
-                    is_deleted = delete_reference(claim_id, reference_hash, token)
+                    # token CSRF sesji jest pobierany raz i odświeżany tylko po błędzie 'badtoken'
+                    is_deleted = delete_reference(claim_id, reference_hash)
 
                     if is_deleted:
                         print(f'Usunięto referencję: {g_ref_qid} ({g_ref_value}) z deklaracji {statement_prop} ({statement_value})')
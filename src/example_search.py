@@ -8,6 +8,7 @@ from wikibaseintegrator.wbi_exceptions import (MWApiError)
 # do odczytywania danych z naszej wikibase nie trzeba się logować
 #from wikibaseintegrator import wbi_login
 from wikidariahtools import element_exists, element_search, search_by_purl
+from wikidariahhttp import install as install_http
 
 # adresy
 wbi_config['MEDIAWIKI_API_URL'] = 'https://prunus-208.man.poznan.pl/api.php'
@@ -22,6 +23,10 @@ def test():
     print('TEST')
 
 if __name__ == "__main__":
+    # zapytania przez wspólną sesję HTTP (także nagrywanie i odtwarzanie
+    # z kasety - zmienna WIKIDARIAH_CASSETTE)
+    install_http()
+
     # pobieranie wskazanego elementu - tu Q30 (Kazimierz Jagiellończyk)
     # i właściwości P152 (painting style)
     try:
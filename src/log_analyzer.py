@@ -0,0 +1,220 @@
+""" analiza dziennika zdarzeń importu (jsonl, wikidariahlog): zestawienie
+    wg arkuszy, akcji API i rodzajów błędów
+"""
+
+import argparse
+import gzip
+import json
+import re
+import sys
+from collections import Counter, defaultdict
+from wikidariahlog import LEVELS, message_level
+
+
+# liczba pozycji w zestawieniach (rodzaje błędów, najwolniejsze wiersze)
+TOP = 15
+
+# zmienne fragmenty komunikatów błędów (rodzaj błędu - komunikat bez nich)
+ERROR_PATTERNS = [
+    (re.compile(r"->.*"), "-> …"),
+    (re.compile(r"(item|property): .*, NOT FOUND"), r"\1: …, NOT FOUND"),
+    (re.compile(r"\([^)]*\)"), "(…)"),
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "'…'"),
+    (re.compile(r"\b[PQL]\d+\b"), "#ID"),
+    (re.compile(r"https?://\S+"), "URL"),
+    (re.compile(r"\d+"), "#"),
+]
+
+
+def error_type(text: str) -> str:
+    """rodzaj błędu: komunikat bez wartości, identyfikatorów i liczb"""
+    for pattern, replacement in ERROR_PATTERNS:
+        text = pattern.sub(replacement, text)
+
+    return text.strip().lower()[:120]
+
+
+def read_events(path: str):
+    """kolejne zdarzenia z pliku jsonl (także .gz), bez wczytywania całego pliku"""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # niepełna linia (przerwany zapis)
+                continue
+
+
+class LogAnalyzer:
+    """Zestawienie zdarzeń dziennika: liczba zdarzeń wg poziomu, wiersze
+    arkuszy (wynik ostatniego zdarzenia wiersza, czas, zapytania API),
+    zapytania API wg akcji (liczba, błędy, czas), błędy wg rodzaju
+    """
+
+    def __init__(self, sheet: str = None, file: str = None):
+        self.sheet = sheet
+        self.file = file
+        self.events = 0
+        self.levels = Counter()
+        self.rows = {}
+        self.row_time = defaultdict(float)
+        self.row_calls = Counter()
+        self.row_count = Counter()
+        self.actions = defaultdict(lambda: {"calls": 0, "errors": 0, "time": 0.0, "max": 0.0})
+        self.errors = Counter()
+        self.error_examples = {}
+        self.slow_rows = []
+
+    def add(self, event: dict) -> bool:
+        """uwzględnienie zdarzenia w zestawieniu, False - zdarzenie pominięte
+        (inny arkusz lub plik)
+        """
+        if self.sheet and event.get("sheet") != self.sheet:
+            return False
+        if self.file and self.file not in str(event.get("file", "")):
+            return False
+
+        self.events += 1
+        self.levels[event.get("level")] += 1
+        kind = event.get("event")
+        if kind == "row":
+            self.add_row(event)
+        elif kind == "api":
+            action = self.actions[event.get("action", "?")]
+            elapsed = event.get("elapsed") or 0.0
+            action["calls"] += 1
+            action["time"] += elapsed
+            action["max"] = max(action["max"], elapsed)
+            if event.get("level") != "debug":
+                action["errors"] += 1
+        elif kind == "message" and event.get("level") == "error":
+            self.add_error(event.get("message", ""), event)
+
+        return True
+
+    def add_row(self, event: dict):
+        """zdarzenie wiersza arkusza (wiersze zapisywane zbiorczo mają
+        dwa zdarzenia - wynikiem jest ostatnie)
+        """
+        sheet = event.get("sheet", "-")
+        self.rows[(event.get("file"), event.get("row"))] = (sheet, event.get("outcome"))
+        if event.get("committed"):
+            return
+        elapsed = event.get("elapsed") or 0.0
+        self.row_count[sheet] += 1
+        self.row_time[sheet] += elapsed
+        self.row_calls[sheet] += sum((event.get("calls") or {}).values())
+        self.slow_rows.append((elapsed, sheet, event.get("name")))
+        if len(self.slow_rows) > TOP * 10:
+            self.slow_rows = sorted(self.slow_rows, key=lambda x: -x[0])[:TOP]
+        if event.get("error"):
+            self.add_error(f"wyjątek {event['error']}", event)
+        elif event.get("outcome") == "error" and event.get("message"):
+            # komunikaty z prefiksem ERROR są już uwzględnione jako zdarzenia
+            # message, pozostałe (np. 'False INVALID DATA, ...') - tylko tu
+            if message_level(event["message"]) != "error":
+                self.add_error(event["message"], event)
+
+    def add_error(self, message: str, event: dict):
+        """błąd wg rodzaju (z przykładem)"""
+        error = error_type(message.split("ERROR:", 1)[-1])
+        self.errors[error] += 1
+        if error not in self.error_examples:
+            self.error_examples[error] = {
+                "message": message.strip()[:300],
+                "sheet": event.get("sheet"),
+                "name": event.get("name"),
+            }
+
+    def report(self) -> dict:
+        """zestawienie jako słownik"""
+        outcomes = defaultdict(Counter)
+        for sheet, outcome in self.rows.values():
+            outcomes[sheet][outcome] += 1
+        actions = sorted(self.actions.items(), key=lambda x: -x[1]["time"])
+
+        return {
+            "events": self.events,
+            "levels": dict(self.levels),
+            "sheets": {
+                sheet: {
+                    "rows": sum(outcomes[sheet].values()),
+                    "outcomes": dict(outcomes[sheet]),
+                    "time": round(self.row_time[sheet], 3),
+                    "avg_time": round(self.row_time[sheet] / count, 4) if count else None,
+                    "calls_per_row": round(self.row_calls[sheet] / count, 2) if count else None,
+                }
+                for sheet, count in sorted(self.row_count.items())
+            },
+            "actions": {
+                name: {
+                    "calls": action["calls"],
+                    "errors": action["errors"],
+                    "time": round(action["time"], 3),
+                    "avg_time": round(action["time"] / action["calls"], 4),
+                    "max_time": round(action["max"], 4),
+                }
+                for name, action in actions
+            },
+            "errors": [
+                {"type": error, "count": count, **self.error_examples[error]}
+                for error, count in self.errors.most_common(TOP)
+            ],
+            "slow_rows": [
+                {"time": round(elapsed, 3), "sheet": sheet, "name": name}
+                for elapsed, sheet, name in sorted(self.slow_rows, key=lambda x: -x[0])[:TOP]
+            ],
+        }
+
+
+def print_report(report: dict):
+    """zestawienie na ekranie"""
+    levels = ", ".join(f"{level}: {report['levels'].get(level, 0)}" for level in LEVELS)
+    print(f"ZDARZENIA: {report['events']} ({levels})")
+    for sheet, row in report["sheets"].items():
+        outcomes = ", ".join(f"{key}: {value}" for key, value in sorted(row["outcomes"].items()))
+        print(
+            f"ARKUSZ: {sheet}: wiersze: {row['rows']} ({outcomes}), czas: {row['time']:.2f} s, "
+            f"średnio: {row['avg_time'] * 1000:.1f} ms, zapytania/wiersz: {row['calls_per_row']}"
+        )
+    for name, action in report["actions"].items():
+        print(
+            f"AKCJA: {name}: zapytania: {action['calls']}, błędy: {action['errors']}, "
+            f"czas: {action['time']:.2f} s, średnio: {action['avg_time'] * 1000:.1f} ms, "
+            f"maks.: {action['max_time'] * 1000:.1f} ms"
+        )
+    for error in report["errors"]:
+        print(f"BŁĄD: {error['count']} x {error['type']}")
+        print(f"      np. {error['sheet']}: {error['message']}")
+    for row in report["slow_rows"][:5]:
+        print(f"WIERSZ: {row['time']:.2f} s, {row['sheet']}: {row['name']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="zestawienie dziennika zdarzeń importu (property_import.py --log)"
+    )
+    parser.add_argument("filename", nargs="+", help="pliki dziennika jsonl (także .gz)")
+    parser.add_argument("--sheet", help="tylko zdarzenia arkusza (np. Q_statements)")
+    parser.add_argument("--file", help="tylko zdarzenia importowanego pliku (fragment nazwy)")
+    parser.add_argument("--level", choices=list(LEVELS), help="wyświetla zdarzenia o poziomie co najmniej level")
+    parser.add_argument("--json", help="zapis zestawienia w pliku json")
+    args = parser.parse_args()
+
+    analyzer = LogAnalyzer(sheet=args.sheet, file=args.file)
+    for log_path in args.filename:
+        for log_event in read_events(log_path):
+            if not analyzer.add(log_event):
+                continue
+            if args.level and LEVELS.get(log_event.get("level"), 0) >= LEVELS[args.level]:
+                print(json.dumps(log_event, ensure_ascii=False))
+
+    log_report = analyzer.report()
+    print_report(log_report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(log_report, f, ensure_ascii=False, indent=1)
+        print(f"REPORT: {args.json}")
+    if not analyzer.events:
+        sys.exit(1)
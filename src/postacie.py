@@ -15,6 +15,8 @@ from postacietools import DateBDF, FigureName, ustal_etykiete_biogramu, load_wyj
 from postacietools import diff_date, get_years
 from wikidariahtools import element_search, gender_detector
 from wikidariahtools import get_last_nawias
+from wikidariahhttp import HTTP_SESSION, install as install_http
+from wikidariahasync import element_search_many
 
 
 # adresy
@@ -84,6 +86,20 @@ def biogram_qid(value: str, offline: bool=False) -> str:
     return qid
 
 
+def biogram_qid_many(values: list, offline: bool=False):
+    """ wyszukuje równolegle w wikibase biogramy dla listy etykiet biogramów
+        nieobecnych w słowniku, znalezione trafiają do słownika BIOGRAMY
+    """
+    values = [value for value in dict.fromkeys(values) if value not in BIOGRAMY]
+    if offline or not values:
+        return
+
+    results = element_search_many([(value, 'item', 'pl', {}) for value in values])
+    for value, (znaleziono, qid) in zip(values, results):
+        if znaleziono:
+            BIOGRAMY[value] = qid
+
+
 def given_name_qid(value: str, gender_first:str = '', offline: bool=False) -> str:
     """ wyszukuje Q w wikibase dla podanego imienia, najpierw sprawdzając słownik,
         jeżeli brak w słowniku szuka online w wikibase i w razie powidzenia
@@ -178,7 +194,23 @@ def postac_qid(value: str, description: str='', offline=False) -> str:
     return 'LAST'
 
 
-def get_viaf_data(v_url: str) -> tuple:
+def postac_qid_many(values: list, offline: bool=False):
+    """ wyszukuje równolegle w wikibase postacie dla listy par (etykieta, opis)
+        nieobecnych w słowniku, znalezione trafiają do słownika POSTACIE
+    """
+    values = [value for value in dict.fromkeys(values) if f'{value[0]}|{value[1]}' not in POSTACIE]
+    if offline or not values:
+        return
+
+    results = element_search_many([(value, 'item', 'pl', {'description': description})
+                                   for value, description in values])
+    for (value, description), (znaleziono, qid) in zip(values, results):
+        if znaleziono:
+            print('INFO:', value, 'jest już w wikibase:', qid)
+            POSTACIE[f'{value}|{description}'] = qid
+
+
+def get_viaf_data(v_url: str, session: requests.Session = HTTP_SESSION) -> tuple:
     """ get_viaf_data  - pobiera dane ze znanego adresu identyfikatora
         viaf dla osoby
         v_url - adres VIAF id dla osoby
@@ -186,7 +218,7 @@ def get_viaf_data(v_url: str) -> tuple:
     v_id = v_birth = v_death = ''
     if not v_url.endswith('/'):
         v_url += '/'
-    response = requests.get(v_url + 'viaf.json')
+    response = session.get(v_url + 'viaf.json')
     result = response.json()
     if 'viafID' in result:
         v_id = result['viafID']
@@ -199,7 +231,7 @@ def get_viaf_data(v_url: str) -> tuple:
 
 
 def viaf_search(person_name: str, s_birth: str = '', s_death: str = '',
-                offline: bool = False) -> tuple:
+                offline: bool = False, session: requests.Session = HTTP_SESSION) -> tuple:
     """ szukanie identyfikatora VIAF na podstawie nazwy osoby (imię nazwisko
         przydomek itp) oraz dodatkowo daty urodzenia i śmierci osoby jeżeli
         była wcześniej znana.
@@ -215,7 +247,7 @@ def viaf_search(person_name: str, s_birth: str = '', s_death: str = '',
         if VIAF_WYJATKI[person_name].strip() == 'BRAK':
             return False, "NOT_FOUND", '', '', ''
 
-        info, birthDate, deathDate = get_viaf_data(VIAF_WYJATKI[person_name])
+        info, birthDate, deathDate = get_viaf_data(VIAF_WYJATKI[person_name], session)
         id_url = VIAF_WYJATKI[person_name]
         VIAF_ID[person_name] = info
         if birthDate:
@@ -259,7 +291,7 @@ def viaf_search(person_name: str, s_birth: str = '', s_death: str = '',
     sleep(0.03)
 
     try:
-        response = requests.get(adres)
+        response = session.get(adres)
         result = response.json()
         if 'records' in result['searchRetrieveResponse']:
             rekordy = result['searchRetrieveResponse']['records']
@@ -340,6 +372,9 @@ def viaf_search(person_name: str, s_birth: str = '', s_death: str = '',
 
 
 if __name__ == "__main__":
+    # wyszukiwanie w wikibase przez wspólną sesję HTTP
+    install_http()
+
     file_path = Path('.').parent / 'data/lista_hasel_PSB_2020.txt'
     uzup_path = Path('.').parent / 'data/postacie_viaf_uzup.xlsx'
     lista_imion_path = Path('.').parent / 'data/imiona_all.txt'
@@ -407,6 +442,21 @@ if __name__ == "__main__":
         lines = f.readlines()
         LISTA_NAZWISK = [nazwisko.strip() for nazwisko in lines]
 
+    # wyszukiwanie zbiorcze (równoległe) biogramów i postaci w Wikibase,
+    # pętla główna korzysta później ze słowników BIOGRAMY i POSTACIE
+    if not OFFLINE:
+        etykiety = []
+        postacie_opisy = []
+        for line in indeks:
+            nawias, title_stop = get_last_nawias(line)
+            title = line[:title_stop].strip()
+            etykiety.append(ustal_etykiete_biogramu(nawias, title))
+            years = get_years(title)
+            name = title.replace(years, '').replace('()','').strip()
+            postacie_opisy.append((FigureName(name).name_etykieta, '('+years+')'))
+        biogram_qid_many(etykiety)
+        postac_qid_many(postacie_opisy)
+
     # otwierane są trzy pliki, główny z quickstatements dla nowych postaci, uzupełniający
     # z dodatkowymi wpisami dla dat określonych jako 'somevalue', które muszą zostać
     # dodane w drugim przebiegu ze względu na błąd w QS, trzeci z danymi aktualizacyjnymi
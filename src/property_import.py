@@ -2,24 +2,46 @@
 
 import os
 import sys
+import argparse
+import copy
+import glob
 import re
 import json
+import pickle
+import heapq
+import functools
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Union
 from openpyxl import load_workbook
 from wikibaseintegrator import wbi_core
 from wikibaseintegrator.wbi_config import config as wbi_config
 from wikibaseintegrator import wbi_login, wbi_datatype
-from wikibaseintegrator.wbi_functions import mediawiki_api_call_helper
 from wikibaseintegrator.wbi_exceptions import MWApiError
 from dotenv import load_dotenv
-from wikidariahtools import element_search, search_by_purl
-
-
-# adresy dla API Wikibase
-wbi_config["MEDIAWIKI_API_URL"] = "https://prunus-208.man.poznan.pl/api.php"
-wbi_config["SPARQL_ENDPOINT_URL"] = "https://prunus-208.man.poznan.pl/bigdata/sparql"
-wbi_config["WIKIBASE_URL"] = "https://prunus-208.man.poznan.pl"
+from wikidariahtools import element_search, write_api_call
+from wikidariahcache import ENTITY_CACHE, LABEL_CACHE, PROPERTY_TYPES, PURL_INDEX, LABEL_INDEX
+from wikidariahcache import CACHE_DIR, SNAPSHOT_PATH, save_snapshot, load_snapshot, set_offline
+from wikidariahcache import value_key
+from wikidariahchangeset import CHANGESET
+from wikidariahrate import RATE_LIMITER
+from wikidariahhttp import configure_session, install as install_http
+from wikidariahasync import element_search_many, load_entities
+from wikidariahstats import STATS
+from wikidariahlog import EVENT_LOG, LEVELS
+
+
+# adresy dla API Wikibase (adres instancji można zmienić zmienną środowiskową
+# WIKIDARIAH_URL, np. lokalna atrapa API w benchmark_import.py)
+WIKIBASE_URL = os.environ.get("WIKIDARIAH_URL", "https://prunus-208.man.poznan.pl")
+wbi_config["MEDIAWIKI_API_URL"] = f"{WIKIBASE_URL}/api.php"
+wbi_config["SPARQL_ENDPOINT_URL"] = f"{WIKIBASE_URL}/bigdata/sparql"
+wbi_config["WIKIBASE_URL"] = WIKIBASE_URL
 
 # słownik globalnych referencji dla arkuszy (z deklaracjami)
 GLOBAL_REFERENCE = {}
@@ -27,9 +49,46 @@ GLOBAL_REFERENCE = {}
 GLOBAL_PROPERTY = {}
 GLOBAL_ITEM = {}
 
-# parametr globalny czy zapisywać dane do wikibase, jeżeli = False dla nowych
-# właściwości i elementów zwraca QID = TEST
-WIKIBASE_WRITE = False
+# parametr globalny czy zapisywać dane do wikibase, jeżeli = False zmiany
+# trafiają do zestawienia zmian (CHANGESET, plik json), a nowe właściwości
+# i elementy otrzymują tymczasowe identyfikatory (można włączyć zmienną
+# środowiskową WIKIDARIAH_WRITE=1)
+WIKIBASE_WRITE = os.environ.get("WIKIDARIAH_WRITE") == "1"
+
+# parametr globalny czy zmiany elementów z arkusza Q_statements (deklaracje,
+# kwalifikatory, referencje, etykiety, opisy, aliasy) łączyć w jeden zapis
+# (wbeditentity) dla każdego elementu
+COALESCE_EDITS = True
+# zmiany oczekujące na zapis: id encji -> WDHEntityEdit
+PENDING_EDITS = {}
+PENDING_EDITS_LOCK = threading.Lock()
+
+# liczba wątków przetwarzających równolegle wiersze arkuszy Q_list i Q_statements
+# (można zmienić zmienną środowiskową WIKIDARIAH_WORKERS, 1 - przetwarzanie
+# sekwencyjne)
+WORKERS = 4
+
+# parametr globalny czy przed zapisami pobierać zbiorczo wszystkie encje,
+# do których odwołują się arkusze
+PREFETCH = True
+
+# parametr globalny czy pomijać wiersze niezmienione od ostatniego importu
+# (odciski wierszy w cache/fingerprints, encje wiersza w tej samej rewizji)
+SKIP_UNCHANGED = True
+
+# parametr globalny czy zapamiętywać wynik odczytu arkusza (listy wierszy)
+# w pamięci podręcznej, klucz: skrót zawartości pliku; wersję należy zmienić
+# przy każdej zmianie sposobu odczytu arkuszy (metody get_*)
+WORKBOOK_CACHE = True
+WORKBOOK_CACHE_VERSION = 1
+
+# parametr globalny czy na początku pracy pobierać indeks etykiet wszystkich
+# właściwości i elementów strukturalnych (wyszukiwanie w find_name_qid)
+USE_LABEL_INDEX = True
+
+# parametr globalny czy na początku pracy pobierać wszystkie identyfikatory
+# purl (stronicowane zapytanie SPARQL), jeżeli nie - tylko użyte w arkuszach
+PURL_INDEX_FULL = True
 
 # --- klasy ---
 class BasicProp:
@@ -57,7 +116,10 @@ class BasicProp:
 
 
 class WDHSpreadsheet:
-    """Plik arkusza kalkulacyjnego z modelem danych dla Wikibase"""
+    """Plik arkusza kalkulacyjnego z modelem danych dla Wikibase, odczytywany
+    strumieniowo (tryb read-only openpyxl): z nagłówka tylko nazwy kolumn,
+    wiersze danych przekazywane kolejno do metod get_*
+    """
 
     def __init__(self, path: str):
         self.path = path
@@ -88,7 +150,7 @@ class WDHSpreadsheet:
         """odczyt pliku i weryfikacja poprawności"""
         try:
             self.workbook = load_workbook(
-                self.path, data_only=True
+                self.path, read_only=True, data_only=True
             )  # czytanie wartości a nie formuł (?)
         except IOError:
             print(f"ERROR. Can't open and process file: {self.path}")
@@ -180,15 +242,91 @@ class WDHSpreadsheet:
         return res, ",".join(missing_cols)
 
     def get_col_names(self, sheet) -> dict:
-        """funkcja zwraca słownik nazw kolumn"""
+        """funkcja zwraca słownik nazw kolumn (odczyt tylko wiersza nagłówka)"""
+        # wymiary zapisane w pliku bywają nieaktualne - w trybie read-only
+        # obcinałyby odczytywane wiersze
+        sheet.reset_dimensions()
+        header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
         names = {}
-        nr_col = 0
-        for column in sheet.iter_cols(1, sheet.max_column):
-            names[column[0].value] = nr_col
-            nr_col += 1
+        for nr_col, name in enumerate(header):
+            names[name] = nr_col
 
         return names
 
+    def iter_rows(self, sheet, columns: dict):
+        """generator wierszy danych arkusza (bez nagłówka) - krotki wartości,
+        krótsze wiersze uzupełniane do liczby kolumn nagłówka, puste wiersze
+        (arkusze bywają sformatowane do ostatniego wiersza) są pomijane
+        """
+        width = max(columns.values()) + 1 if columns else 0
+        for values in sheet.iter_rows(min_row=2, values_only=True):
+            if not values or all(value is None for value in values):
+                continue
+            if len(values) < width:
+                values += (None,) * (width - len(values))
+            yield values
+
+    def close(self):
+        """zamknięcie pliku (w trybie read-only plik pozostaje otwarty)"""
+        if self.workbook is not None:
+            self.workbook.close()
+
+    def read(self) -> tuple:
+        """odczyt pliku: globalne referencje oraz listy właściwości, deklaracji
+        właściwości, elementów i deklaracji elementów; wynik odczytu jest
+        zapamiętywany w pliku pamięci podręcznej (pickle), kolejny odczyt
+        niezmienionego pliku nie wymaga analizy arkuszy
+        """
+        try:
+            with open(self.path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+        except IOError:
+            print(f"ERROR. Can't open and process file: {self.path}")
+            sys.exit(1)
+        cache_dir = CACHE_DIR / "workbooks"
+        # nazwa: plik (skrót pełnej ścieżki - pliki o tej samej nazwie
+        # w różnych katalogach), wersja odczytu, skrót zawartości
+        stem = Path(self.path).stem
+        path_digest = hashlib.sha256(str(Path(self.path).resolve()).encode("utf-8")).hexdigest()[:8]
+        prefix = f"{stem}_{path_digest}_"
+        cache_path = cache_dir / f"{prefix}{WORKBOOK_CACHE_VERSION}_{digest[:16]}.pickle"
+
+        # globalne referencje dotyczą tylko odczytywanego pliku
+        GLOBAL_REFERENCE.clear()
+        if WORKBOOK_CACHE and cache_path.is_file():
+            try:
+                with open(cache_path, "rb") as f:
+                    cached = pickle.load(f)
+                GLOBAL_REFERENCE.update(cached["globals"])
+                return cached["lists"]
+            except (pickle.UnpicklingError, AttributeError, EOFError, KeyError) as cache_error:
+                print(f"ERROR: pominięto pamięć podręczną arkusza {cache_path}: {cache_error}")
+
+        self.open()
+        self.get_global()
+        lists = (
+            self.get_property_list(),
+            self.get_statement_list(),
+            self.get_item_list(),
+            self.get_item_statement_list(),
+        )
+        self.close()
+
+        if WORKBOOK_CACHE:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            # poprzednie wersje tego pliku (nie pliki o nazwie z tym samym początkiem)
+            for old_path in cache_dir.glob(f"{glob.escape(prefix)}*.pickle"):
+                if re.fullmatch(r"\d+_[0-9a-f]{16}\.pickle", old_path.name[len(prefix):]):
+                    old_path.unlink()
+            with open(cache_path, "wb") as f:
+                pickle.dump(
+                    {"globals": GLOBAL_REFERENCE, "lists": lists},
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+
+        return lists
+
     def correct_type(self, t_datatype: str) -> str:
         """Funkcja ewentualnie koryguje typ właściwości na właściwy, zgodny z oczekiwanym
         przez Wikibase
@@ -214,13 +352,13 @@ class WDHSpreadsheet:
     def get_property_list(self) -> list:
         """zwraca listę właściwości (w formie obiektów WDHProperty) do dodania"""
         p_list = []
-        for row in self.p_list.iter_rows(2, self.p_list.max_row):
+        for row in self.iter_rows(self.p_list, self.property_columns):
             basic_cols = ["Label_en", "Description_en", "Datatype", "Label_pl"]
             p_item = {}
             p_item = WDHProperty()
             for col in basic_cols:
                 key = col.lower()
-                col_value = row[self.property_columns[col]].value
+                col_value = row[self.property_columns[col]]
                 if key == "label_en":
                     p_item.label_en = col_value
                 elif key == "description_en":
@@ -239,7 +377,7 @@ class WDHSpreadsheet:
                 extend_cols = ["Description_pl", "Wiki_id", "Inverse_property"]
                 for col in extend_cols:
                     key = col.lower()
-                    col_value = row[self.property_columns[col]].value
+                    col_value = row[self.property_columns[col]]
                     if key == "description_pl":
                         p_item.description_pl = col_value
                     elif key == "wiki_id":
@@ -254,7 +392,7 @@ class WDHSpreadsheet:
     def get_statement_list(self) -> list:
         """zwraca listę obiektów deklaracji dla właściwości do dodania"""
         s_list = []
-        for row in self.p_statements.iter_rows(2, self.p_statements.max_row):
+        for row in self.iter_rows(self.p_statements, self.statement_columns):
             basic_cols = [
                 "Label_en",
                 "P",
@@ -268,7 +406,7 @@ class WDHSpreadsheet:
                 # tylko jeżeli kolumna z listy jest w pliku
                 if col in self.statement_columns:
                     key = col.lower()
-                    col_value = row[self.statement_columns[col]].value
+                    col_value = row[self.statement_columns[col]]
 
                     if key == "label_en":
                         s_item.label_en = col_value
@@ -312,12 +450,12 @@ class WDHSpreadsheet:
     def get_item_list(self) -> list:
         """zwraca listę elementów (w formie obiektów WDHItem) do dodania"""
         i_list = []
-        for row in self.i_list.iter_rows(2, self.i_list.max_row):
+        for row in self.iter_rows(self.i_list, self.item_columns):
             basic_cols = ["Label_en", "Label_pl", "Description_en", "Description_pl"]
             i_item = WDHItem()
             for col in basic_cols:
                 key = col.lower()
-                col_value = row[self.item_columns[col]].value
+                col_value = row[self.item_columns[col]]
                 if key == "label_en":
                     i_item.label_en = col_value
                 elif key == "description_en":
@@ -340,7 +478,7 @@ class WDHSpreadsheet:
                 for col in extend_cols:
                     key = col.lower()
                     if col in self.item_columns:
-                        col_value = row[self.item_columns[col]].value
+                        col_value = row[self.item_columns[col]]
                         if key == "wiki_id":
                             i_item.wiki_id = col_value
                         elif key == "startsat":
@@ -372,7 +510,7 @@ class WDHSpreadsheet:
         """zwraca listę obiektów deklaracji do dodania do elementów"""
 
         s_list = []
-        for row in self.i_statements.iter_rows(2, self.i_statements.max_row):
+        for row in self.iter_rows(self.i_statements, self.item_statement_columns):
             basic_cols = ["Label_en", "P", "Value", "Qualifier", "Qualifier_value"]
 
             label_en = (
@@ -380,7 +518,7 @@ class WDHSpreadsheet:
             ) = statement_value = qualifier = qualifier_value = ""
             for col in basic_cols:
                 key = col.lower()
-                col_value = row[self.item_statement_columns[col]].value
+                col_value = row[self.item_statement_columns[col]]
 
                 if key == "label_en":
                     label_en = col_value
@@ -431,15 +569,1071 @@ class WDHSpreadsheet:
         """get_global"""
         global GLOBAL_REFERENCE
 
-        for row in self.globals.iter_rows(2, self.globals.max_row):
-            g_sheet = row[self.globals_columns["Sheet"]].value
-            g_property = row[self.globals_columns["Reference_property"]].value
-            g_value = row[self.globals_columns["Reference_value"]].value
+        for row in self.iter_rows(self.globals, self.globals_columns):
+            g_sheet = row[self.globals_columns["Sheet"]]
+            g_property = row[self.globals_columns["Reference_property"]]
+            g_value = row[self.globals_columns["Reference_value"]]
             if g_value.startswith("http") and g_value.endswith("/"):
                 g_value = g_value[:-1]
             GLOBAL_REFERENCE[g_sheet] = (g_property, g_value)
 
 
+class WDHPrefetch:
+    """Wstępne, zbiorcze pobranie z Wikibase (przed zapisami) wszystkich encji,
+    do których odwołują się arkusze P_list, P_statements, Q_list, Q_statements
+    i Globals. Wyniki trafiają do pamięci podręcznych (ENTITY_CACHE, LABEL_CACHE,
+    PURL_INDEX, PROPERTY_TYPES), z których korzysta przetwarzanie wierszy.
+    """
+
+    def __init__(self, p_list: list, p_statements: list, i_list: list, i_statements: list):
+        self.p_list = p_list
+        self.p_statements = p_statements
+        self.i_list = i_list
+        self.i_statements = i_statements
+        self.ids = []
+        self.not_found = []
+        self._resolved = set()
+        # wyszukiwania zbierane przed wykonaniem ich równolegle (collect)
+        self._queries = None
+
+    def collect(self, resolve_method):
+        """wyszukiwania potrzebne metodzie resolve_method wykonywane zbiorczo
+        i równolegle (element_search_many), ich wyniki trafiają do LABEL_CACHE
+        """
+        self._queries = []
+        try:
+            resolve_method()
+            queries = self._queries
+        finally:
+            self._queries = None
+        if queries:
+            element_search_many(queries)
+
+    def resolve(self, name: str, elem_type: str, strict: bool = False):
+        """ustala identyfikator dla nazwy (tak samo jak przetwarzanie wiersza)"""
+        if not name or (name, elem_type, strict) in self._resolved:
+            return
+        if self._queries is not None:
+            query = name_search_query(name, elem_type, strict)
+            if query:
+                self._queries.append(query)
+            return
+        self._resolved.add((name, elem_type, strict))
+
+        is_ok, value = find_name_qid(name, elem_type, strict=strict)
+        if is_ok:
+            self.ids.append(value)
+        else:
+            self.not_found.append(f"{elem_type}: {name}")
+
+    def resolve_value(self, prop: str, value: str, strict: bool = False):
+        """ustala identyfikator wartości deklaracji, jeżeli typ właściwości
+        to wikibase-item lub wikibase-property
+        """
+        is_ok, prop_id = find_name_qid(prop, "property", strict=strict)
+        if not is_ok:
+            return
+        prop_type = PROPERTY_TYPES.get(prop_id)
+        if prop_type == "wikibase-item":
+            self.resolve(value, "item")
+        elif prop_type == "wikibase-property":
+            self.resolve(value, "property", strict=strict)
+
+    def purls(self) -> list:
+        """identyfikatory purl użyte w arkuszach jako odwołania do elementów"""
+        names = [stm.label_en for stm in self.i_statements]
+        names += [stm.statement_value for stm in self.i_statements]
+        names += [stm.statement_value for stm in self.p_statements]
+        names += [item.instance_of for item in self.i_list]
+        for stm in self.i_statements:
+            names += list(stm.qualifiers.values())
+        for _, g_value in GLOBAL_REFERENCE.values():
+            names.append(g_value)
+
+        return [name for name in names if name and re.search(r"https?:\/\/purl\.org\/", name)]
+
+    def check_purls(self) -> tuple:
+        """wyszukanie elementów dla identyfikatorów purl użytych w arkuszach
+        (jeżeli indeks purl nie jest kompletny) i raport identyfikatorów bez
+        elementu lub niejednoznacznych, zwraca ich liczbę
+        """
+        purls = self.purls()
+        if not purls:
+            return 0, 0
+        is_ok, purl_qid = find_name_qid("purl identifier", "property")
+        if not is_ok:
+            return 0, 0
+
+        PURL_INDEX.load_values(purl_qid, purls)
+        missing, ambiguous = PURL_INDEX.report(purls)
+        # identyfikatory purl dodawane przez arkusze (Q_list, deklaracje 'purl identifier')
+        new_purls = {item.purl_identifier for item in self.i_list if item.purl_identifier}
+        new_purls.update(
+            stm.statement_value
+            for stm in self.i_statements
+            if stm.statement_property in ("purl identifier", purl_qid)
+        )
+        missing = [purl for purl in missing if purl not in new_purls]
+        if missing:
+            print(f"PURL: brak elementu ({len(missing)}): {', '.join(missing)}")
+        for purl, items in ambiguous.items():
+            print(f"PURL: niejednoznaczny: {purl} -> {', '.join(items)}")
+
+        return len(missing), len(ambiguous)
+
+    def search_item(self, label: str, lang: str, description: str):
+        """wyszukanie elementu opisywanego w arkuszu Q_list"""
+        if self._queries is not None:
+            self._queries.append((label, "item", lang, {"description": description, "strict": True}))
+            return
+        search_item, search_id = element_search(label, "item", lang, description=description, strict=True)
+        if search_item:
+            self.ids.append(search_id)
+
+    def resolve_names(self):
+        """właściwości i elementy opisywane w arkuszach"""
+        for p_item in self.p_list:
+            self.resolve(p_item.label_en, "property")
+            self.resolve(p_item.inverse_property, "property")
+
+        for stm in self.p_statements:
+            self.resolve(stm.label_en, "property", strict=True)
+            if not re.match(r"^[ALD][a-z]{2}$", stm.statement_property):
+                self.resolve(stm.statement_property, "property", strict=True)
+            for ref_prop in list(stm.references) + list(stm.additional_references):
+                self.resolve(ref_prop, "property")
+
+        for item in self.i_list:
+            if item.label_en:
+                self.search_item(item.label_en, "en", item.description_en)
+            else:
+                self.search_item(item.label_pl, "pl", item.description_pl)
+            self.resolve(item.instance_of, "item", strict=True)
+            if item.starts_at:
+                self.resolve("starts at", "property")
+            if item.ends_at:
+                self.resolve("ends at", "property")
+            if item.instance_of:
+                self.resolve("instance of", "property")
+            if item.purl_identifier:
+                self.resolve("purl identifier", "property")
+
+        for stm in self.i_statements:
+            self.resolve(stm.label_en, "item")
+            if re.match(r"^A[a-z]{2}$", stm.statement_property):
+                if stm.additional_references:
+                    self.resolve("stated as", "property")
+            elif not re.match(r"^[LD][a-z]{2}$", stm.statement_property):
+                self.resolve(stm.statement_property, "property")
+            for q_prop in stm.qualifiers:
+                self.resolve(q_prop, "property")
+            for ref_prop in stm.additional_references:
+                self.resolve(ref_prop, "property")
+
+    def resolve_values(self):
+        """wartości deklaracji, kwalifikatorów i referencji typu item/property"""
+        for stm in self.p_statements:
+            if not re.match(r"^[ALD][a-z]{2}$", stm.statement_property):
+                self.resolve_value(stm.statement_property, stm.statement_value, strict=True)
+            for ref_prop, ref_value in list(stm.references.items()) + list(stm.additional_references.items()):
+                self.resolve_value(ref_prop, ref_value)
+
+        for stm in self.i_statements:
+            if not re.match(r"^[ALD][a-z]{2}$", stm.statement_property):
+                self.resolve_value(stm.statement_property, stm.statement_value)
+            for q_prop, q_value in stm.qualifiers.items():
+                self.resolve_value(q_prop, q_value)
+            for ref_prop, ref_value in stm.additional_references.items():
+                self.resolve_value(ref_prop, ref_value)
+
+    def run(self):
+        """pobranie danych: 1) właściwości i elementy opisywane w arkuszach,
+        2) typy danych właściwości, 3) wartości deklaracji typu item/property,
+        4) encje - zapytaniami wbgetentities po 50 (identyfikatory purl -
+        wcześniej, check_purls); wyszukiwania etykiet w krokach 1 i 3 oraz
+        zapytania wbgetentities wykonywane są równolegle (wikidariahasync)
+        """
+        self.collect(self.resolve_names)
+        self.resolve_names()
+
+        # typy danych wszystkich znalezionych właściwości
+        PROPERTY_TYPES.load_ids([p_id for p_id in self.ids if p_id.startswith("P")])
+
+        self.collect(self.resolve_values)
+        self.resolve_values()
+
+        # encje - zbiorczo, po 50 w zapytaniu
+        loaded = load_entities(self.ids)
+
+        print(
+            f"PREFETCH: identyfikatory: {len(set(self.ids))}, pobrane encje: {loaded}, "
+            f"purl: {len(PURL_INDEX)}, typy właściwości: {len(PROPERTY_TYPES)}"
+        )
+        # nieznalezione mogą zostać dodane podczas pracy skryptu
+        if self.not_found:
+            print(f"PREFETCH: nie znaleziono ({len(self.not_found)}): {', '.join(self.not_found)}")
+
+
+class WDHEntityEdit:
+    """Zmiany jednej encji zbierane z wielu wierszy arkusza i zapisywane
+    w Wikibase jednym wywołaniem wbeditentity. Do czasu zapisu zmiany są
+    nanoszone na kopię roboczą encji w ENTITY_CACHE, więc kolejne wiersze
+    (weryfikacja SKIP) widzą zmiany wprowadzone przez poprzednie.
+    """
+
+    def __init__(self, entity_id: str):
+        self.entity_id = entity_id
+        self.original = ENTITY_CACHE.get_json(entity_id)
+        self.messages = []
+        # wiersze arkusza (klucze dziennika importu), których zmiany zbiera obiekt
+        self.rows = set()
+
+    def stage_terms(self, wd_item: wbi_core.ItemEngine, message: str):
+        """zmiana etykiet, opisów, aliasów wprowadzona w obiekcie ItemEngine"""
+        working = ENTITY_CACHE.get_json(self.entity_id)
+        for key in ("labels", "descriptions", "aliases"):
+            working[key] = copy.deepcopy(wd_item.json_representation.get(key, {}))
+        ENTITY_CACHE.store(working)
+        self.messages.append(message)
+
+    def stage_claims(self, wd_item: wbi_core.ItemEngine, message: str):
+        """nowe deklaracje dodane do obiektu ItemEngine (parametr data), nowe
+        deklaracje otrzymują tymczasowy identyfikator - tylko na potrzeby
+        kolejnych wierszy, nie jest on przesyłany do Wikibase
+        """
+        working = ENTITY_CACHE.get_json(self.entity_id)
+        for prop_nr, claims in wd_item.json_representation.get("claims", {}).items():
+            for claim in claims:
+                if "id" not in claim and "remove" not in claim:
+                    claim = copy.deepcopy(claim)
+                    claim["id"] = f"{self.entity_id}${uuid.uuid4()}"
+                    working["claims"].setdefault(prop_nr, []).append(claim)
+        ENTITY_CACHE.store(working)
+        self.messages.append(message)
+
+    def _claim(self, working: dict, claim_id: str) -> dict:
+        """deklaracja o podanym identyfikatorze z kopii roboczej"""
+        for claims in working.get("claims", {}).values():
+            for claim in claims:
+                if claim.get("id") == claim_id:
+                    return claim
+
+        return None
+
+    def add_qualifier(self, claim_id: str, prop_nr: str, prop_value: str, message: str) -> bool:
+        """dodaje kwalifikator do deklaracji (istniejącej lub oczekującej na zapis)"""
+        working = ENTITY_CACHE.get_json(self.entity_id)
+        claim = self._claim(working, claim_id)
+        qualifier = create_statement(prop_nr, prop_value, is_qlf=True)
+        if claim is None or qualifier is None:
+            return False
+
+        snak = qualifier.get_json_representation()[prop_nr][0]
+        claim.setdefault("qualifiers", {}).setdefault(prop_nr, []).append(snak)
+        if prop_nr not in claim.setdefault("qualifiers-order", []):
+            claim["qualifiers-order"].append(prop_nr)
+        ENTITY_CACHE.store(working)
+        self.messages.append(message)
+
+        return True
+
+    def add_reference(self, claim_id: str, prop_nr: str, prop_value: str, message: str) -> bool:
+        """dodaje referencję do deklaracji (istniejącej lub oczekującej na zapis)"""
+        working = ENTITY_CACHE.get_json(self.entity_id)
+        claim = self._claim(working, claim_id)
+        reference = create_statement(prop_nr, prop_value, is_ref=True)
+        if claim is None or reference is None:
+            return False
+
+        claim.setdefault("references", []).append(
+            {"snaks": reference.get_json_representation(), "snaks-order": [prop_nr]}
+        )
+        ENTITY_CACHE.store(working)
+        self.messages.append(message)
+
+        return True
+
+    def diff(self) -> dict:
+        """zmiany encji (w formacie wbeditentity) w stosunku do stanu sprzed edycji"""
+        working = ENTITY_CACHE.get_json(self.entity_id)
+        data = {}
+        for key in ("labels", "descriptions", "aliases"):
+            changed = {
+                lang: value
+                for lang, value in working.get(key, {}).items()
+                if self.original.get(key, {}).get(lang) != value
+            }
+            if changed:
+                data[key] = changed
+
+        original_claims = {
+            claim["id"]: claim
+            for claims in self.original.get("claims", {}).values()
+            for claim in claims
+        }
+        changed_claims = []
+        for claims in working.get("claims", {}).values():
+            for claim in claims:
+                if claim["id"] not in original_claims:
+                    # nowa deklaracja - identyfikator nada Wikibase
+                    claim = {key: value for key, value in claim.items() if key != "id"}
+                    changed_claims.append(claim)
+                elif original_claims[claim["id"]] != claim:
+                    changed_claims.append(claim)
+        if changed_claims:
+            data["claims"] = changed_claims
+
+        return data
+
+    def write(self) -> bool:
+        """zapis wszystkich zmian encji jednym wywołaniem wbeditentity"""
+        data = self.diff()
+        if not WIKIBASE_WRITE:
+            # bez zapisu - zmiany do zestawienia, kopia robocza pozostaje w magazynie
+            if data:
+                CHANGESET.record(
+                    self.entity_id, self.original, ENTITY_CACHE.get_json(self.entity_id)
+                )
+            for message in self.messages:
+                print(message)
+            JOURNAL.commit(self.rows, True)
+            return True
+
+        # kopia robocza nie jest już potrzebna, po zapisie encja z odpowiedzi API
+        ENTITY_CACHE.invalidate(self.entity_id)
+        if not data:
+            for message in self.messages:
+                print(message)
+            JOURNAL.commit(self.rows, True)
+            return True
+
+        params = {
+            "action": "wbeditentity",
+            "id": self.entity_id,
+            "data": json.dumps(data),
+            "bot": True,
+        }
+        if self.original.get("lastrevid"):
+            params["baserevid"] = self.original["lastrevid"]
+
+        try:
+            results = write_api_call(params, login_instance)
+        except MWApiError as wbeditentity_error:
+            for message in self.messages:
+                print(f"ERROR: (niezapisane) {message}")
+            print(f"ERROR: zapis zmian elementu {self.entity_id}: {wbeditentity_error}")
+            JOURNAL.commit(self.rows, False)
+            return False
+
+        if "entity" in results:
+            ENTITY_CACHE.store(results["entity"])
+
+        # zmiana etykiet i aliasów - nieaktualne wyniki wyszukiwania
+        if "labels" in data or "aliases" in data:
+            LABEL_CACHE.invalidate_id(self.entity_id)
+            for label in data.get("labels", {}).values():
+                LABEL_CACHE.invalidate(label["value"])
+            for aliases in data.get("aliases", {}).values():
+                for alias in aliases:
+                    LABEL_CACHE.invalidate(alias["value"])
+
+        for message in self.messages:
+            print(message)
+        print(f"SAVED: {self.entity_id}, zmiany: {len(self.messages)} (jeden zapis)")
+        JOURNAL.commit(self.rows, True)
+
+        return True
+
+
+class WDHTask:
+    """Zadanie (przetworzenie wiersza arkusza) dla WDHExecutor: key - encja
+    modyfikowana przez zadanie (zadania z tym samym kluczem wykonywane są
+    kolejno), provides - nazwy (etykiety, purl) encji tworzonych przez zadanie,
+    requires - nazwy encji, do których odwołuje się zadanie, row - wiersz
+    arkusza (wynik zadania zapisywany w dzienniku importu)
+    """
+
+    def __init__(self, name: str, func, key, provides=None, requires=None, row=None):
+        self.name = name
+        self.func = func
+        # zadanie może modyfikować kilka encji (np. właściwość i jej odwrotność)
+        self.keys = [key] if isinstance(key, str) else list(key)
+        self.provides = [x for x in (provides or []) if x]
+        self.requires = [x for x in (requires or []) if x]
+        self.row = row
+
+    def run(self):
+        """wykonanie zadania"""
+        with CHANGESET.owner(self):
+            if self.row is None:
+                return self.func()
+
+            return JOURNAL.run(self)
+
+
+# wikibaseintegrator (JsonParser) przechowuje stan parsowania deklaracji
+# w atrybutach wspólnych dla wszystkich obiektów ItemEngine - przy pracy
+# w wielu wątkach json encji jest parsowany kolejno
+WBI_PARSE_LOCK = threading.RLock()
+wbi_parse_json = wbi_core.ItemEngine.parse_json
+
+
+def parse_json_locked(self, json_data):
+    """ItemEngine.parse_json z blokadą WBI_PARSE_LOCK"""
+    with WBI_PARSE_LOCK:
+        return wbi_parse_json(self, json_data)
+
+
+wbi_core.ItemEngine.parse_json = parse_json_locked
+
+
+class WDHExecutor:
+    """Równoległe wykonywanie zadań w puli wątków. Zadanie startuje gdy
+    zakończą się: poprzednie zadanie modyfikujące tę samą encję oraz
+    wcześniejsze zadania tworzące encje, do których się odwołuje.
+    """
+
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+
+    def plan(self, tasks: list) -> list:
+        """zależności zadań: lista zbiorów indeksów zadań poprzedzających"""
+        last_by_key = {}
+        providers = {}
+        deps = []
+        for i, task in enumerate(tasks):
+            task_deps = set()
+            for key in task.keys:
+                if key in last_by_key:
+                    task_deps.add(last_by_key[key])
+                last_by_key[key] = i
+            for name in task.requires:
+                if name in providers:
+                    task_deps.add(providers[name])
+            task_deps.discard(i)
+            deps.append(task_deps)
+            for name in task.provides:
+                providers[name] = i
+
+        return deps
+
+    def run(self, tasks: list, deps: list = None):
+        """wykonanie zadań (dla workers <= 1 sekwencyjnie, w kolejności listy),
+        deps - zależności zadań (np. z WDHPlanner), domyślnie ustalane przez plan()
+        """
+        if self.workers <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                print(task.name)
+                try:
+                    task.run()
+                except Exception as error:
+                    # jak w pracy równoległej: błąd zadania nie przerywa importu
+                    print(f"ERROR: {task.name}: {error}")
+            return
+
+        if deps is None:
+            deps = self.plan(tasks)
+        waiting = [len(task_deps) for task_deps in deps]
+        dependents = [[] for _ in tasks]
+        for i, task_deps in enumerate(deps):
+            for j in task_deps:
+                dependents[j].append(i)
+
+        lock = threading.Lock()
+        finished = threading.Event()
+        remaining = [len(tasks)]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+
+            def report(future, task):
+                if future.exception():
+                    print(f"ERROR: {task.name}: {future.exception()}")
+
+            def submit(i):
+                future = pool.submit(execute, i)
+                future.add_done_callback(lambda f, task=tasks[i]: report(f, task))
+
+            def execute(i):
+                try:
+                    print(tasks[i].name)
+                    tasks[i].run()
+                finally:
+                    ready = []
+                    with lock:
+                        for j in dependents[i]:
+                            waiting[j] -= 1
+                            if waiting[j] == 0:
+                                ready.append(j)
+                        remaining[0] -= 1
+                        if remaining[0] == 0:
+                            finished.set()
+                    for j in ready:
+                        submit(j)
+
+            ready = [i for i, count in enumerate(waiting) if count == 0]
+            for i in ready:
+                submit(i)
+            finished.wait()
+
+
+class WDHJournal:
+    """Dziennik importu (plik jsonl, tylko dopisywanie): wynik przetworzenia
+    każdego wiersza arkuszy i identyfikator encji. Wiersz jest identyfikowany
+    treścią (i numerem powtórzenia takiego samego wiersza w arkuszu), więc
+    zmiana wiersza w arkuszu oznacza nowy wiersz. Przy wznawianiu importu
+    (--resume) wiersze zapisane wcześniej są pomijane, a słowniki GLOBAL_ITEM
+    i GLOBAL_PROPERTY odtwarzane z dziennika.
+    Odciski wierszy (plik json): dla każdego wiersza zaimportowanego bez błędu
+    skrót klucza wiersza oraz encji wiersza i ich rewizji po imporcie. Wiersz,
+    którego encje nie zmieniły się od ostatniego importu (ta sama rewizja -
+    sprawdzane zbiorczo, bez pobierania encji) jest pomijany bez odwołań do
+    Wikibase.
+    """
+
+    def __init__(self):
+        self.path = None
+        self.write = False
+        self.skipped = 0
+        self.unchanged = 0
+        self.stats = Counter()
+        self.fingerprint_path = None
+        self._fingerprints = {}
+        self._unchanged = set()
+        self._targets = {}
+        self._revisions = {}
+        self._done = {}
+        self._keys = {}
+        self._rows = {}
+        self._staged = set()
+        self._failed = set()
+        self._file = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def open(self, path, write: bool = True, fingerprint_path=None) -> int:
+        """odczyt dziennika, write - czy zapisywać wyniki wierszy (tylko gdy
+        import zapisuje dane w Wikibase), fingerprint_path - plik odcisków
+        wierszy (None - bez pomijania wierszy niezmienionych), zwraca liczbę
+        zapisanych wierszy
+        """
+        self.close()
+        self.__init__()
+        self.path = Path(path)
+        self.write = write
+        if fingerprint_path is not None:
+            self.open_fingerprints(fingerprint_path)
+        if self.path.is_file():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # niepełna linia po przerwaniu zapisu
+                        continue
+                    if record.get("api") != wbi_config["MEDIAWIKI_API_URL"]:
+                        continue
+                    if record["status"] == "done":
+                        self._done[record["row"]] = record
+                    else:
+                        self._done.pop(record["row"], None)
+
+        return len(self._done)
+
+    @staticmethod
+    def fingerprint(key: str, revisions: dict) -> str:
+        """odcisk wiersza: klucz wiersza (treść), encje wiersza i ich rewizje"""
+        content = json.dumps(sorted(revisions.items()))
+
+        return hashlib.sha1(f"{key}|{content}".encode("utf-8")).hexdigest()
+
+    def open_fingerprints(self, path):
+        """odczyt odcisków wierszy, bieżące rewizje encji wierszy (zbiorczo,
+        bez pobierania encji) i ustalenie wierszy niezmienionych
+        """
+        self.fingerprint_path = Path(path)
+        if not self.fingerprint_path.is_file():
+            return
+        with open(self.fingerprint_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("api") != wbi_config["MEDIAWIKI_API_URL"]:
+            return
+
+        self._fingerprints = data.get("rows", {})
+        entities = [x for record in self._fingerprints.values() for x in record["entities"]]
+        self._revisions = ENTITY_CACHE.revisions(entities)
+        for key, record in self._fingerprints.items():
+            revisions = {x: self._revisions.get(x) for x in record["entities"]}
+            if self.fingerprint(key, revisions) == record["fingerprint"]:
+                self._unchanged.add(key)
+
+    def save_fingerprints(self):
+        """zapis odcisków wierszy zaimportowanych bez błędu (także pominiętych
+        jako niezmienione) z rewizjami encji po imporcie
+        """
+        if not self.write or self.fingerprint_path is None:
+            return
+
+        fingerprints = {
+            key: record for key, record in self._fingerprints.items()
+            if key in self._rows and key not in self._failed
+        }
+        for key, entities in self._targets.items():
+            if key in self._failed or key not in self._rows:
+                continue
+            revisions = {x: ENTITY_CACHE.revision(x) or self._revisions.get(x) for x in entities}
+            if not entities or None in revisions.values():
+                fingerprints.pop(key, None)
+                continue
+            row = self._rows[key][1]
+            global_entry = self.global_entry(row)
+            fingerprints[key] = {
+                "entities": entities,
+                "fingerprint": self.fingerprint(key, revisions),
+                "global": global_entry,
+                "entity": self.global_entity(global_entry),
+            }
+
+        self.fingerprint_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.fingerprint_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"api": wbi_config["MEDIAWIKI_API_URL"], "rows": fingerprints}, f, ensure_ascii=False)
+        os.replace(temp_path, self.fingerprint_path)
+
+    def rows(self, sheet: str, rows: list, resume: bool = False) -> list:
+        """nadaje klucze wierszom arkusza, przy wznawianiu zwraca tylko wiersze
+        nieprzetworzone wcześniej, pomija wiersze niezmienione od ostatniego
+        importu (dla pominiętych odtwarza GLOBAL_ITEM/PROPERTY)
+        """
+        seen = Counter()
+        remaining = []
+        for row in rows:
+            content = json.dumps(vars(row), sort_keys=True, ensure_ascii=False, default=str)
+            seen[content] += 1
+            key = hashlib.sha1(f"{sheet}|{seen[content]}|{content}".encode("utf-8")).hexdigest()
+            self._keys[id(row)] = key
+            self._rows[key] = (sheet, row)
+            if resume and key in self._done:
+                self.restore_global(self._done[key])
+                self.skipped += 1
+                continue
+            if key in self._unchanged:
+                # odcisk zapisywany ponownie z rewizjami encji po tym imporcie
+                record = self._fingerprints[key]
+                self.restore_global(record)
+                self._targets[key] = record["entities"]
+                self.unchanged += 1
+                continue
+            remaining.append(row)
+
+        return remaining
+
+    def run(self, task: WDHTask):
+        """wykonanie zadania wiersza arkusza i zapis wyniku w dzienniku, wiersze
+        ze zmianami oczekującymi na zapis (WDHEntityEdit) - po zapisie encji
+        """
+        key = self._keys.get(id(task.row))
+        self._local.key = key
+        sheet = self._rows[key][0] if key is not None else "-"
+        result = False
+        calls = {}
+        error = None
+        message = None
+        start = time.perf_counter()
+        with EVENT_LOG.context(sheet=sheet, row=key, name=task.name):
+            try:
+                with STATS.row(sheet, task.name) as calls:
+                    result = task.func()
+            except Exception as row_error:
+                error = type(row_error).__name__
+                message = str(row_error)
+                raise
+            finally:
+                # także wyjątek w wierszu (komunikat wyświetla WDHExecutor)
+                self._local.key = None
+                if key is not None:
+                    if result is False:
+                        with self._lock:
+                            self._failed.add(key)
+                        self.record(key, "error")
+                    elif key not in self._staged:
+                        self.record(key, "done")
+                        self._targets[key] = self.entities(task)
+                if error is not None or result is False:
+                    outcome = "error"
+                    # przyczyna niepowodzenia - ostatni komunikat wiersza
+                    if message is None:
+                        message = EVENT_LOG.last_message()
+                else:
+                    outcome = "staged" if key in self._staged else "done"
+                EVENT_LOG.event(
+                    "error" if outcome == "error" else "info", "row",
+                    outcome=outcome, error=error, message=message, entity=self.entity(task),
+                    elapsed=round(time.perf_counter() - start, 4), calls=dict(calls),
+                )
+
+        return result
+
+    def stage(self, entity_edit):
+        """wiersz wykonywany w bieżącym wątku zmienia encję zbiorczo (WDHEntityEdit)"""
+        key = getattr(self._local, "key", None)
+        if key is not None:
+            with self._lock:
+                self._staged.add(key)
+                self._targets[key] = [entity_edit.entity_id]
+            entity_edit.rows.add(key)
+
+    def commit(self, keys: set, ok: bool):
+        """wynik zapisu zmian encji zebranych z wierszy arkusza"""
+        for key in keys:
+            if key not in self._failed:
+                if not ok:
+                    with self._lock:
+                        self._failed.add(key)
+                self.record(key, "done" if ok else "error")
+                EVENT_LOG.event("info" if ok else "error", "row", sheet=self._rows[key][0],
+                                row=key, name=self._rows[key][1].label_en,
+                                outcome="done" if ok else "error", committed=True)
+
+    def close(self):
+        """zapis odcisków wierszy, zamknięcie pliku dziennika"""
+        self.save_fingerprints()
+        self.fingerprint_path = None
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @staticmethod
+    def entity(task: WDHTask) -> str:
+        """encja wiersza: utworzona lub zmieniona właściwość/element, dla
+        deklaracji - encja modyfikowana przez zadanie
+        """
+        global_entry = WDHJournal.global_entry(task.row)
+        if global_entry:
+            return WDHJournal.global_entity(global_entry)
+
+        return next((key for key in task.keys if re.match(r"^[PQ]\d+$", key)), None)
+
+    def entities(self, task: WDHTask) -> list:
+        """encje wiersza (identyfikatory): encja wiersza i encje modyfikowane
+        przez zadanie, także utworzone w tym imporcie (identyfikowane etykietą)
+        """
+        entities = [self.entity(task)]
+        for key in task.keys:
+            if re.match(r"^[PQ]\d+$", key):
+                entities.append(key)
+            elif "|" in key:
+                kind, label = key.split("|")[:2]
+                found = ENTITY_CACHE.search(label, kind, "en", aliases=False)
+                if len(found) == 1:
+                    entities.append(found[0])
+
+        return [x for x in dict.fromkeys(entities) if x]
+
+    @staticmethod
+    def global_entry(row) -> list:
+        """pozycja wiersza w GLOBAL_PROPERTY lub GLOBAL_ITEM: [rodzaj, etykieta]"""
+        if isinstance(row, WDHProperty):
+            return ["property", row.label_en + "/" + row.label_pl]
+        if isinstance(row, WDHItem):
+            return ["item", (row.label_en if row.label_en else "-") + "/" + row.label_pl]
+
+        return None
+
+    @staticmethod
+    def global_entity(global_entry: list) -> str:
+        """identyfikator encji z GLOBAL_PROPERTY lub GLOBAL_ITEM"""
+        if not global_entry:
+            return None
+        kind, label = global_entry
+        target = GLOBAL_PROPERTY if kind == "property" else GLOBAL_ITEM
+
+        return target.get(label)
+
+    @staticmethod
+    def restore_global(record: dict):
+        """odtworzenie pozycji GLOBAL_PROPERTY lub GLOBAL_ITEM pominiętego wiersza"""
+        if record.get("global") and record.get("entity"):
+            kind, label = record["global"]
+            target = GLOBAL_PROPERTY if kind == "property" else GLOBAL_ITEM
+            target[label] = record["entity"]
+
+    def record(self, key: str, status: str):
+        """dopisanie wyniku wiersza do dziennika (zapis od razu na dysk)"""
+        with self._lock:
+            self.stats[status] += 1
+        if not self.write or self.path is None:
+            return
+
+        sheet, row = self._rows[key]
+        record = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "api": wbi_config["MEDIAWIKI_API_URL"],
+            "row": key,
+            "sheet": sheet,
+            "name": row.label_en,
+            "status": status,
+        }
+        global_entry = self.global_entry(row)
+        if global_entry:
+            record["global"] = global_entry
+            record["entity"] = self.global_entity(global_entry)
+
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+
+# wspólny dziennik importu
+JOURNAL = WDHJournal()
+
+
+class WDHPlanner:
+    """Plan importu: graf zależności między wierszami wszystkich arkuszy
+    (właściwości odwrotne, Instance of, właściwości, wartości deklaracji,
+    kwalifikatorów i referencji wskazujące encje tworzone w innych wierszach).
+    Graf jest sortowany topologicznie, cykle i nierozpoznane odwołania są
+    raportowane przed zapisami w Wikibase.
+    """
+
+    def __init__(self, p_list: list, p_statements: list, i_list: list, i_statements: list):
+        self.p_list = p_list
+        self.p_statements = p_statements
+        self.i_list = i_list
+        self.i_statements = i_statements
+        self.tasks = []
+        # odwołania zadań: (typ, nazwa, strict, twarde), odwołanie 'miękkie'
+        # (właściwość odwrotna) wpływa tylko na kolejność wierszy z arkusza
+        self.refs = []
+        # typy danych właściwości dodawanych w tym imporcie
+        self.datatypes = {p_item.label_en: p_item.datatype for p_item in p_list}
+        self.cycles = []
+        self.unresolved = []
+
+    def property_type(self, prop: str) -> str:
+        """typ danych właściwości istniejącej lub dodawanej w tym imporcie"""
+        if prop in self.datatypes:
+            return self.datatypes[prop]
+        is_ok, prop_id = find_name_qid(prop, "property")
+
+        return PROPERTY_TYPES.get(prop_id) if is_ok else None
+
+    def value_refs(self, prop: str, value: str, strict: bool = False) -> list:
+        """odwołanie wartości deklaracji do encji (dla typu item/property)"""
+        prop_type = self.property_type(prop)
+        if prop_type == "wikibase-item":
+            return [("item", value, False, True)]
+        if prop_type == "wikibase-property":
+            return [("property", value, strict, True)]
+
+        return []
+
+    def add(self, task: WDHTask, refs: list):
+        """dodanie zadania do planu"""
+        task.requires = [(ref[0], ref[1]) for ref in refs]
+        self.tasks.append(task)
+        self.refs.append(refs)
+
+    def build(self):
+        """zadania dla wierszy arkuszy P_list, P_statements, Q_list, Q_statements"""
+        for p_item in self.p_list:
+            is_ok, p_id = element_search(p_item.label_en, "property", "en")
+            keys = [p_id if is_ok else f"property|{p_item.label_en}"]
+            refs = []
+            if p_item.wiki_id:
+                refs += [("property", "Wikidata ID", False, True), ("property", "reference URL", False, True)]
+            if p_item.inverse_property:
+                is_ok, inv_id = element_search(p_item.inverse_property, "property", "en")
+                keys.append(inv_id if is_ok else f"property|{p_item.inverse_property}")
+                refs += [
+                    ("property", "inverse property", False, True),
+                    ("property", p_item.inverse_property, False, False),
+                ]
+            task = WDHTask(
+                f"PROPERTY: {p_item.label_en}",
+                functools.partial(import_property, p_item),
+                keys,
+                provides=[("property", p_item.label_en)],
+                row=p_item,
+            )
+            self.add(task, refs)
+
+        for stm in self.p_statements:
+            is_ok, p_id = find_name_qid(stm.label_en, "property", strict=True)
+            refs = [("property", stm.label_en, True, True)]
+            if not re.match(r"^[ALD][a-z]{2}$", stm.statement_property):
+                refs.append(("property", stm.statement_property, True, True))
+                refs += self.value_refs(stm.statement_property, stm.statement_value, strict=True)
+            for ref_prop, ref_value in list(stm.references.items()) + list(stm.additional_references.items()):
+                refs.append(("property", ref_prop, False, True))
+                refs += self.value_refs(ref_prop, ref_value)
+            task = WDHTask(
+                f"PROPERTY: {stm.label_en}, STATEMENT: {stm.statement_property}, VALUE: {stm.statement_value}",
+                functools.partial(import_property_statement, stm),
+                p_id if is_ok else f"property|{stm.label_en}",
+                row=stm,
+            )
+            self.add(task, refs)
+
+        for wb_item in self.i_list:
+            if wb_item.label_en:
+                is_ok, item_id = element_search(
+                    wb_item.label_en,
+                    "item",
+                    "en",
+                    description=wb_item.description_en,
+                    strict=True,
+                )
+            else:
+                is_ok, item_id = element_search(
+                    wb_item.label_pl,
+                    "item",
+                    "pl",
+                    description=wb_item.description_pl,
+                    strict=True,
+                )
+            # nowe elementy identyfikowane etykietą i opisem, także kluczem
+            # deklaracji Q_statements (etykieta), by były przetwarzane kolejno
+            keys = [item_id]
+            if not is_ok:
+                keys = [
+                    f"item|{wb_item.label_en}|{wb_item.description_en}|{wb_item.label_pl}",
+                    f"item|{wb_item.label_en}",
+                ]
+
+            refs = []
+            if wb_item.wiki_id:
+                refs += [("property", "Wikidata ID", False, True), ("property", "reference URL", False, True)]
+            if wb_item.starts_at:
+                refs.append(("property", "starts at", False, True))
+            if wb_item.ends_at:
+                refs.append(("property", "ends at", False, True))
+            if wb_item.instance_of:
+                refs += [("property", "instance of", False, True), ("item", wb_item.instance_of, True, True)]
+            if wb_item.purl_identifier:
+                refs.append(("property", "purl identifier", False, True))
+            provides = [("item", wb_item.label_en), ("item", wb_item.label_pl)]
+            if wb_item.purl_identifier:
+                provides.append(("item", wb_item.purl_identifier))
+            task = WDHTask(
+                f"ITEM: {wb_item.label_en}",
+                wb_item.write_to_wikibase,
+                keys,
+                provides=provides,
+                row=wb_item,
+            )
+            self.add(task, refs)
+
+        for stm in self.i_statements:
+            is_ok, item_id = find_name_qid(stm.label_en, "item")
+            refs = [("item", stm.label_en, False, True)]
+            if re.match(r"^A[a-z]{2}$", stm.statement_property):
+                if stm.additional_references:
+                    refs.append(("property", "stated as", False, True))
+            elif not re.match(r"^[LD][a-z]{2}$", stm.statement_property):
+                refs.append(("property", stm.statement_property, False, True))
+                refs += self.value_refs(stm.statement_property, stm.statement_value)
+                for q_prop, q_value in stm.qualifiers.items():
+                    refs.append(("property", q_prop, False, True))
+                    refs += self.value_refs(q_prop, q_value)
+            for ref_prop, ref_value in stm.additional_references.items():
+                refs.append(("property", ref_prop, False, True))
+                refs += self.value_refs(ref_prop, ref_value)
+            task = WDHTask(
+                f"ITEM: {stm.label_en}, STATEMENT: {stm.statement_property}, VALUE: {stm.statement_value}",
+                stm.write_to_wikibase,
+                # element tworzony w tym uruchomieniu - identyfikowany etykietą
+                item_id if is_ok else f"item|{stm.label_en}",
+                row=stm,
+            )
+            self.add(task, refs)
+
+    def dependencies(self) -> list:
+        """zależności zadań (zbiory indeksów), raport nierozpoznanych odwołań"""
+        providers = {}
+        for i, task in enumerate(self.tasks):
+            for name in task.provides:
+                if name[1]:
+                    providers.setdefault(name, i)
+
+        deps = [set() for _ in self.tasks]
+        last_by_key = {}
+        for i, task in enumerate(self.tasks):
+            for key in task.keys:
+                if key in last_by_key:
+                    deps[i].add(last_by_key[key])
+                last_by_key[key] = i
+
+            for elem_type, name, strict, hard in self.refs[i]:
+                if not name or name in ("somevalue", "novalue"):
+                    continue
+                j = providers.get((elem_type, name))
+                if j is None:
+                    if hard and not find_name_qid(name, elem_type, strict=strict)[0]:
+                        self.unresolved.append(f"{task.name} -> {elem_type}: {name}")
+                elif j != i and (hard or j < i):
+                    deps[i].add(j)
+
+        return deps
+
+    def topological_order(self, deps: list) -> list:
+        """sortowanie topologiczne (przy braku zależności - kolejność z arkuszy),
+        cykle są przerywane: pomijane są zależności od wierszy późniejszych
+        """
+        while True:
+            waiting = [len(task_deps) for task_deps in deps]
+            dependents = [[] for _ in deps]
+            for i, task_deps in enumerate(deps):
+                for j in task_deps:
+                    dependents[j].append(i)
+
+            ready = [i for i, count in enumerate(waiting) if count == 0]
+            heapq.heapify(ready)
+            order = []
+            while ready:
+                i = heapq.heappop(ready)
+                order.append(i)
+                for j in dependents[i]:
+                    waiting[j] -= 1
+                    if waiting[j] == 0:
+                        heapq.heappush(ready, j)
+
+            if len(order) == len(deps):
+                return order
+
+            remaining = set(range(len(deps))) - set(order)
+            for i in sorted(remaining):
+                forward = {j for j in deps[i] if j > i and j in remaining}
+                for j in sorted(forward):
+                    self.cycles.append(f"{self.tasks[i].name} -> {self.tasks[j].name}")
+                deps[i] -= forward
+
+    def plan(self) -> tuple:
+        """zwraca zadania w kolejności topologicznej i ich zależności"""
+        self.build()
+        deps = self.dependencies()
+        order = self.topological_order(deps)
+
+        position = {old: new for new, old in enumerate(order)}
+        tasks = [self.tasks[i] for i in order]
+        task_deps = [{position[j] for j in deps[i]} for i in order]
+
+        print(
+            f"PLAN: zadania: {len(tasks)}, zależności: {sum(len(x) for x in task_deps)}, "
+            f"cykle: {len(self.cycles)}, nierozpoznane odwołania: {len(self.unresolved)}"
+        )
+        for cycle in self.cycles:
+            print(f"PLAN: CYKL (zależność pominięta, kolejność z arkusza): {cycle}")
+        for unresolved in self.unresolved:
+            print(f"PLAN: NIEROZPOZNANE ODWOŁANIE: {unresolved}")
+
+        return tasks, task_deps
+
+
 class WDHProperty:
     """Klasa dla właściwości (property)"""
 
@@ -847,7 +2041,7 @@ class WDHItem:
             self._instance_of = ""
 
     def write_to_wikibase(self):
-        """zapis elementu w instancji wikibase"""
+        """zapis elementu w instancji wikibase, zwraca False w razie błędu zapisu"""
         # jeżeli jest etykieta 'en'
         if self.label_en:
             search_item, search_id = element_search(
@@ -870,45 +2064,10 @@ class WDHItem:
             )
 
         item_is_changed = False
-        # jeżeli znaleziono w wikibase
         if search_item:
             print(
                 f"Item: '{self.label_en}' already exists: {search_id}, update mode enabled."
             )
-            wd_item = wbi_core.ItemEngine(item_id=search_id)
-            mode = "updated: "
-            # dla istniejących już elementów weryfikacja czy zmieniony opis
-            if self.description_en:
-                description_en = wd_item.get_description("en")
-                if description_en == self.description_en:
-                    print(
-                        f'SKIP: element: {search_id} ({self.label_en}) posiada już dla języka: "en" opis: {self.description_en}'
-                    )
-                else:
-                    wd_item.set_description(self.description_en, lang="en")
-                    item_is_changed = True
-
-            if self.description_pl:
-                description_pl = wd_item.get_description("pl")
-                if description_pl == self.description_pl:
-                    print(
-                        f'SKIP: element: {search_id} ({self.label_en}) posiada już dla języka: "pl" opis: {self.description_pl}'
-                    )
-                else:
-                    wd_item.set_description(self.description_pl, lang="pl")
-                    item_is_changed = True
-
-        # jeżeli nie znaleziono w wikibase
-        else:
-            wd_item = wbi_core.ItemEngine(new_item=True)
-            mode = "added: "
-            # tylko dla nowych jest ustawiania en i pl etykieta oraz opisy
-            wd_item.set_label(self.label_en, lang="en")
-            if self.description_en:
-                wd_item.set_description(self.description_en, lang="en")
-            wd_item.set_label(self.label_pl, lang="pl")
-            if self.description_pl:
-                wd_item.set_description(self.description_pl, lang="pl")
 
         wiki_dane = None
         if self.wiki_id:
@@ -1076,13 +2235,73 @@ class WDHItem:
                     "ERROR: nie znaleziono właściwości 'purl identifier' w instancji Wkibase."
                 )
 
+        # deklaracje dla elementu - zapisywane razem z etykietami i opisami
+        # (jeden zapis w Wikibase)
+        data = []
+        if wiki_dane:
+            data.append(wiki_dane)
+        if wiki_starts:
+            data.append(wiki_starts)
+        if wiki_ends:
+            data.append(wiki_ends)
+        if wiki_instance:
+            data.append(wiki_instance)
+        if wiki_purl:
+            data.append(wiki_purl)
+
+        # jeżeli znaleziono w wikibase
+        if search_item:
+            wd_item = ENTITY_CACHE.get_item(search_id, data=data)
+            mode = "updated: "
+            # dla istniejących już elementów weryfikacja czy zmieniony opis
+            if self.description_en:
+                description_en = wd_item.get_description("en")
+                if description_en == self.description_en:
+                    print(
+                        f'SKIP: element: {search_id} ({self.label_en}) posiada już dla języka: "en" opis: {self.description_en}'
+                    )
+                else:
+                    wd_item.set_description(self.description_en, lang="en")
+                    item_is_changed = True
+
+            if self.description_pl:
+                description_pl = wd_item.get_description("pl")
+                if description_pl == self.description_pl:
+                    print(
+                        f'SKIP: element: {search_id} ({self.label_en}) posiada już dla języka: "pl" opis: {self.description_pl}'
+                    )
+                else:
+                    wd_item.set_description(self.description_pl, lang="pl")
+                    item_is_changed = True
+
+        # jeżeli nie znaleziono w wikibase
+        else:
+            wd_item = wbi_core.ItemEngine(new_item=True, data=data)
+            mode = "added: "
+            # tylko dla nowych jest ustawiania en i pl etykieta oraz opisy
+            wd_item.set_label(self.label_en, lang="en")
+            if self.description_en:
+                wd_item.set_description(self.description_en, lang="en")
+            wd_item.set_label(self.label_pl, lang="pl")
+            if self.description_pl:
+                wd_item.set_description(self.description_pl, lang="pl")
+
         # zapis w Wikibase jeżeli nowy element lub zmiany dla elementu
         if not search_item or item_is_changed:
             try:
                 if WIKIBASE_WRITE:
                     new_id = wd_item.write(login_instance, entity_type="item")
+                    ENTITY_CACHE.update(wd_item)
+                    # nowy element - nieaktualne wyniki wyszukiwania jego etykiet
+                    if not search_item:
+                        LABEL_CACHE.invalidate(self.label_en)
+                        LABEL_CACHE.invalidate(self.label_pl)
+                    if self.purl_identifier:
+                        PURL_INDEX.add(self.purl_identifier, new_id)
                 else:
-                    new_id = "TEST"
+                    new_id = CHANGESET.write(wd_item, entity_type="item")
+                    if self.purl_identifier:
+                        PURL_INDEX.add(self.purl_identifier, new_id)
 
                 if search_item:
                     new_id = search_id
@@ -1093,28 +2312,10 @@ class WDHItem:
                 else:
                     GLOBAL_ITEM["-/" + self.label_pl] = new_id
 
-                # deklaracje dla elementu
-                data = []
-                if wiki_dane:
-                    data.append(wiki_dane)
-                if wiki_starts:
-                    data.append(wiki_starts)
-                if wiki_ends:
-                    data.append(wiki_ends)
-                if wiki_instance:
-                    data.append(wiki_instance)
-                if wiki_purl:
-                    data.append(wiki_purl)
-
-                if data and WIKIBASE_WRITE:
-                    wd_statement = wbi_core.ItemEngine(
-                        item_id=new_id, data=data, debug=False
-                    )
-                    wd_statement.write(login_instance, entity_type="item")
-
                 print(mode + new_id + f" ({self.label_en})")
             except (MWApiError, KeyError) as error_add_element:
                 print("ERROR: ", self.label_en, "(", error_add_element.error_msg, ")")
+                return False
         # jeżeli nie nowy element i nie ma zmian do zapisu
         else:
             if self.label_en:
@@ -1122,6 +2323,8 @@ class WDHItem:
             else:
                 GLOBAL_ITEM["-/" + self.label_pl] = search_id
 
+        return True
+
 
 class WDHStatementItem:
     """Klasa dla deklaracji (statement) dla elementów"""
@@ -1192,13 +2395,13 @@ class WDHStatementItem:
     def write_to_wikibase(self):
         """zapis deklaracji dla elementu w instancji wikibase
         także zapis aliasu, opisu, dodatkowej etykiety dla elementu - zależnie od wartości
-        self.statement_property
+        self.statement_property, zwraca False jeżeli wiersza nie udało się przetworzyć
         """
         # print("KWALIFIKATORY: ", self.qualifiers)
         is_ok, p_id = find_name_qid(self.label_en, "item")
         if not is_ok:
             print("ERROR:", f"brak elementu -> {self.label_en}")
-            return
+            return False
 
         # jeżeli to alias?
         if self.statement_property in (
@@ -1226,7 +2429,7 @@ class WDHStatementItem:
             "Ahe",
         ):
             try:
-                wd_item = wbi_core.ItemEngine(item_id=p_id)
+                wd_item = ENTITY_CACHE.get_item(p_id)
                 lang = self.statement_property[1:]
                 aliasy = wd_item.get_aliases(lang=lang)
                 if self.statement_value in aliasy:
@@ -1237,11 +2440,15 @@ class WDHStatementItem:
                     wd_item.set_aliases(
                         self.statement_value, lang=self.statement_property[-2:]
                     )
-                    if WIKIBASE_WRITE:
-                        wd_item.write(login_instance, entity_type="item")
-                    print(
-                        f"ALIAS ADDED, item {p_id} ({self.label_en}): {self.statement_property} -> {self.statement_value}"
-                    )
+                    message = f"ALIAS ADDED, item {p_id} ({self.label_en}): {self.statement_property} -> {self.statement_value}"
+                    if coalesce_edits():
+                        pending_edit(p_id).stage_terms(wd_item, message)
+                    else:
+                        if WIKIBASE_WRITE:
+                            wd_item.write(login_instance, entity_type="item")
+                            ENTITY_CACHE.update(wd_item)
+                            LABEL_CACHE.invalidate(self.statement_value)
+                        print(message)
 
                 # aliasy dla elementów powinny od razu stawać się także deklaracjami właściwości
                 # 'stated as', ale tylko jeżeli są zdefiniowane dla arkusza globalne referencje
@@ -1253,7 +2460,7 @@ class WDHStatementItem:
                             "ERROR:",
                             "w instancji Wikibase brak właściwości -> stated as",
                         )
-                        return
+                        return False
 
                     lang_id = self.statement_property[1:]
                     p_value = f'{lang_id}:"{self.statement_value}"'
@@ -1273,7 +2480,7 @@ class WDHStatementItem:
                                     add_ref_prop, "property"
                                 )
                                 test_ref_exists = verify_reference(
-                                    wd_item,
+                                    p_id,
                                     prop_id,
                                     p_value,
                                     add_ref_qid,
@@ -1289,24 +2496,23 @@ class WDHStatementItem:
                                         "o wartości: ",
                                         add_ref_value,
                                     )
-                                    if WIKIBASE_WRITE:
-                                        clm_id = find_claim_id(
-                                            wd_item, prop_id, p_value
+                                    message = f"REFERENCE: do deklaracji {prop_id} (o wartości {p_value}) dodano referencję: {add_ref_qid} ({add_ref_prop}) o wartości {add_ref_value}"
+                                    clm_id = find_claim_id(p_id, prop_id, p_value)
+                                    if not clm_id:
+                                        print(
+                                            f"ERROR: nie znaleziono GUID deklaracji {prop_id} o wartości {p_value}"
+                                        )
+                                    elif coalesce_edits():
+                                        pending_edit(p_id).add_reference(
+                                            clm_id, add_ref_qid, add_ref_value, message
                                         )
-                                        if clm_id:
-                                            if add_reference(
-                                                login_instance,
-                                                clm_id,
-                                                add_ref_qid,
-                                                add_ref_value,
-                                            ):
-                                                print(
-                                                    f"REFERENCE: do deklaracji {prop_id} (o wartości {p_value}) dodano referencję: {add_ref_qid} ({add_ref_prop}) o wartości {add_ref_value}"
-                                                )
-                                        else:
-                                            print(
-                                                f"ERROR: nie znaleziono GUID deklaracji {prop_id} o wartości {p_value}"
-                                            )
+                                    elif add_reference(
+                                        login_instance,
+                                        clm_id,
+                                        add_ref_qid,
+                                        add_ref_value,
+                                    ):
+                                        print(message)
 
                     else:
                         # wartości deklaracji 'stated as' są dołączane do istniejących, nie zastępują poprzednich!
@@ -1321,30 +2527,33 @@ class WDHStatementItem:
                         if st_data:
                             try:
                                 data = [st_data]
-                                wd_statement = wbi_core.ItemEngine(
-                                    item_id=p_id, data=data, debug=False
-                                )
-                                if WIKIBASE_WRITE:
-                                    wd_statement.write(
-                                        login_instance, entity_type="item"
-                                    )
-
-                                print(
-                                    f"STATEMENT ADDED, {p_id} ({self.label_en}): {prop_id} -> {p_value}"
-                                )
+                                wd_statement = ENTITY_CACHE.get_item(p_id, data=data)
+                                message = f"STATEMENT ADDED, {p_id} ({self.label_en}): {prop_id} -> {p_value}"
+                                if coalesce_edits():
+                                    pending_edit(p_id).stage_claims(wd_statement, message)
+                                else:
+                                    if WIKIBASE_WRITE:
+                                        wd_statement.write(
+                                            login_instance, entity_type="item"
+                                        )
+                                        ENTITY_CACHE.update(wd_statement)
+                                    print(message)
                             except (MWApiError, KeyError, ValueError):
                                 print(
                                     f"ERROR, {p_id} ({self.label_en}): {prop_id} -> {p_value}"
                                 )
+                                return False
                         else:
                             print(
                                 f"INVALID DATA, {p_id} ({self.label_en}): {prop_id} -> {p_value}"
                             )
+                            return False
 
             except (MWApiError, KeyError, ValueError):
                 print(
                     f"ERROR: item {p_id} ({self.label_en}): {self.statement_property} -> {self.statement_value}"
                 )
+                return False
 
         # jeżeli to etykieta
         elif self.statement_property in (
@@ -1372,7 +2581,7 @@ class WDHStatementItem:
             "Lhe",
         ):
             try:
-                wd_item = wbi_core.ItemEngine(item_id=p_id)
+                wd_item = ENTITY_CACHE.get_item(p_id)
                 lang = self.statement_property[1:]
                 current_label = wd_item.get_label(lang)
                 if self.statement_value == current_label:
@@ -1385,16 +2594,23 @@ class WDHStatementItem:
                         lang=self.statement_property[-2:],
                         if_exists="REPLACE",
                     )
-                    if WIKIBASE_WRITE:
-                        wd_item.write(login_instance, entity_type="item")
-                    print(
-                        f"LABEL ADDED/MODIFIED, item {p_id} ({self.label_en}): {self.statement_property} -> {self.statement_value}"
-                    )
+                    message = f"LABEL ADDED/MODIFIED, item {p_id} ({self.label_en}): {self.statement_property} -> {self.statement_value}"
+                    if coalesce_edits():
+                        pending_edit(p_id).stage_terms(wd_item, message)
+                    else:
+                        if WIKIBASE_WRITE:
+                            wd_item.write(login_instance, entity_type="item")
+                            ENTITY_CACHE.update(wd_item)
+                            # zmiana etykiety - nieaktualne wyniki wyszukiwania
+                            LABEL_CACHE.invalidate_id(p_id)
+                            LABEL_CACHE.invalidate(self.statement_value)
+                        print(message)
 
             except (MWApiError, KeyError, ValueError):
                 print(
                     f"ERROR: item {p_id} ({self.label_en}): {self.statement_property} -> {self.statement_value}"
                 )
+                return False
 
         # jeżeli to opis (description)
         elif self.statement_property in (
@@ -1422,7 +2638,7 @@ class WDHStatementItem:
             "Dhe",
         ):
             try:
-                wd_item = wbi_core.ItemEngine(item_id=p_id)
+                wd_item = ENTITY_CACHE.get_item(p_id)
                 lang = self.statement_property[1:]
                 current_desc = wd_item.get_description(lang)
                 if self.statement_value == current_desc:
@@ -1435,16 +2651,20 @@ class WDHStatementItem:
                         lang=self.statement_property[-2:],
                         if_exists="REPLACE",
                     )
-                    if WIKIBASE_WRITE:
-                        wd_item.write(login_instance, entity_type="item")
-                    print(
-                        f"DESCRIPTION ADDED/MODIFIED, item {p_id} ({self.label_en}): {self.statement_property} -> {self.statement_value}"
-                    )
+                    message = f"DESCRIPTION ADDED/MODIFIED, item {p_id} ({self.label_en}): {self.statement_property} -> {self.statement_value}"
+                    if coalesce_edits():
+                        pending_edit(p_id).stage_terms(wd_item, message)
+                    else:
+                        if WIKIBASE_WRITE:
+                            wd_item.write(login_instance, entity_type="item")
+                            ENTITY_CACHE.update(wd_item)
+                        print(message)
 
             except (MWApiError, KeyError, ValueError):
                 print(
                     f"ERROR: item {p_id} ({self.label_en}): {self.statement_property} -> {self.statement_value}"
                 )
+                return False
 
         # jeżeli to deklaracja?
         else:
@@ -1454,7 +2674,7 @@ class WDHStatementItem:
                     "ERROR:",
                     f"w instancji wikibase brak właściwości -> {self.statement_property}",
                 )
-                return
+                return False
 
             if self.qualifiers:
                 # zmiana nazwy kwalifikatora na jego Q
@@ -1466,7 +2686,7 @@ class WDHStatementItem:
                             "ERROR:",
                             f"w instancji Wikibase brak właściwości -> {q_key}",
                         )
-                        return
+                        return False
 
                     tmp[qualifier_id] = value
                     # modyfikacja wartości jeżeli to typ time (point in time)
@@ -1485,7 +2705,7 @@ class WDHStatementItem:
                         "ERROR:",
                         f"w instancji Wikibase brak elementu -> {self.statement_value} będącego wartością -> {self.statement_property}",
                     )
-                    return
+                    return False
             elif prop_type == "wikibase-property":
                 is_ok, p_value = find_name_qid(self.statement_value, "property")
                 if not is_ok:
@@ -1493,7 +2713,7 @@ class WDHStatementItem:
                         "ERROR:",
                         f"w instancji Wikibase brak właściwości -> {self.statement_value} będącej wartością -> {self.statement_property}",
                     )
-                    return
+                    return False
             else:
                 p_value = self.statement_value
 
@@ -1508,7 +2728,7 @@ class WDHStatementItem:
                             "ERROR:",
                             f"w instancji Wikibase brak elementu -> {value} będącego wartością kwalifikatora -> {key}",
                         )
-                        return
+                        return False
                 elif qualifier_type == "wikibase-property":
                     is_ok, q_value = find_name_qid(value, "property")
                     if not is_ok:
@@ -1516,7 +2736,7 @@ class WDHStatementItem:
                             "ERROR:",
                             f"brak właściwości -> {value} będącej wartością kwalifikatora -> {key}",
                         )
-                        return
+                        return False
                 else:
                     q_value = value
 
@@ -1539,7 +2759,6 @@ class WDHStatementItem:
                 )
 
                 # weryfikacja czy ma referencje z referencji globalnych
-                wd_item = wbi_core.ItemEngine(item_id=p_id)
                 if self.additional_references:
                     for (
                         add_ref_prop,
@@ -1547,7 +2766,7 @@ class WDHStatementItem:
                     ) in self.additional_references.items():
                         is_ok, add_ref_qid = find_name_qid(add_ref_prop, "property")
                         test_ref_exists = verify_reference(
-                            wd_item, prop_id, p_value, add_ref_qid, add_ref_value
+                            p_id, prop_id, p_value, add_ref_qid, add_ref_value
                         )
                         # jeźeli brak to próba dodania referencji globalnej
                         if not test_ref_exists:
@@ -1559,46 +2778,53 @@ class WDHStatementItem:
                                 add_ref_value,
                                 f" w deklaracji {prop_id} dla elementu {p_id}",
                             )
-                            if WIKIBASE_WRITE:
-                                clm_id = find_claim_id(wd_item, prop_id, p_value)
-                                if clm_id:
-                                    if add_reference(
-                                        login_instance,
-                                        clm_id,
-                                        add_ref_qid,
-                                        add_ref_value,
-                                    ):
-                                        print(
-                                            f"REFERENCE: do deklaracji {prop_id} (o wartości {p_value}) dodano referencję: {add_ref_qid} ({add_ref_prop}) o wartości {add_ref_value}"
-                                        )
-                                else:
-                                    print(
-                                        f"ERROR: nie znaleziono GUID deklaracji {prop_id} o wartości {p_value}"
-                                    )
+                            message = f"REFERENCE: do deklaracji {prop_id} (o wartości {p_value}) dodano referencję: {add_ref_qid} ({add_ref_prop}) o wartości {add_ref_value}"
+                            clm_id = find_claim_id(p_id, prop_id, p_value)
+                            if not clm_id:
+                                print(
+                                    f"ERROR: nie znaleziono GUID deklaracji {prop_id} o wartości {p_value}"
+                                )
+                            elif coalesce_edits():
+                                pending_edit(p_id).add_reference(
+                                    clm_id, add_ref_qid, add_ref_value, message
+                                )
+                            elif add_reference(
+                                login_instance,
+                                clm_id,
+                                add_ref_qid,
+                                add_ref_value,
+                            ):
+                                print(message)
 
                 # weryfikacja czy deklaracja ma wszystkie kwalifikatory, a jeżeli nie to
                 # uzupełnianie kwalifikatorów
                 if self.qualifiers:
-                    q_list = get_qualifiers(wd_item, prop_id, p_value)
+                    q_list = get_qualifiers(p_id, prop_id, p_value)
                     # print(q_list)
                     for qualifier_key, qualifier_value in self.qualifiers.items():
                         qw_exists = check_if_qw_exists(
                             q_list, qualifier_key, qualifier_value
                         )
                         if not qw_exists:
-                            if WIKIBASE_WRITE:
-                                clm_id = find_claim_id(wd_item, prop_id, p_value)
-                                if clm_id:
-                                    add_qualifier(
-                                        login_instance,
-                                        clm_id,
-                                        qualifier_key,
-                                        qualifier_value,
-                                    )
-                                else:
-                                    print(
-                                        f"ERROR: nie znaleziono GUID deklaracji {prop_id} o wartości {p_value}"
-                                    )
+                            clm_id = find_claim_id(p_id, prop_id, p_value)
+                            if not clm_id:
+                                print(
+                                    f"ERROR: nie znaleziono GUID deklaracji {prop_id} o wartości {p_value}"
+                                )
+                            elif coalesce_edits():
+                                pending_edit(p_id).add_qualifier(
+                                    clm_id,
+                                    qualifier_key,
+                                    qualifier_value,
+                                    f"QUALIFIER ADDED, {p_id} ({self.label_en}): {prop_id} -> {p_value}, {qualifier_key} -> {qualifier_value}",
+                                )
+                            else:
+                                add_qualifier(
+                                    login_instance,
+                                    clm_id,
+                                    qualifier_key,
+                                    qualifier_value,
+                                )
 
             else:
                 st_data = create_statement_data(
@@ -1612,27 +2838,271 @@ class WDHStatementItem:
                 if st_data:
                     try:
                         data = [st_data]
-                        wd_statement = wbi_core.ItemEngine(
-                            item_id=p_id, data=data, debug=False
-                        )
-                        if WIKIBASE_WRITE:
-                            wd_statement.write(login_instance, entity_type="item")
-                        print(
-                            f"STATEMENT ADDED, {p_id} ({self.label_en}): {prop_id} -> {self.statement_value}"
-                        )
+                        wd_statement = ENTITY_CACHE.get_item(p_id, data=data)
+                        message = f"STATEMENT ADDED, {p_id} ({self.label_en}): {prop_id} -> {self.statement_value}"
+                        if coalesce_edits():
+                            pending_edit(p_id).stage_claims(wd_statement, message)
+                        else:
+                            if WIKIBASE_WRITE:
+                                wd_statement.write(login_instance, entity_type="item")
+                                ENTITY_CACHE.update(wd_statement)
+                            print(message)
                     except (MWApiError, KeyError, ValueError):
                         print(
                             f"ERROR, {p_id} ({self.label_en}): {prop_id} -> {self.statement_value}"
                         )
+                        return False
                 else:
                     print(
                         f"INVALID DATA, {p_id} ({self.label_en}): {prop_id} -> {self.statement_value}"
                     )
+                    return False
+
+        return True
 
 
 # --- funkcje ---
 
 
+def workbook_paths(paths: list) -> list:
+    """lista plików xlsx: pliki w podanej kolejności, katalogi - pliki xlsx
+    z katalogu w kolejności nazw
+    """
+    workbooks = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            workbooks += sorted(
+                x for x in path.glob("*.xlsx") if not x.name.startswith("~$")
+            )
+        else:
+            workbooks.append(path)
+
+    return workbooks
+
+
+def import_workbook(filename, workers: int, resume: bool = False, offline: bool = False) -> dict:
+    """import jednego pliku xlsx, zwraca statystyki pliku"""
+    start_time = time.time()
+    EVENT_LOG.bind(file=str(filename))
+    print(f"WORKBOOK: {filename}")
+    STATS.begin_file(filename)
+    stats = {"file": str(filename), "status": "ok"}
+    properties_before = len(GLOBAL_PROPERTY)
+    items_before = len(GLOBAL_ITEM)
+    changes_before = Counter(CHANGESET.summary())
+
+    # globalne referencje i listy wierszy arkuszy (z pamięci podręcznej jeżeli
+    # plik nie zmienił się od poprzedniego odczytu)
+    plik_xlsx = WDHSpreadsheet(filename)
+    try:
+        with STATS.phase("read"):
+            (
+                property_list,
+                property_statement_list,
+                item_list,
+                item_statement_list,
+            ) = plik_xlsx.read()
+    except SystemExit:
+        # błędna struktura pliku (komunikat wyświetlony przy odczycie)
+        plik_xlsx.close()
+        print(f"ERROR: plik {filename} pominięty (błędna struktura pliku)")
+        stats.update(status="error", rows={}, skipped=0, unchanged=0, done=0, errors=0,
+                     properties=0, items=0, time=round(time.time() - start_time, 2))
+        return stats
+    stats["rows"] = {
+        "P_list": len(property_list),
+        "P_statements": len(property_statement_list),
+        "Q_list": len(item_list),
+        "Q_statements": len(item_statement_list),
+    }
+
+    # dziennik importu (wynik każdego wiersza), przy wznawianiu wiersze zapisane
+    # wcześniej są pomijane, a listy GLOBAL_PROPERTY/GLOBAL_ITEM odtwarzane
+    journal_path = CACHE_DIR / "journal" / f"{Path(filename).stem}.jsonl"
+    # odciski wierszy: wiersze niezmienione od ostatniego importu (także ich
+    # encje) są pomijane
+    fingerprint_path = CACHE_DIR / "fingerprints" / f"{Path(filename).stem}.json"
+    JOURNAL.open(journal_path, write=WIKIBASE_WRITE,
+                 fingerprint_path=fingerprint_path if SKIP_UNCHANGED else None)
+    property_list = JOURNAL.rows("P_list", property_list, resume)
+    property_statement_list = JOURNAL.rows("P_statements", property_statement_list, resume)
+    item_list = JOURNAL.rows("Q_list", item_list, resume)
+    item_statement_list = JOURNAL.rows("Q_statements", item_statement_list, resume)
+    if resume:
+        print(f"JOURNAL: {journal_path}, pominięte wiersze (zapisane wcześniej): {JOURNAL.skipped}")
+    if JOURNAL.unchanged:
+        print(f"FINGERPRINT: {fingerprint_path}, pominięte wiersze (niezmienione): {JOURNAL.unchanged}")
+
+    # zbiorcze pobranie encji, do których odwołują się arkusze, pobrane encje
+    # uzupełniają migawkę (do pracy offline: --snapshot)
+    prefetch = WDHPrefetch(
+        property_list, property_statement_list, item_list, item_statement_list
+    )
+    with STATS.phase("purl"):
+        stats["purl_missing"], stats["purl_ambiguous"] = prefetch.check_purls()
+    if PREFETCH and not offline:
+        with STATS.phase("prefetch"):
+            prefetch.run()
+        with STATS.phase("snapshot"):
+            # bez encji zmienionych w zestawieniu zmian (poprzednie pliki)
+            saved = save_snapshot(exclude=CHANGESET.entity_ids())
+            print(f"SNAPSHOT: zapisano encji: {saved} ({SNAPSHOT_PATH})")
+        # bez zapisu - dalsze przetwarzanie tylko na pobranych encjach
+        if not WIKIBASE_WRITE:
+            set_offline()
+
+    # kontrola unikalności elementów 'strukturalnych' ('definicyjnych')
+    unique_item_en = []
+    unique_item_pl = []
+    unique_error = False
+    for wb_item in item_list:
+        # angielski
+        lbl_desc_en = wb_item.label_en + "|" + wb_item.description_en
+        if lbl_desc_en in unique_item_en:
+            print("ERROR: etykieta i opis w języku ang powtarzają się: ", lbl_desc_en)
+            unique_error = True
+        else:
+            unique_item_en.append(lbl_desc_en)
+
+        # polski
+        lbl_desc_pl = wb_item.label_pl + "|" + wb_item.description_pl
+        if lbl_desc_pl in unique_item_pl:
+            print("ERROR: etykieta i opis w języku pl powtarzają się: ", lbl_desc_pl)
+            unique_error = True
+        else:
+            unique_item_pl.append(lbl_desc_pl)
+
+    if unique_error:
+        print(f"ERROR: plik {filename} pominięty (powtórzone elementy)")
+        stats["status"] = "error"
+    else:
+        # plan importu: zależności między wierszami wszystkich arkuszy, kolejność
+        # topologiczna, raport cykli i nierozpoznanych odwołań
+        planner = WDHPlanner(
+            property_list, property_statement_list, item_list, item_statement_list
+        )
+        with STATS.phase("plan"):
+            tasks, task_deps = planner.plan()
+        stats["cycles"] = len(planner.cycles)
+        stats["unresolved"] = len(planner.unresolved)
+        if not WIKIBASE_WRITE:
+            # tymczasowe identyfikatory nowych encji w kolejności planu -
+            # powtarzalne zestawienie zmian także przy pracy równoległej
+            for task in tasks:
+                if task.provides:
+                    CHANGESET.reserve(task, task.provides[0][0])
+
+        # właściwości, deklaracje właściwości, elementy i deklaracje elementów -
+        # wiersz jest przetwarzany gdy gotowe są encje, do których się odwołuje
+        with STATS.phase("execute"):
+            WDHExecutor(workers).run(tasks, task_deps)
+
+        # zmiany elementów zebrane z arkusza Q_statements - jeden zapis na element
+        with STATS.phase("write"):
+            write_pending_edits(workers)
+        CHANGESET.release()
+
+    # kolejny plik może odwoływać się do encji spoza migawki tego pliku
+    if PREFETCH and not offline and not WIKIBASE_WRITE:
+        set_offline(False)
+        # wyniki wyszukiwania uwzględniają encje z zestawienia zmian
+        if len(CHANGESET):
+            LABEL_CACHE.persistent = False
+
+    JOURNAL.close()
+    stats["skipped"] = JOURNAL.skipped
+    stats["unchanged"] = JOURNAL.unchanged
+    stats["done"] = JOURNAL.stats["done"]
+    stats["errors"] = JOURNAL.stats["error"]
+    stats["properties"] = len(GLOBAL_PROPERTY) - properties_before
+    stats["items"] = len(GLOBAL_ITEM) - items_before
+    if not WIKIBASE_WRITE:
+        stats["changes"] = dict(Counter(CHANGESET.summary()) - changes_before)
+    stats.update(STATS.file_stats(filename))
+    stats["time"] = round(time.time() - start_time, 2)
+    EVENT_LOG.event("error" if stats["status"] == "error" else "info", "workbook", **stats)
+
+    return stats
+
+
+def import_report(workbook_stats: list) -> dict:
+    """raport importu: statystyki plików i łączne, wyświetlane i zwracane"""
+    total = Counter()
+    for stats in workbook_stats:
+        for key in ("skipped", "unchanged", "done", "errors", "properties", "items", "purl_missing",
+                    "purl_ambiguous", "time"):
+            total[key] += stats.get(key, 0)
+        total["rows"] += sum(stats["rows"].values())
+        print(
+            f"REPORT: {stats['file']}: {stats['status']}, wiersze: {sum(stats['rows'].values())}, "
+            f"pominięte: {stats['skipped']}, niezmienione: {stats.get('unchanged', 0)}, "
+            f"przetworzone: {stats['done']}, błędy: {stats['errors']}, "
+            f"właściwości: {stats['properties']}, elementy: {stats['items']}, czas: {stats['time']} s"
+        )
+    total["time"] = round(total["time"], 2)
+    print(
+        f"REPORT: razem plików: {len(workbook_stats)}, wiersze: {total['rows']}, "
+        f"pominięte: {total['skipped']}, niezmienione: {total['unchanged']}, "
+        f"przetworzone: {total['done']}, błędy: {total['errors']}, "
+        f"właściwości: {total['properties']}, elementy: {total['items']}, czas: {total['time']} s"
+    )
+
+    return {"files": workbook_stats, "total": dict(total)}
+
+
+def coalesce_edits() -> bool:
+    """czy zmiany elementów zbierać w WDHEntityEdit - bez zapisu do Wikibase
+    zawsze (są źródłem zestawienia zmian)
+    """
+    return COALESCE_EDITS or not WIKIBASE_WRITE
+
+
+def pending_edit(entity_id: str) -> WDHEntityEdit:
+    """zwraca obiekt zbierający zmiany encji oczekujące na zapis"""
+    with PENDING_EDITS_LOCK:
+        if entity_id not in PENDING_EDITS:
+            PENDING_EDITS[entity_id] = WDHEntityEdit(entity_id)
+        entity_edit = PENDING_EDITS[entity_id]
+
+    # wiersz będzie zapisany w dzienniku importu po zapisie zmian encji
+    JOURNAL.stage(entity_edit)
+
+    return entity_edit
+
+
+def write_pending_edits(workers: int = 1):
+    """zapis zmian wszystkich encji oczekujących na zapis (jeden zapis na encję,
+    encje zapisywane równolegle)
+    """
+    with PENDING_EDITS_LOCK:
+        edits = list(PENDING_EDITS.values())
+        PENDING_EDITS.clear()
+
+    tasks = [
+        WDHTask(f"SAVE: {entity_edit.entity_id}", entity_edit.write, entity_edit.entity_id)
+        for entity_edit in edits
+    ]
+    WDHExecutor(workers).run(tasks)
+
+
+def import_property(p_dane: WDHProperty) -> bool:
+    """dodanie lub aktualizacja właściwości, z raportem wyniku"""
+    result, info = add_property(p_dane)
+    print(result, f"Property {info}")
+
+    return result
+
+
+def import_property_statement(s_item: WDHStatementProperty) -> bool:
+    """dodanie deklaracji właściwości, z raportem wyniku"""
+    result, info = add_property_statement(s_item)
+    print(result, f"{info}")
+
+    # SKIP - deklaracja już istnieje, wiersz nie wymaga ponownego przetwarzania
+    return result or info.startswith("SKIP")
+
+
 def add_property(p_dane: WDHProperty) -> tuple:
     """
     funkcja dodaje nową właściwość
@@ -1645,34 +3115,6 @@ def add_property(p_dane: WDHProperty) -> tuple:
         print(
             f"Property: '{p_dane.label_en}' already exists: {search_id}, update mode."
         )
-        wd_item = wbi_core.ItemEngine(item_id=search_id)
-        mode = "updated: "
-        description_en = wd_item.get_description("en")
-        if description_en == p_dane.description_en:
-            print(
-                f'SKIP: właściwość: {search_id} ({p_dane.label_en}) posiada już opis w języku: "en" o wartości: {description_en}'
-            )
-        else:
-            wd_item.set_description(p_dane.description_en, lang="en")
-
-        description_pl = wd_item.get_description("pl")
-        if description_pl == p_dane.description_pl:
-            print(
-                f'SKIP: właściwość: {search_id} ({p_dane.label_en}) posiada już opis w języku: "pl" o wartości: {description_pl}'
-            )
-        else:
-            wd_item.set_description(p_dane.description_pl, lang="pl")
-    else:
-        print("New property")
-        wd_item = wbi_core.ItemEngine(new_item=True)
-        mode = "added: "
-        # etykiety i opisy
-        wd_item.set_label(p_dane.label_en, lang="en")
-        wd_item.set_description(p_dane.description_en, lang="en")
-        if p_dane.label_pl:
-            wd_item.set_label(p_dane.label_pl, lang="pl")
-        if p_dane.description_pl:
-            wd_item.set_description(p_dane.description_pl, lang="pl")
 
     # Wikidata ID i Wikidata URL (reference URL)
     wiki_dane = None
@@ -1721,6 +3163,44 @@ def add_property(p_dane: WDHProperty) -> tuple:
                     value=inv_pid, prop_nr=wikibase_prop.inverse
                 )
 
+    # deklaracje dla właściwości - zapisywane razem z etykietami i opisami
+    # (jeden zapis w Wikibase)
+    data = []
+    if wiki_dane:
+        data.append(wiki_dane)
+    if inverse_dane:
+        data.append(inverse_dane)
+
+    if search_property:
+        wd_item = ENTITY_CACHE.get_item(search_id, data=data)
+        mode = "updated: "
+        description_en = wd_item.get_description("en")
+        if description_en == p_dane.description_en:
+            print(
+                f'SKIP: właściwość: {search_id} ({p_dane.label_en}) posiada już opis w języku: "en" o wartości: {description_en}'
+            )
+        else:
+            wd_item.set_description(p_dane.description_en, lang="en")
+
+        description_pl = wd_item.get_description("pl")
+        if description_pl == p_dane.description_pl:
+            print(
+                f'SKIP: właściwość: {search_id} ({p_dane.label_en}) posiada już opis w języku: "pl" o wartości: {description_pl}'
+            )
+        else:
+            wd_item.set_description(p_dane.description_pl, lang="pl")
+    else:
+        print("New property")
+        wd_item = wbi_core.ItemEngine(new_item=True, data=data)
+        mode = "added: "
+        # etykiety i opisy
+        wd_item.set_label(p_dane.label_en, lang="en")
+        wd_item.set_description(p_dane.description_en, lang="en")
+        if p_dane.label_pl:
+            wd_item.set_label(p_dane.label_pl, lang="pl")
+        if p_dane.description_pl:
+            wd_item.set_description(p_dane.description_pl, lang="pl")
+
     # typy danych dla property: 'string', 'wikibase-item', 'wikibase-property',
     # 'monolingualtext', 'external-id', 'quantity', 'time', 'geo-shape', 'url',
     # 'globe-coordinate'
@@ -1729,8 +3209,14 @@ def add_property(p_dane: WDHProperty) -> tuple:
     try:
         if WIKIBASE_WRITE:
             p_new_id = wd_item.write(login_instance, entity_type="property", **options)
+            ENTITY_CACHE.update(wd_item)
+            # nowa właściwość - nieaktualne wyniki wyszukiwania jej etykiet
+            if not search_property:
+                LABEL_CACHE.invalidate(p_dane.label_en)
+                LABEL_CACHE.invalidate(p_dane.label_pl)
+                PROPERTY_TYPES.register(p_new_id, p_dane.datatype)
         else:
-            p_new_id = "TEST"
+            p_new_id = CHANGESET.write(wd_item, entity_type="property", **options)
 
         if search_property:
             p_new_id = search_id
@@ -1738,30 +3224,15 @@ def add_property(p_dane: WDHProperty) -> tuple:
         # zapis id nowej lub modyfikowanej właściwości
         GLOBAL_PROPERTY[p_dane.label_en + "/" + p_dane.label_pl] = p_new_id
 
-        # deklaracje dla właściwości
-        data = []
-        if wiki_dane:
-            data.append(wiki_dane)
-        if inverse_dane:
-            data.append(inverse_dane)
-
-        if len(data) > 0:
-            if WIKIBASE_WRITE:
-                wd_statement = wbi_core.ItemEngine(
-                    item_id=p_new_id, data=data, debug=False
-                )
-                wd_statement.write(login_instance, entity_type="property")
-
         # jeżeli dodano właściwość inverse_property do dla docelowej właściwości należy
         # dodać odwrotność: nową właściwość jako jej inverse_property
         if inverse_dane:
-            if WIKIBASE_WRITE:
-                inv_statement = WDHStatementProperty(
-                    inv_pid, wikibase_prop.inverse, p_new_id
-                )
-                add_res, add_info = add_property_statement(inv_statement)
-                if not add_res:
-                    print(f"{add_info}")
+            inv_statement = WDHStatementProperty(
+                inv_pid, wikibase_prop.inverse, p_new_id
+            )
+            add_res, add_info = add_property_statement(inv_statement)
+            if not add_res:
+                print(f"{add_info}")
 
         add_result = (True, mode + " qid:" + p_new_id + f" ({p_dane.label_en})")
 
@@ -1771,6 +3242,21 @@ def add_property(p_dane: WDHProperty) -> tuple:
     return add_result
 
 
+def name_search_query(name: str, elem_type: str, strict: bool = False) -> tuple:
+    """wyszukiwanie (argumenty element_search), które wykona find_name_qid
+    dla nazwy, None - nazwa jest identyfikatorem, purl lub jest w indeksie etykiet
+    """
+    if name in ("somevalue", "novalue"):
+        return None
+    pattern = r"^P\d{1,9}$" if elem_type == "property" else r"^Q\d{1,9}$"
+    if re.search(pattern, name) or re.search(r"https?:\/\/purl\.org\/", name):
+        return None
+    if LABEL_INDEX.get(name, elem_type) or LABEL_INDEX.complete(elem_type):
+        return None
+
+    return (name, elem_type, "en", {"strict": strict})
+
+
 def find_name_qid(name: str, elem_type: str, strict: bool = False) -> tuple:
     """Funkcja sprawdza czy przekazany argument jest identyfikatorem właściwości/elementu
     jeżeli nie to szuka w wikibase właściwości/elementu o etykiecie (ang) równej argumentowi
@@ -1799,16 +3285,33 @@ def find_name_qid(name: str, elem_type: str, strict: bool = False) -> tuple:
         if match:
             f_result, purl_qid = find_name_qid("purl identifier", "property")
             if f_result:
-                output = search_by_purl(purl_qid, name)
+                purl_items = PURL_INDEX.get(name)
+                if purl_items is None:
+                    PURL_INDEX.load_values(purl_qid, [name])
+                    purl_items = PURL_INDEX.get(name) or []
+                if len(purl_items) == 1:
+                    output = (True, purl_items[0])
+                else:
+                    output = (
+                        False,
+                        f"ERROR: brak wyniku lub niejednoznaczny wynik wyszukiwania elementu z identyfikatorem Purl (znaleziono: {len(purl_items)}).",
+                    )
                 if not output[0]:
                     output = (False, f"INVALID DATA, {elem_type}: {name}, {output[1]}")
             else:
                 output = (False, f"ERROR: {purl_qid}")
-        # zwykłe wyszukiwanie
+        # właściwości i elementy strukturalne - dokładna etykieta z indeksu,
+        # brak w indeksie elementu - zwykłe wyszukiwanie
         else:
-            output = element_search(name, elem_type, "en", strict=strict)
-            if not output[0]:
-                output = (False, f"INVALID DATA, {elem_type}: {name}, {output[1]}")
+            index_ids = LABEL_INDEX.get(name, elem_type)
+            if index_ids:
+                output = (True, index_ids[0])
+            elif LABEL_INDEX.complete(elem_type):
+                output = (False, f"INVALID DATA, {elem_type}: {name}, NOT FOUND")
+            else:
+                output = element_search(name, elem_type, "en", strict=strict)
+                if not output[0]:
+                    output = (False, f"INVALID DATA, {elem_type}: {name}, {output[1]}")
 
     return output
 
@@ -2187,7 +3690,7 @@ def add_property_statement(s_item: WDHStatementProperty) -> tuple:
         "Ahe",
     ):
         try:
-            wd_item = wbi_core.ItemEngine(item_id=p_id)
+            wd_item = ENTITY_CACHE.get_item(p_id)
             lang = s_item.statement_property[1:]
             aliasy = wd_item.get_aliases(lang=lang)
             if s_item.statement_value in aliasy:
@@ -2201,6 +3704,10 @@ def add_property_statement(s_item: WDHStatementProperty) -> tuple:
                 )
                 if WIKIBASE_WRITE:
                     wd_item.write(login_instance, entity_type="property")
+                    ENTITY_CACHE.update(wd_item)
+                    LABEL_CACHE.invalidate(s_item.statement_value)
+                else:
+                    CHANGESET.write(wd_item, entity_type="property")
                 add_result = (
                     True,
                     f"ALIAS ADDED, właściwość: {p_id} ({s_item.label_en}): {s_item.statement_property} -> {s_item.statement_value}",
@@ -2236,7 +3743,7 @@ def add_property_statement(s_item: WDHStatementProperty) -> tuple:
         "Lhe",
     ):
         try:
-            wd_item = wbi_core.ItemEngine(item_id=p_id)
+            wd_item = ENTITY_CACHE.get_item(p_id)
             lang = s_item.statement_property[1:]
             current_label = wd_item.get_label(lang)
             if s_item.statement_value == current_label:
@@ -2252,6 +3759,12 @@ def add_property_statement(s_item: WDHStatementProperty) -> tuple:
                 )
                 if WIKIBASE_WRITE:
                     wd_item.write(login_instance, entity_type="property")
+                    ENTITY_CACHE.update(wd_item)
+                    # zmiana etykiety - nieaktualne wyniki wyszukiwania
+                    LABEL_CACHE.invalidate_id(p_id)
+                    LABEL_CACHE.invalidate(s_item.statement_value)
+                else:
+                    CHANGESET.write(wd_item, entity_type="property")
                 add_result = (
                     True,
                     f"LABEL ADDED/MODIFIED, właściwość {p_id} ({s_item.label_en}): {s_item.statement_property} -> {s_item.statement_value}",
@@ -2289,7 +3802,7 @@ def add_property_statement(s_item: WDHStatementProperty) -> tuple:
         "Dhe",
     ):
         try:
-            wd_item = wbi_core.ItemEngine(item_id=p_id)
+            wd_item = ENTITY_CACHE.get_item(p_id)
             lang = s_item.statement_property[1:]
             current_desc = wd_item.get_description(lang)
             if s_item.statement_value == current_desc:
@@ -2305,6 +3818,9 @@ def add_property_statement(s_item: WDHStatementProperty) -> tuple:
                 )
                 if WIKIBASE_WRITE:
                     wd_item.write(login_instance, entity_type="property")
+                    ENTITY_CACHE.update(wd_item)
+                else:
+                    CHANGESET.write(wd_item, entity_type="property")
                 add_result = (
                     True,
                     f"DESCRIPTION ADDED/MODIFIED, item {p_id}: {s_item.statement_property} -> {s_item.statement_value}",
@@ -2368,11 +3884,12 @@ def add_property_statement(s_item: WDHStatementProperty) -> tuple:
         if st_data:
             try:
                 data = [st_data]
+                wd_statement = ENTITY_CACHE.get_item(p_id, data=data)
                 if WIKIBASE_WRITE:
-                    wd_statement = wbi_core.ItemEngine(
-                        item_id=p_id, data=data, debug=False
-                    )
                     wd_statement.write(login_instance, entity_type="property")
+                    ENTITY_CACHE.update(wd_statement)
+                else:
+                    CHANGESET.write(wd_statement, entity_type="property")
                 add_result = (
                     True,
                     f"STATEMENT ADDED, {p_id}: {prop_id} -> {s_item.statement_value}",
@@ -2393,20 +3910,7 @@ def add_property_statement(s_item: WDHStatementProperty) -> tuple:
 
 def get_property_type(p_id: str) -> str:
     """Funkcja zwraca typ właściwości na podstawie jej identyfikatora"""
-    params = {"action": "wbgetentities", "ids": p_id, "props": "datatype"}
-
-    search_results = mediawiki_api_call_helper(
-        data=params,
-        login=None,
-        mediawiki_api_url=None,
-        user_agent=None,
-        allow_anonymous=True,
-    )
-    data_type = None
-    if search_results:
-        data_type = search_results["entities"][p_id]["datatype"]
-
-    return data_type
+    return PROPERTY_TYPES.get(p_id)
 
 
 def prepare_datetime(t_value: str) -> str:
@@ -2430,22 +3934,6 @@ def add_qualifier(login_data, claim_id: str, prop_nr: str, prop_value: str) -> b
     add_result = False
     prop_type = get_property_type(prop_nr)
 
-    # token
-    params = {"action": "query", "meta": "tokens"}
-
-    try:
-        results = mediawiki_api_call_helper(
-            data=params,
-            login=login_data,
-            mediawiki_api_url=None,
-            user_agent=None,
-            allow_anonymous=False,
-        )
-        token = results["query"]["tokens"]["csrftoken"]
-    except MWApiError as wbsetqualifier_error:
-        print("Error add qualifier - token:", wbsetqualifier_error)
-        return False
-
     snak_type = "value"
 
     if prop_type == "monolingualtext":
@@ -2494,20 +3982,17 @@ def add_qualifier(login_data, claim_id: str, prop_nr: str, prop_value: str) -> b
         "snaktype": snak_type,
         "property": prop_nr,
         "value": snak_encoded,
-        "token": token,
         "bot": True,
     }
 
     try:
-        results = mediawiki_api_call_helper(
-            data=params,
-            login=login_data,
-            mediawiki_api_url=None,
-            user_agent=None,
-            allow_anonymous=False,
-        )
+        results = write_api_call(params, login_data)
         if results["success"] == 1:
             add_result = True
+            if "claim" in results:
+                ENTITY_CACHE.update_claim(
+                    results["claim"], results.get("pageinfo", {}).get("lastrevid")
+                )
     except MWApiError as wbsetqualifier_error:
         print(
             f"Error add qualifier:\n claim_id: {claim_id}, prop_nr: {prop_nr}, snak: {snak_encoded}\n",
@@ -2521,22 +4006,6 @@ def add_reference(login_data, claim_id: str, prop_nr: str, prop_value: str) -> b
     """dodaje odnośnik do deklaracji"""
     add_result = False
 
-    # token
-    params = {"action": "query", "meta": "tokens"}
-
-    try:
-        results = mediawiki_api_call_helper(
-            data=params,
-            login=login_data,
-            mediawiki_api_url=None,
-            user_agent=None,
-            allow_anonymous=False,
-        )
-        token = results["query"]["tokens"]["csrftoken"]
-    except MWApiError as wbsetreference_error:
-        print("Error (add reference - token):", wbsetreference_error)
-        return False
-
     snak_type = "value"
     snak = {
         prop_nr: [
@@ -2553,95 +4022,43 @@ def add_reference(login_data, claim_id: str, prop_nr: str, prop_value: str) -> b
         "action": "wbsetreference",
         "statement": claim_id,
         "snaks": snak_encoded,
-        "token": token,
         "bot": True,
     }
 
     try:
-        results = mediawiki_api_call_helper(
-            data=params,
-            login=login_data,
-            mediawiki_api_url=None,
-            user_agent=None,
-            allow_anonymous=False,
-        )
+        results = write_api_call(params, login_data)
         if results["success"] == 1:
             add_result = True
+            if "reference" in results:
+                ENTITY_CACHE.update_reference(
+                    claim_id,
+                    results["reference"],
+                    results.get("pageinfo", {}).get("lastrevid"),
+                )
     except MWApiError as wbsetreference_error:
         print(f"Error add reference - snak: \n{snak_encoded}\n", wbsetreference_error)
 
     return add_result
 
 
-def find_claim_id(wd_item_test, stat_prop_qid: str, stat_prop_value: str):
+def find_claim_id(entity_id: str, stat_prop_qid: str, stat_prop_value: str) -> str:
     """
     zwraca guid deklaracji lub pusty string
     """
-    if not isinstance(stat_prop_value, str):
-        stat_prop_value = str(stat_prop_value)
-
-    # jeżeli wartość typu monolingualtext ale ze zbędną dodatkową spacją
-    if stat_prop_value[2:5] == ': "':
-        stat_prop_value = stat_prop_value[:2] + ':"' + stat_prop_value[5:]
-
-    # jeżeli nieznana lub brak wartości
-    if stat_prop_value == "somevalue" or stat_prop_value == "novalue":
-        # print(stat_prop_value)
-        stat_prop_value = None
-
-    result_id = ""
-    for statement in wd_item_test.statements:
-        # print(statement)
-        statement_value = statement.get_value()
-        statement_prop_nr = statement.get_prop_nr()
-        statement_type = statement.data_type
-        statement_value = statement_value_fix(statement_value, statement_type)
-        # print(stat_prop_qid, statement_value, stat_prop_value, statement_type)
-
-        # czy znaleziono poszukiwaną deklarację
-        if statement_prop_nr == stat_prop_qid and statement_value == stat_prop_value:
-            result_id = statement.get_id()
-            break
-
-    return result_id
+    return ENTITY_CACHE.claim_index(entity_id).claim_id(stat_prop_qid, stat_prop_value)
 
 
 def verify_reference(
-    wd_item_test,
+    entity_id: str,
     stat_prop_qid: str,
     stat_prop_value: str,
     g_ref_qid: str,
     g_ref_value: str,
-):
+) -> bool:
     """weryfikacja czy globalna referencja jest przypisana do deklaracji"""
-    ref_exists = False
-
-    if stat_prop_value in ("somevalue", "novalue"):
-        stat_prop_value = None
-    elif not isinstance(stat_prop_value, str):
-        stat_prop_value = str(stat_prop_value)
-
-    # pętla po deklaracjach elementu
-    for statement in wd_item_test.statements:
-        statement_value = statement.get_value()
-        statement_prop_nr = statement.get_prop_nr()
-        statement_type = statement.data_type
-        statement_value = statement_value_fix(statement_value, statement_type)
-
-        # czy znaleziono poszukiwaną deklarację
-        if statement_prop_nr == stat_prop_qid and statement_value == stat_prop_value:
-            tmp_references = statement.get_references()
-            for t_ref_blok in tmp_references:
-                # print(t_ref_blok[0].get_prop_nr(), ' - ', g_ref_qid)
-                # print(t_ref_blok[0].get_value(), ' - ', g_ref_value)
-                if (
-                    t_ref_blok[0].get_prop_nr() == g_ref_qid
-                    and t_ref_blok[0].get_value() == g_ref_value
-                ):
-                    ref_exists = True
-                    break
-
-    return ref_exists
+    return ENTITY_CACHE.claim_index(entity_id).has_reference(
+        stat_prop_qid, stat_prop_value, g_ref_qid, g_ref_value
+    )
 
 
 def monolingual_text_fix(text_value: str) -> str:
@@ -2657,102 +4074,16 @@ def monolingual_text_fix(text_value: str) -> str:
     return text_value
 
 
-def statement_value_fix(s_value, s_type) -> str:
-    """poprawia wartość pobraną z deklaracji właściwości"""
-    if s_value is None:
-        return s_value
+def get_qualifiers(entity_id: str, prop_id, prop_value) -> set:
+    """zwraca zbiór kwalifikatorów (właściwość, wartość) dla deklaracji"""
+    return ENTITY_CACHE.claim_index(entity_id).qualifiers(prop_id, prop_value)
 
-    if s_type == "monolingualtext":
-        s_value = s_value[1] + ':"' + s_value[0] + '"'
-    elif s_type == "quantity":
-        if isinstance(s_value, tuple):
-            s_value = s_value[0].replace("+", "").replace("-", "")
-        else:
-            s_value = str(s_value)
-    elif s_type == "globe-coordinate":
-        if isinstance(s_value, tuple):
-            s_value = str(s_value[0]) + "," + str(s_value[1])
-        else:
-            s_value = str(s_value)
-    elif s_type == "wikibase-item":
-        if isinstance(s_value, int):
-            s_value = str(s_value)
-        if not s_value.startswith("Q"):
-            s_value = "Q" + s_value
-    elif s_type == "time":
-        if isinstance(s_value, tuple):
-            s_value_time = s_value[0]
-            if s_value_time is None:
-                s_value = None
-            elif isinstance(s_value_time, str):
-                s_value = s_value_time + "/" + str(s_value[3])
-            else:
-                print("ERROR: wartość typu time: ", s_value)
-    else:
-        if not isinstance(s_value, str):
-            s_value = str(s_value)
-
-    return s_value
-
-
-def get_qualifiers(element: wbi_core.ItemEngine, prop_id, prop_value) -> list:
-    """zwraca słownik z kwalifikatorami dla deklaracji"""
-    qualifiers = []
-
-    if prop_value in ("somevalue", "novalue"):
-        prop_value = None
-
-    for statement in element.statements:
-        statement_value = statement.get_value()
-        statement_type = statement.data_type
-        statement_value = statement_value_fix(statement_value, statement_type)
-
-        if statement.get_prop_nr() == prop_id and statement_value == prop_value:
-            tmp_json = statement.get_json_representation()
-            if "qualifiers" in tmp_json:
-                lista = tmp_json["qualifiers"].keys()
-                for q_key in lista:
-                    for q_item in tmp_json["qualifiers"][q_key]:
-                        # print(q_item)
-                        qualifier_property = q_item["property"]
-                        qualifier_type = q_item["datavalue"]["type"]
-                        if qualifier_type == "string":
-                            qualifier_value = q_item["datavalue"]["value"]
-                        elif qualifier_type == "monolingualtext":
-                            tmp = q_item["datavalue"]["value"]
-                            qualifier_value = tmp["language"] + ':"' + tmp["text"] + '"'
-                        elif qualifier_type == "quantity":
-                            tmp = q_item["datavalue"]["value"]
-                            qualifier_value = tmp["amount"].replace("+", "")
-                        elif qualifier_type == "wikibase-entityid":
-                            qualifier_value = q_item["datavalue"]["value"]["id"]
-                        elif qualifier_type == "time":
-                            qualifier_value = q_item["datavalue"]["value"]["time"]
-                            q_precision = q_item["datavalue"]["value"]["precision"]
-                            qualifier_value += "/" + str(q_precision)
-                        elif qualifier_type == "globecoordinate":
-                            tmp = q_item["datavalue"]["value"]
-                            qualifier_value = (
-                                str(tmp["latitude"]) + "," + str(tmp["longitude"])
-                            )
-
-                        qualifiers.append((qualifier_property, qualifier_value))
-
-    return qualifiers
 
-
-def check_if_qw_exists(q_list, qualifier_property, qualifier_value) -> bool:
+def check_if_qw_exists(q_list: set, qualifier_property, qualifier_value) -> bool:
     """Funkcja weryfikuje czy podany kwalifikator - property i value jest
-    w przekazanej liście kwalifikatorów bieżącej deklaracji
+    w przekazanym zbiorze kwalifikatorów bieżącej deklaracji
     """
-    qw_result = False
-    for t_prop, t_value in q_list:
-        # print(t_prop, t_value, ' = ', qualifier_property, qualifier_value)
-        if t_prop == qualifier_property and t_value == qualifier_value:
-            qw_result = True
-            break
-
-    return qw_result
+    return (qualifier_property, value_key(qualifier_value)) in q_list
 
 
 def has_statement(pid_to_check: str, claim_to_check: str, value_to_check: str = ""):
@@ -2760,54 +4091,7 @@ def has_statement(pid_to_check: str, claim_to_check: str, value_to_check: str =
     Funkcja weryfikuje czy właściwość (property) lub element (item) ma już
     taką deklarację (statement), opcjonalnie - z podaną wartością
     """
-    has_claim = False
-    wb_prop = wbi_core.ItemEngine(item_id=pid_to_check)
-    data_prop = wb_prop.get_json_representation()
-    claims = data_prop["claims"]
-    if claim_to_check in claims:
-        if not value_to_check:
-            has_claim = True
-        else:
-            lista = claims[claim_to_check]
-            for item in lista:
-                # print(item)
-                if value_to_check in ("somevalue", "novalue"):
-                    value = item["mainsnak"]["snaktype"]
-                else:
-                    value_json = item["mainsnak"]["datavalue"]["value"]
-
-                    if (
-                        "type" in item["mainsnak"]["datavalue"]
-                        and item["mainsnak"]["datavalue"]["type"] == "string"
-                    ):
-                        value = value_json
-                    elif "text" in value_json and "language" in value_json:
-                        # jeżeli nietypowy cudzysłów w wartości z arkusza xlsx
-                        if "”" in value_to_check:
-                            value_to_check = value_to_check.replace("”", '"')
-                        # jeżeli zbędna spacja w wartości monoligualtext
-                        if value_to_check[2] == ":" and ': "' in value_to_check:
-                            value_to_check = value_to_check.replace(': "', ':"')
-                        value = f"{value_json['language']}:\"{value_json['text']}\""
-                    elif "entity-type" in value_json:
-                        value = value_json["id"]
-                    elif "latitude" in value_json:
-                        value = f"{value_json['latitude']},{value_json['longitude']}"
-                    elif "time" in value_json:
-                        value = f"{value_json['time']}/{value_json['precision']}"
-                    elif "amount" in value_json:
-                        value = value_json["amount"]
-                        if value.startswith("+"):
-                            value = value[1:]
-                    else:
-                        value = "???"  # jeszcze nie obsługiwany typ - do weryfikacji
-                        print(item, " - ", value_to_check)
-
-                if value == value_to_check:
-                    has_claim = True
-                    break
-
-    return has_claim
+    return ENTITY_CACHE.claim_index(pid_to_check).has(claim_to_check, value_to_check)
 
 
 if __name__ == "__main__":
@@ -2818,7 +4102,94 @@ if __name__ == "__main__":
     BOT_LOGIN = os.environ.get("WIKIDARIAH_USER")
     BOT_PASSWORD = os.environ.get("WIKIDARIAH_PWD")
 
-    login_instance = wbi_login.Login(user=BOT_LOGIN, pwd=BOT_PASSWORD)
+    # dane z arkusza XLSX, wg ścieżki przekazanej argumentem z linii komend
+    # jeżeli nie przekazano, skrypt szuka pliku 'data/arkusz_import.xlsx'
+    parser = argparse.ArgumentParser(
+        description="import właściwości i elementów z arkusza xlsx do Wikibase"
+    )
+    parser.add_argument(
+        "filename",
+        nargs="*",
+        default=[Path(".") / "data/arkusz_import.xlsx"],
+        help="pliki xlsx lub katalogi z plikami xlsx (przetwarzane kolejno)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="bez zapisu do Wikibase, zmiany w pliku zestawienia (--changeset)",
+    )
+    parser.add_argument(
+        "--snapshot",
+        nargs="?",
+        const=SNAPSHOT_PATH,
+        help="bez dostępu do Wikibase, encje z migawki lub zrzutu json "
+        f"(domyślnie {SNAPSHOT_PATH}), oznacza --dry-run",
+    )
+    parser.add_argument(
+        "--changeset", default="changeset.json", help="plik zestawienia zmian"
+    )
+    parser.add_argument(
+        "--report", default="import_report.json", help="plik raportu importu"
+    )
+    parser.add_argument(
+        "--log", default="import_log.jsonl", help="plik dziennika zdarzeń (jsonl)"
+    )
+    parser.add_argument(
+        "--log-level",
+        default="info",
+        choices=list(LEVELS),
+        help="najniższy poziom komunikatów wyświetlanych na ekranie (debug - także SKIP)",
+    )
+    parser.add_argument(
+        "--all-rows",
+        action="store_true",
+        help="przetwarza także wiersze niezmienione od ostatniego importu (odciski wierszy)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="wznowienie importu: pomija wiersze zapisane wcześniej (dziennik importu)",
+    )
+    args = parser.parse_args()
+    # wszystkie komunikaty i zdarzenia importu w dzienniku (jsonl)
+    EVENT_LOG.open(args.log, console=args.log_level)
+    workbooks = workbook_paths(args.filename)
+    if args.dry_run or args.snapshot:
+        WIKIBASE_WRITE = False
+    if args.all_rows:
+        SKIP_UNCHANGED = False
+
+    if args.snapshot:
+        # praca offline: encje, indeks purl i typy właściwości z migawki
+        set_offline()
+        print(f"SNAPSHOT: wczytano encji: {load_snapshot(args.snapshot)} ({args.snapshot})")
+        login_instance = None
+    else:
+        # odczyty (wyszukiwanie, encje, SPARQL) przez wspólną sesję HTTP z pulą połączeń
+        install_http()
+        login_instance = wbi_login.Login(user=BOT_LOGIN, pwd=BOT_PASSWORD)
+        # zapisy (sesja logowania) w tempie dostosowywanym do obciążenia serwera
+        configure_session(login_instance.session)
+        RATE_LIMITER.install(login_instance.session)
+
+    # liczba wątków przetwarzających wiersze arkuszy
+    workers = int(os.environ.get("WIKIDARIAH_WORKERS", WORKERS))
+
+    # typy danych wszystkich właściwości (z pliku lub jednym zapytaniem SPARQL)
+    with STATS.phase("property_types"):
+        PROPERTY_TYPES.load()
+
+    # etykiety wszystkich właściwości i elementów strukturalnych (SPARQL)
+    if USE_LABEL_INDEX and not args.snapshot:
+        with STATS.phase("label_index"):
+            print(f"LABEL INDEX: właściwości i elementy strukturalne: {LABEL_INDEX.load()}")
+
+    # wszystkie identyfikatory purl (SPARQL)
+    if PURL_INDEX_FULL and not args.snapshot:
+        with STATS.phase("purl_index"):
+            is_ok, purl_pid = find_name_qid("purl identifier", "property")
+            if is_ok:
+                print(f"PURL INDEX: identyfikatory purl: {PURL_INDEX.load_all(purl_pid)}")
 
     # podstawowe właściwości Wikibase
     wikibase_prop = BasicProp()
@@ -2827,71 +4198,29 @@ if __name__ == "__main__":
     # pracy skryptu, wartości zostaną podczytane pred pierwszym użyciem)
     wikibase_prop.get_wiki_properties()
 
-    # dane z arkusza XLSX, wg ścieżki przekazanej argumentem z linii komend
-    # jeżeli nie przekazano, skrypt szuka pliku 'data/arkusz_import.xlsx'
-    if len(sys.argv) > 1:
-        filename = sys.argv[1]
-    else:
-        filename = Path(".") / "data/arkusz_import.xlsx"
-
-    plik_xlsx = WDHSpreadsheet(filename)
-    plik_xlsx.open()
-
-    # globalne referencje
-    plik_xlsx.get_global()
-
-    # właściwośći
-    dane = plik_xlsx.get_property_list()
-    for wb_property in dane:
-        print(f"PROPERTY: {wb_property.label_en}")
-        result, info = add_property(wb_property)
-        print(result, f"Property {info}")
-
-    # dodatkowe deklaracje dla właściwości
-    dane = plik_xlsx.get_statement_list()
-    for stm in dane:
-        print(
-            f"PROPERTY: {stm.label_en}, STATEMENT: {stm.statement_property}, VALUE: {stm.statement_value}"
+    # arkusze przetwarzane kolejno, ze wspólnym logowaniem, rejestrem typów
+    # właściwości, pamięcią wyszukiwania etykiet i magazynem encji
+    workbook_stats = []
+    for workbook_path in workbooks:
+        workbook_stats.append(
+            import_workbook(workbook_path, workers, args.resume, bool(args.snapshot))
         )
-        result, info = add_property_statement(stm)
-        print(result, f"{info}")
-
-    # elementy 'strukturalne' ('definicyjne')
-    dane = plik_xlsx.get_item_list()
-    unique_item_en = []
-    unique_item_pl = []
-    unique_error = False
-    for wb_item in dane:
-        # angielski
-        lbl_desc_en = wb_item.label_en + "|" + wb_item.description_en
-        if lbl_desc_en in unique_item_en:
-            print("ERROR: etykieta i opis w języku ang powtarzają się: ", lbl_desc_en)
-            unique_error = True
-        else:
-            unique_item_en.append(lbl_desc_en)
-
-        # polski
-        lbl_desc_pl = wb_item.label_pl + "|" + wb_item.description_pl
-        if lbl_desc_pl in unique_item_pl:
-            print("ERROR: etykieta i opis w języku pl powtarzają się: ", lbl_desc_pl)
-            unique_error = True
-        else:
-            unique_item_pl.append(lbl_desc_pl)
 
-    if unique_error:
-        sys.exit(1)
-
-    for wb_item in dane:
-        print(f"ITEM: {wb_item.label_en}")
-        wb_item.write_to_wikibase()
-
-    # dodatkowe deklaracje dla elementów strukturalnych/definicyjnych
-    dane = plik_xlsx.get_item_statement_list()
-    for stm in dane:
-        print(
-            f"ITEM: {stm.label_en}, STATEMENT: {stm.statement_property}, VALUE: {stm.statement_value}"
-        )
-        stm.write_to_wikibase()
+    # zestawienie zmian (import bez zapisu do Wikibase)
+    if not WIKIBASE_WRITE:
+        CHANGESET.save(args.changeset, source=", ".join(str(x) for x in workbooks))
+        print(f"CHANGESET: {args.changeset}, zmiany: {CHANGESET.summary()}")
+
+    # raport: statystyki każdego pliku i łącznie
+    report = import_report(workbook_stats)
+    report["rate"] = RATE_LIMITER.stats()
+    print(f"RATE: {report['rate']}")
+    # czas etapów i wierszy, zapytania API, trafienia pamięci podręcznych
+    report["stats"] = STATS.summary()
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"REPORT: {args.report}")
+    print(f"LOG: {args.log}, zdarzenia: {EVENT_LOG.counts}")
 
     # zapis list przetwarzanych właściwości i elementów
     with open("property_list.html", "w", encoding="utf-8") as f:
@@ -2901,7 +4230,7 @@ if __name__ == "__main__":
         numer = 1
         for property_label, property_qid in GLOBAL_PROPERTY.items():
             f.write(
-                f'{numer}. {property_label} = <a href="https://prunus-208.man.poznan.pl/wiki/Property:{property_qid}">{property_qid}</a><br>\n'
+                f'{numer}. {property_label} = <a href="{WIKIBASE_URL}/wiki/Property:{property_qid}">{property_qid}</a><br>\n'
             )
             numer += 1
         f.write("</body></html>\n")
@@ -2913,7 +4242,11 @@ if __name__ == "__main__":
         numer = 1
         for item_label, item_qid in GLOBAL_ITEM.items():
             f.write(
-                f'{numer}. {item_label} = <a href="https://prunus-208.man.poznan.pl/wiki/Item:{item_qid}">{item_qid}</a><br>\n'
+                f'{numer}. {item_label} = <a href="{WIKIBASE_URL}/wiki/Item:{item_qid}">{item_qid}</a><br>\n'
             )
             numer += 1
         f.write("</p></body></html>\n")
+
+    EVENT_LOG.close()
+    if any(stats["status"] != "ok" for stats in workbook_stats):
+        sys.exit(1)
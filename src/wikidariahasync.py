@@ -0,0 +1,98 @@
+""" współbieżne (asyncio) odczyty z Wikibase z ograniczoną liczbą równoczesnych zapytań """
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from wikidariahcache import ENTITY_CACHE, LABEL_CACHE, API_BATCH_SIZE
+from wikidariahtools import element_search, search_key, search_ids, search_by_purl
+from wikidariahhttp import POOL_MAXSIZE
+
+
+# maksymalna liczba równoczesnych zapytań odczytu (nie więcej niż połączeń
+# w puli wspólnej sesji HTTP)
+READ_CONCURRENCY = POOL_MAXSIZE
+
+# wątki wykonujące zapytania (zapytania wikibaseintegrator są blokujące)
+READ_EXECUTOR = ThreadPoolExecutor(max_workers=READ_CONCURRENCY,
+                                   thread_name_prefix="wikidariah-read")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """wywołanie funkcji blokującej (zapytania HTTP) w puli wątków odczytu,
+    najwyżej READ_CONCURRENCY wywołań jednocześnie
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(READ_EXECUTOR, functools.partial(func, *args, **kwargs))
+
+
+async def element_search_async(search_string: str, element_type: str, lang: str, **kwargs) -> tuple:
+    """element_search: (True, 'P133') lub (False, 'NOT FOUND')"""
+    return await run_blocking(element_search, search_string, element_type, lang, **kwargs)
+
+
+async def search_by_purl_async(purl_prop_id: str, purl_value: str) -> tuple:
+    """search_by_purl: (True, 'Q357') lub (False, komunikat błędu)"""
+    return await run_blocking(search_by_purl, purl_prop_id, purl_value)
+
+
+async def load_entities_async(ids: list) -> int:
+    """pobranie encji nieobecnych w ENTITY_CACHE: zapytania wbgetentities
+    po 50 identyfikatorów wykonywane równolegle, zwraca liczbę pobieranych encji
+    """
+    missing = [entity_id for entity_id in dict.fromkeys(ids) if entity_id and entity_id not in ENTITY_CACHE]
+    batches = [missing[i:i + API_BATCH_SIZE] for i in range(0, len(missing), API_BATCH_SIZE)]
+    loaded = await asyncio.gather(*(run_blocking(ENTITY_CACHE.load_many, batch) for batch in batches))
+
+    return sum(loaded)
+
+
+async def element_search_many_async(queries: list) -> list:
+    """wyszukiwanie zbiorcze, queries - lista (search_string, element_type,
+    lang, kwargs), np. ('Kraków', 'item', 'pl', {'description': 'miasto'}).
+    Wyszukiwania nieobecne w LABEL_CACHE wykonywane są równolegle, znalezione
+    encje pobierane zbiorczo (load_entities_async), wyniki jak z element_search
+    """
+    keys = {}
+    for search_string, element_type, lang, kwargs in queries:
+        key = search_key(search_string, element_type, lang, **kwargs)
+        if key not in keys and LABEL_CACHE.get(key) is None:
+            keys[key] = kwargs
+
+    if keys and not ENTITY_CACHE.offline:
+        found = await asyncio.gather(*(
+            run_blocking(search_ids, key[0], key[1], key[2], key[5]) for key in keys
+        ), return_exceptions=True)
+        # wyszukiwania zakończone błędem zostaną powtórzone przez element_search
+        found = [results if isinstance(results, list) else None for results in found]
+        await load_entities_async([entity_id for results in found if results for entity_id in results])
+        for (key, kwargs), results in zip(keys.items(), found):
+            if results is not None:
+                element_search(key[0], key[1], key[2], **{**kwargs, "results": results})
+
+    return [
+        element_search(search_string, element_type, lang, **kwargs)
+        for search_string, element_type, lang, kwargs in queries
+    ]
+
+
+async def search_by_purl_many_async(purl_prop_id: str, purl_values: list) -> dict:
+    """search_by_purl dla wielu identyfikatorów: {purl: (True, 'Q357'), ...}"""
+    purl_values = list(dict.fromkeys(purl_values))
+    results = await asyncio.gather(*(search_by_purl_async(purl_prop_id, purl) for purl in purl_values))
+
+    return dict(zip(purl_values, results))
+
+
+def element_search_many(queries: list) -> list:
+    """element_search_many_async dla skryptów synchronicznych"""
+    return asyncio.run(element_search_many_async(queries))
+
+
+def load_entities(ids: list) -> int:
+    """load_entities_async dla skryptów synchronicznych"""
+    return asyncio.run(load_entities_async(ids))
+
+
+def search_by_purl_many(purl_prop_id: str, purl_values: list) -> dict:
+    """search_by_purl_many_async dla skryptów synchronicznych"""
+    return asyncio.run(search_by_purl_many_async(purl_prop_id, purl_values))
@@ -0,0 +1,1160 @@
+""" pamięć podręczna dla danych pobieranych z Wikibase """
+
+import copy
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import requests
+from wikibaseintegrator import wbi_core
+from wikibaseintegrator.wbi_config import config as wbi_config
+from wikibaseintegrator.wbi_functions import mediawiki_api_call_helper
+from wikibaseintegrator.wbi_functions import execute_sparql_query
+from wikibaseintegrator.wbi_exceptions import MWApiError
+
+
+# folder na pliki pamięci podręcznej zapisywane między uruchomieniami skryptów
+CACHE_DIR = Path(".") / "cache"
+
+# migawka encji (snapshot) do pracy bez dostępu do Wikibase
+SNAPSHOT_PATH = CACHE_DIR / "snapshot.json"
+
+# czas ważności (w sekundach) wyników wyszukiwania: znalezionych i nieznalezionych
+LABEL_TTL = 30 * 24 * 3600
+LABEL_NEGATIVE_TTL = 24 * 3600
+
+# tymczasowe identyfikatory nowych encji w imporcie bez zapisu (zakres
+# nieużywany w instancji Wikibase, zgodny ze wzorcem ^[PQ]\d{1,9}$)
+NEW_ID_START = 900000000
+
+# maksymalna liczba identyfikatorów w jednym zapytaniu wbgetentities
+API_BATCH_SIZE = 50
+
+# maksymalna liczba wartości w jednym zapytaniu SPARQL (klauzula VALUES)
+SPARQL_BATCH_SIZE = 100
+
+# liczba wyników na stronę zapytań SPARQL pobierających całe indeksy (LIMIT/OFFSET)
+SPARQL_PAGE_SIZE = 5000
+
+# typy danych właściwości w ontologii wikibase (wikibase:propertyType)
+ONTOLOGY_DATATYPES = {
+    "WikibaseItem": "wikibase-item",
+    "WikibaseProperty": "wikibase-property",
+    "String": "string",
+    "ExternalId": "external-id",
+    "Url": "url",
+    "Monolingualtext": "monolingualtext",
+    "Quantity": "quantity",
+    "Time": "time",
+    "GeoShape": "geo-shape",
+    "GlobeCoordinate": "globe-coordinate",
+    "CommonsMedia": "commonsMedia",
+    "Math": "math",
+    "TabularData": "tabular-data",
+    "MusicalNotation": "musical-notation",
+    "WikibaseLexeme": "wikibase-lexeme",
+    "WikibaseForm": "wikibase-form",
+    "WikibaseSense": "wikibase-sense",
+    "EntitySchema": "entity-schema",
+}
+
+
+def is_new_id(entity_id: str) -> bool:
+    """czy identyfikator jest tymczasowym identyfikatorem nowej encji
+    (import bez zapisu do Wikibase)
+    """
+    return bool(re.fullmatch(r"[PQ]\d+", entity_id or "")) and int(entity_id[1:]) > NEW_ID_START
+
+
+def sparql_pages(query: str) -> list:
+    """wyniki zapytania SPARQL (z klauzulą ORDER BY) pobierane stronami"""
+    bindings = []
+    offset = 0
+    while True:
+        results = execute_sparql_query(f"{query} LIMIT {SPARQL_PAGE_SIZE} OFFSET {offset}")
+        page = results["results"]["bindings"]
+        bindings += page
+        if len(page) < SPARQL_PAGE_SIZE:
+            return bindings
+        offset += SPARQL_PAGE_SIZE
+
+
+def snak_key(snak: dict) -> str:
+    """wartość snaka (deklaracji, kwalifikatora, referencji) w postaci
+    kanonicznej - takiej jak wartość w arkuszu (np. Q123, pl:"tekst",
+    +1539-12-08T00:00:00Z/11, 51.2,20.1), dla somevalue/novalue - ich nazwa
+    """
+    if snak.get("snaktype", "value") != "value":
+        return snak["snaktype"]
+
+    datavalue = snak["datavalue"]
+    value = datavalue["value"]
+    value_type = datavalue.get("type")
+    if value_type == "wikibase-entityid":
+        if "id" in value:
+            return value["id"]
+        prefix = "P" if value.get("entity-type") == "property" else "Q"
+        return f"{prefix}{value['numeric-id']}"
+    if value_type == "monolingualtext":
+        return f'{value["language"]}:"{value["text"]}"'
+    if value_type == "time":
+        return f'{value["time"]}/{value["precision"]}'
+    if value_type == "quantity":
+        amount = value["amount"]
+        return amount[1:] if amount.startswith("+") else amount
+    if value_type == "globecoordinate":
+        return f'{value["latitude"]},{value["longitude"]}'
+    if isinstance(value, str):
+        return value
+
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def value_key(value) -> str:
+    """wartość z arkusza w postaci kanonicznej (porównywalnej z snak_key):
+    w wartościach monolingualtext poprawiany nietypowy cudzysłów i zbędna
+    spacja po kodzie języka
+    """
+    value = str(value)
+    match = re.match(r'^([a-z]{2,3}(?:-[a-z]+)?): ?[”"](.*)[”"]$', value, re.S)
+    if match:
+        return f'{match.group(1)}:"{match.group(2)}"'
+
+    return value
+
+
+class ClaimIndex:
+    """Indeks deklaracji jednej encji: (właściwość, wartość kanoniczna) ->
+    deklaracje (guid, kwalifikatory, referencje jako zbiory par (właściwość,
+    wartość kanoniczna)). Sprawdzenie istnienia deklaracji, kwalifikatora
+    i referencji to wyszukanie w słowniku/zbiorze.
+    """
+
+    def __init__(self, entity: dict):
+        self._claims = {}
+        self._props = set()
+        for prop_nr, claims in entity.get("claims", {}).items():
+            for claim in claims:
+                if "remove" in claim:
+                    continue
+                self._props.add(prop_nr)
+                self._claims.setdefault((prop_nr, snak_key(claim["mainsnak"])), []).append({
+                    "id": claim.get("id", ""),
+                    "qualifiers": {
+                        (q_prop, snak_key(snak))
+                        for q_prop, snaks in claim.get("qualifiers", {}).items()
+                        for snak in snaks
+                    },
+                    "references": {
+                        (r_prop, snak_key(snak))
+                        for reference in claim.get("references", [])
+                        for r_prop, snaks in reference.get("snaks", {}).items()
+                        for snak in snaks
+                    },
+                })
+
+    def has(self, prop_nr: str, value=None) -> bool:
+        """czy encja ma deklarację właściwości (opcjonalnie - o podanej wartości)"""
+        if value is None or value == "":
+            return prop_nr in self._props
+        return (prop_nr, value_key(value)) in self._claims
+
+    def claim_id(self, prop_nr: str, value) -> str:
+        """guid (pierwszej) deklaracji o podanej wartości lub pusty string"""
+        claims = self._claims.get((prop_nr, value_key(value)))
+        return claims[0]["id"] if claims else ""
+
+    def qualifiers(self, prop_nr: str, value) -> set:
+        """kwalifikatory deklaracji o podanej wartości: zbiór (właściwość, wartość)"""
+        result = set()
+        for claim in self._claims.get((prop_nr, value_key(value)), []):
+            result |= claim["qualifiers"]
+        return result
+
+    def has_reference(self, prop_nr: str, value, ref_prop: str, ref_value) -> bool:
+        """czy deklaracja o podanej wartości ma referencję (właściwość, wartość)"""
+        key = (ref_prop, value_key(ref_value))
+        return any(
+            key in claim["references"]
+            for claim in self._claims.get((prop_nr, value_key(value)), [])
+        )
+
+
+class EntityCache:
+    """Magazyn encji (item/property) pobranych z Wikibase podczas jednego
+    uruchomienia skryptu. Encje są zapamiętywane razem z numerem rewizji
+    (lastrevid), każdy zapis do Wikibase aktualizuje magazyn na podstawie
+    odpowiedzi API (write-through), więc encja jest pobierana najwyżej raz.
+    W trybie offline magazyn nie korzysta z Wikibase - encje nieobecne
+    w magazynie są traktowane jak nieistniejące.
+    """
+
+    def __init__(self):
+        self._entities = {}
+        # indeks etykiet i aliasów: (typ, rodzaj, język, nazwa) -> zbiór id
+        self._names = {}
+        # indeksy deklaracji encji (budowane przy pierwszym użyciu)
+        self._claims = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.offline = False
+
+    def __contains__(self, entity_id: str) -> bool:
+        return entity_id in self._entities
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def revision(self, entity_id: str) -> int:
+        """zwraca numer rewizji zapamiętanej encji lub None"""
+        with self._lock:
+            entity = self._entities.get(entity_id)
+        if entity is None:
+            return None
+
+        return entity.get("lastrevid")
+
+    def revisions(self, ids: list) -> dict:
+        """numery rewizji encji: z magazynu, pozostałe zapytaniami wbgetentities
+        (props=info, bez treści encji) po 50 identyfikatorów, w trybie offline
+        tylko z magazynu; encje nieistniejące - None
+        """
+        revisions = {}
+        missing = []
+        for entity_id in dict.fromkeys(ids):
+            revision = self.revision(entity_id)
+            if revision is not None:
+                revisions[entity_id] = revision
+            elif entity_id and re.match(r"^[PQ]\d{1,9}$", entity_id):
+                missing.append(entity_id)
+        if self.offline:
+            return revisions
+
+        for i in range(0, len(missing), API_BATCH_SIZE):
+            params = {
+                "action": "wbgetentities",
+                "ids": "|".join(missing[i:i + API_BATCH_SIZE]),
+                "props": "info",
+                "format": "json",
+            }
+            try:
+                json_data = mediawiki_api_call_helper(data=params, allow_anonymous=True)
+            except MWApiError as wbgetentities_error:
+                print(f"ERROR: błąd pobierania rewizji encji {params['ids']}: {wbgetentities_error}")
+                continue
+            for entity_id, entity in json_data.get("entities", {}).items():
+                revisions[entity_id] = entity.get("lastrevid")
+
+        return revisions
+
+    def get_json(self, entity_id: str, revision: int = None) -> dict:
+        """zwraca json encji (kopię), jeżeli nie ma jej w magazynie lub podano
+        inny numer rewizji niż zapamiętany - encja jest pobierana z Wikibase
+        """
+        with self._lock:
+            entity = self._entities.get(entity_id)
+            if entity is not None and (
+                revision is None or entity.get("lastrevid") == revision
+            ):
+                self.hits += 1
+                return copy.deepcopy(entity)
+
+        self.misses += 1
+        entity = self.fetch(entity_id)
+
+        return copy.deepcopy(entity)
+
+    def fetch(self, entity_id: str) -> dict:
+        """pobiera encję z Wikibase (wbgetentities) i zapamiętuje ją"""
+        if self.offline:
+            return {"id": entity_id, "missing": ""}
+
+        params = {
+            "action": "wbgetentities",
+            "sites": "enwiki",
+            "ids": entity_id,
+            "format": "json",
+        }
+        json_data = mediawiki_api_call_helper(data=params, allow_anonymous=True)
+        entity = json_data["entities"][entity_id]
+        self.store(entity)
+
+        return entity
+
+    def load_many(self, ids: list) -> int:
+        """pobiera z Wikibase encje nieobecne jeszcze w magazynie, zapytaniami
+        wbgetentities po 50 identyfikatorów, zwraca liczbę pobieranych encji
+        """
+        with self._lock:
+            missing = [
+                entity_id
+                for entity_id in dict.fromkeys(ids)
+                if entity_id
+                and re.match(r"^[PQ]\d{1,9}$", entity_id)
+                and entity_id not in self._entities
+            ]
+        if self.offline:
+            return 0
+
+        for i in range(0, len(missing), API_BATCH_SIZE):
+            params = {
+                "action": "wbgetentities",
+                "sites": "enwiki",
+                "ids": "|".join(missing[i:i + API_BATCH_SIZE]),
+                "format": "json",
+            }
+            try:
+                json_data = mediawiki_api_call_helper(data=params, allow_anonymous=True)
+            except MWApiError as wbgetentities_error:
+                print(f"ERROR: błąd pobierania encji {params['ids']}: {wbgetentities_error}")
+                continue
+            for entity in json_data.get("entities", {}).values():
+                self.store(entity)
+
+        return len(missing)
+
+    def _index_names(self, entity: dict, add: bool = True):
+        """aktualizacja indeksu etykiet i aliasów dla encji"""
+        names = [
+            ("label", lang, value["value"])
+            for lang, value in entity.get("labels", {}).items()
+        ]
+        names += [
+            ("alias", lang, alias["value"])
+            for lang, aliases in entity.get("aliases", {}).items()
+            for alias in aliases
+        ]
+        for kind, lang, name in names:
+            key = (entity.get("type"), kind, lang, name.casefold())
+            if add:
+                self._names.setdefault(key, set()).add(entity["id"])
+            else:
+                self._names.get(key, set()).discard(entity["id"])
+
+    def search(self, search_string: str, element_type: str, lang: str,
+               aliases: bool = True) -> list:
+        """wyszukiwanie encji w magazynie wg etykiety (lub aliasu), bez
+        rozróżniania wielkości liter - odpowiednik wbsearchentities w trybie offline
+        """
+        name = search_string.casefold()
+        with self._lock:
+            results = set(self._names.get((element_type, "label", lang, name), set()))
+            if aliases:
+                results |= self._names.get((element_type, "alias", lang, name), set())
+
+        return sorted(results, key=lambda entity_id: int(entity_id[1:]))
+
+    def entities(self) -> dict:
+        """kopia wszystkich zapamiętanych encji (np. do zapisu migawki)"""
+        with self._lock:
+            return copy.deepcopy(self._entities)
+
+    def claim_index(self, entity_id: str) -> ClaimIndex:
+        """indeks deklaracji encji, aktualny do czasu zmiany encji w magazynie"""
+        with self._lock:
+            index = self._claims.get(entity_id)
+            if index is not None:
+                return index
+            entity = self._entities.get(entity_id)
+            if entity is not None:
+                self.hits += 1
+                index = self._claims[entity_id] = ClaimIndex(entity)
+                return index
+
+        self.misses += 1
+        entity = self.fetch(entity_id)
+        with self._lock:
+            index = ClaimIndex(entity)
+            if entity_id in self._entities:
+                self._claims[entity_id] = index
+
+        return index
+
+    def get_item(self, entity_id: str, data: list = None) -> wbi_core.ItemEngine:
+        """zwraca obiekt ItemEngine zbudowany z zapamiętanego jsona encji,
+        opcjonalnie z nowymi deklaracjami (data) do zapisu
+        """
+        item_data = self.get_json(entity_id)
+
+        return wbi_core.ItemEngine(
+            item_id=entity_id, data=data, item_data=item_data, debug=False
+        )
+
+    def store(self, entity: dict):
+        """zapamiętuje json encji, encje nieistniejące w Wikibase są pomijane"""
+        if "missing" in entity or "id" not in entity:
+            return
+
+        with self._lock:
+            old = self._entities.get(entity["id"])
+            # nie nadpisujemy nowszej rewizji starszą
+            if (
+                old is not None
+                and old.get("lastrevid")
+                and entity.get("lastrevid")
+                and old["lastrevid"] > entity["lastrevid"]
+            ):
+                return
+            if old is not None:
+                self._index_names(old, add=False)
+            self._entities[entity["id"]] = entity
+            self._claims.pop(entity["id"], None)
+            self._index_names(entity)
+        LABEL_INDEX.update(entity)
+        PURL_INDEX.update(entity)
+
+    def update(self, wd_item: wbi_core.ItemEngine):
+        """aktualizacja magazynu po zapisie obiektu ItemEngine do Wikibase,
+        ItemEngine po zapisie zawiera encję z odpowiedzi API wraz z nową rewizją
+        """
+        if not wd_item.item_id or not wd_item.lastrevid:
+            return
+
+        entity = copy.deepcopy(wd_item.entity_metadata)
+        for key in ("labels", "descriptions", "aliases", "claims"):
+            entity[key] = copy.deepcopy(wd_item.json_representation.get(key, {}))
+        entity["id"] = wd_item.item_id
+        entity["lastrevid"] = wd_item.lastrevid
+        self.store(entity)
+
+    def update_claim(self, claim: dict, revision: int = None):
+        """aktualizacja deklaracji w zapamiętanej encji na podstawie odpowiedzi
+        API (np. wbsetqualifier zwraca całą zmienioną deklarację)
+        """
+        entity_id = claim["id"].split("$")[0]
+        prop_nr = claim["mainsnak"]["property"]
+        with self._lock:
+            entity = self._entities.get(entity_id)
+            if entity is None:
+                return
+            self._claims.pop(entity_id, None)
+            claims = entity.setdefault("claims", {}).setdefault(prop_nr, [])
+            for i, old_claim in enumerate(claims):
+                if old_claim.get("id") == claim["id"]:
+                    claims[i] = claim
+                    break
+            else:
+                claims.append(claim)
+            if revision:
+                entity["lastrevid"] = revision
+
+    def update_reference(self, claim_id: str, reference: dict, revision: int = None):
+        """aktualizacja referencji deklaracji w zapamiętanej encji na podstawie
+        odpowiedzi API (wbsetreference zwraca dodaną referencję)
+        """
+        entity_id = claim_id.split("$")[0]
+        with self._lock:
+            entity = self._entities.get(entity_id)
+            if entity is None:
+                return
+            self._claims.pop(entity_id, None)
+            for claims in entity.get("claims", {}).values():
+                for claim in claims:
+                    if claim.get("id") == claim_id:
+                        references = claim.setdefault("references", [])
+                        hashes = [ref.get("hash") for ref in references]
+                        if reference.get("hash") not in hashes:
+                            references.append(reference)
+                        if revision:
+                            entity["lastrevid"] = revision
+                        return
+            # nie znaleziono deklaracji - encja do ponownego pobrania
+            self.invalidate(entity_id)
+
+    def invalidate(self, entity_id: str):
+        """usuwa encję z magazynu (np. gdy zmieniona została przez inny proces)"""
+        with self._lock:
+            entity = self._entities.pop(entity_id, None)
+            self._claims.pop(entity_id, None)
+            if entity is not None:
+                self._index_names(entity, add=False)
+
+    def clear(self):
+        """czyści magazyn"""
+        with self._lock:
+            self._entities.clear()
+            self._names.clear()
+            self._claims.clear()
+
+
+class LabelCache:
+    """Trwała (SQLite) pamięć podręczna wyników wyszukiwania identyfikatorów
+    na podstawie etykiet. Klucz: (etykieta, typ, język, opis, strict, aliases),
+    zapamiętywane są także wyniki negatywne (NOT FOUND) - z krótszym czasem
+    ważności. Wpisy dla etykiety są usuwane gdy skrypt utworzy nową encję
+    o tej etykiecie. Gdy persistent = False wyniki są pamiętane tylko
+    w pamięci, do końca działania skryptu.
+    """
+
+    def __init__(self, path=None, ttl: int = LABEL_TTL, negative_ttl: int = LABEL_NEGATIVE_TTL):
+        self.path = path if path else CACHE_DIR / "label_cache.sqlite"
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.enabled = True
+        self.persistent = True
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._memory = {}
+        self._lock = threading.RLock()
+
+    def _db(self) -> sqlite3.Connection:
+        """połączenie z bazą, tworzone przy pierwszym użyciu"""
+        if self._connection is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS labels (
+                    api TEXT, label TEXT, type TEXT, lang TEXT, description TEXT,
+                    strict INTEGER, aliases INTEGER, found INTEGER, value TEXT,
+                    created REAL,
+                    PRIMARY KEY (api, label, type, lang, description, strict, aliases))"""
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS labels_value ON labels (api, value)"
+            )
+            self._connection.commit()
+
+        return self._connection
+
+    def get(self, key: tuple) -> tuple:
+        """zwraca zapamiętany wynik wyszukiwania (True/False, ID/info) lub None"""
+        if not self.enabled:
+            return None
+
+        label, elem_type, lang, description, strict, aliases = key
+        with self._lock:
+            row = self._memory.get(key)
+            if row is None and self.persistent:
+                row = self._db().execute(
+                    """SELECT found, value, created FROM labels WHERE api=? AND label=?
+                       AND type=? AND lang=? AND description=? AND strict=? AND aliases=?""",
+                    (wbi_config["MEDIAWIKI_API_URL"], label, elem_type, lang,
+                     description or "", int(bool(strict)), int(bool(aliases))),
+                ).fetchone()
+                if row:
+                    self._memory[key] = row
+
+        if row:
+            found, value, created = row
+            ttl = self.ttl if found else self.negative_ttl
+            if time.time() - created <= ttl:
+                self.hits += 1
+                return bool(found), value
+
+        self.misses += 1
+        return None
+
+    def set(self, key: tuple, result: tuple):
+        """zapamiętuje wynik wyszukiwania"""
+        if not self.enabled:
+            return
+
+        label, elem_type, lang, description, strict, aliases = key
+        found, value = result
+        with self._lock:
+            self._memory[key] = (int(bool(found)), value, time.time())
+            # encje utworzone w imporcie bez zapisu nie istnieją w Wikibase
+            if not self.persistent or (found and is_new_id(value)):
+                return
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO labels VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (wbi_config["MEDIAWIKI_API_URL"], label, elem_type, lang,
+                 description or "", int(bool(strict)), int(bool(aliases)),
+                 int(bool(found)), value, time.time()),
+            )
+            db.commit()
+
+    def invalidate(self, label: str):
+        """usuwa wszystkie wpisy dla etykiety (np. po utworzeniu nowej encji)"""
+        if not self.enabled or not label:
+            return
+
+        with self._lock:
+            for key in [key for key in self._memory if key[0] == label]:
+                del self._memory[key]
+            if not self.persistent:
+                return
+            db = self._db()
+            db.execute(
+                "DELETE FROM labels WHERE api=? AND label=?",
+                (wbi_config["MEDIAWIKI_API_URL"], label),
+            )
+            db.commit()
+
+    def invalidate_id(self, entity_id: str):
+        """usuwa wpisy wskazujące na encję (np. po zmianie jej etykiety)"""
+        if not self.enabled or not entity_id:
+            return
+
+        with self._lock:
+            for key in [key for key, row in self._memory.items() if row[1] == entity_id]:
+                del self._memory[key]
+            if not self.persistent:
+                return
+            db = self._db()
+            db.execute(
+                "DELETE FROM labels WHERE api=? AND value=?",
+                (wbi_config["MEDIAWIKI_API_URL"], entity_id),
+            )
+            db.commit()
+
+    def clear(self):
+        """czyści pamięć podręczną"""
+        with self._lock:
+            self._memory.clear()
+            if not self.persistent:
+                return
+            db = self._db()
+            db.execute("DELETE FROM labels")
+            db.commit()
+
+
+class PropertyTypeRegistry:
+    """Rejestr typów danych właściwości. Typy danych właściwości nie zmieniają
+    się, więc są pobierane jednorazowo (jedno zapytanie SPARQL), zapisywane
+    w pliku i odczytywane z pamięci. Brakujące właściwości są doczytywane
+    przez wbgetentities w paczkach po 50 identyfikatorów.
+    """
+
+    def __init__(self, path=None):
+        self.path = path if path else CACHE_DIR / "property_types.json"
+        self._types = {}
+        self._missing = set()
+        self._loaded = False
+        self._lock = threading.RLock()
+        self.offline = False
+
+    def __contains__(self, p_id: str) -> bool:
+        return p_id in self._types
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    def load(self):
+        """odczyt rejestru z pliku, a jeżeli brak pliku - z Wikibase (SPARQL)"""
+        with self._lock:
+            self._loaded = True
+            file_types = {}
+            if Path(self.path).is_file():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    file_types = json.load(f).get(wbi_config["MEDIAWIKI_API_URL"], {})
+
+            if file_types:
+                self._types.update(file_types)
+            elif not self.offline:
+                self.load_sparql()
+
+    def load_sparql(self):
+        """pobiera typy danych wszystkich właściwości jednym zapytaniem SPARQL"""
+        query = "SELECT ?property ?type WHERE { ?property wikibase:propertyType ?type . }"
+        try:
+            results = execute_sparql_query(query)
+        except (requests.exceptions.RequestException, ValueError) as sparql_error:
+            print(f"ERROR: nie udało się pobrać typów danych właściwości: {sparql_error}")
+            return
+
+        with self._lock:
+            for result in results["results"]["bindings"]:
+                p_id = result["property"]["value"].split("/")[-1]
+                p_type = result["type"]["value"].split("#")[-1]
+                if p_type in ONTOLOGY_DATATYPES:
+                    self._types[p_id] = ONTOLOGY_DATATYPES[p_type]
+            self.save()
+
+    def load_ids(self, ids: list):
+        """doczytuje typy danych wskazanych właściwości (wbgetentities, paczki po 50)"""
+        with self._lock:
+            missing = [
+                p_id
+                for p_id in dict.fromkeys(ids)
+                if p_id not in self._types and p_id not in self._missing
+            ]
+        if not missing:
+            return
+        if self.offline:
+            with self._lock:
+                self._missing.update(missing)
+            return
+
+        for i in range(0, len(missing), API_BATCH_SIZE):
+            params = {
+                "action": "wbgetentities",
+                "ids": "|".join(missing[i:i + API_BATCH_SIZE]),
+                "props": "datatype",
+            }
+            search_results = mediawiki_api_call_helper(
+                data=params,
+                login=None,
+                mediawiki_api_url=None,
+                user_agent=None,
+                allow_anonymous=True,
+            )
+            with self._lock:
+                for p_id, entity in search_results.get("entities", {}).items():
+                    if "datatype" in entity:
+                        self._types[p_id] = entity["datatype"]
+                    else:
+                        self._missing.add(p_id)
+        self.save()
+
+    def get(self, p_id: str) -> str:
+        """zwraca typ danych właściwości lub None jeżeli właściwość nie istnieje"""
+        if not self._loaded:
+            self.load()
+        if p_id not in self._types:
+            self.load_ids([p_id])
+
+        return self._types.get(p_id)
+
+    def register(self, p_id: str, datatype: str, save: bool = True):
+        """rejestracja typu danych nowo utworzonej właściwości"""
+        with self._lock:
+            self._types[p_id] = datatype
+            self._missing.discard(p_id)
+            if save:
+                self.save()
+
+    def types(self) -> dict:
+        """kopia rejestru: id właściwości -> typ danych"""
+        with self._lock:
+            return dict(self._types)
+
+    def save(self):
+        """zapis rejestru w pliku (osobno dla każdej instancji Wikibase)"""
+        with self._lock:
+            all_types = {}
+            if Path(self.path).is_file():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    all_types = json.load(f)
+            all_types[wbi_config["MEDIAWIKI_API_URL"]] = self._types
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(all_types, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+
+class PurlIndex:
+    """Indeks: identyfikator purl -> lista elementów (Q) z deklaracją
+    'purl identifier' o tej wartości. Wypełniany jednym stronicowanym
+    zapytaniem SPARQL (wszystkie wartości) lub zapytaniami z listą wartości
+    (po 100 w zapytaniu), uzupełniany przy zapisie encji w ENTITY_CACHE.
+    Indeks kompletny (pobrany w całości lub praca offline) nie jest
+    uzupełniany zapytaniami - wartości nieobecne w indeksie nie występują
+    w Wikibase.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.RLock()
+        self.prop_id = None
+        self.loaded = False
+        self.offline = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def complete(self) -> bool:
+        """czy indeks zawiera wszystkie identyfikatory purl z Wikibase"""
+        return self.loaded or self.offline
+
+    def __contains__(self, purl: str) -> bool:
+        return purl in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def load_all(self, purl_prop_id: str) -> int:
+        """pobiera wszystkie wartości właściwości 'purl identifier' (zapytanie
+        stronicowane), zwraca liczbę identyfikatorów purl w indeksie
+        """
+        self.prop_id = purl_prop_id
+        query = f"SELECT ?item ?purl WHERE {{ ?item wdt:{purl_prop_id} ?purl . }} ORDER BY ?purl ?item"
+        try:
+            results = sparql_pages(query)
+        except (requests.exceptions.RequestException, ValueError, KeyError) as sparql_error:
+            print(f"ERROR: nie udało się pobrać identyfikatorów purl: {sparql_error}")
+            return len(self)
+
+        with self._lock:
+            for result in results:
+                self.add(result["purl"]["value"], result["item"]["value"].split("/")[-1])
+            self.loaded = True
+
+        return len(self)
+
+    def load_values(self, purl_prop_id: str, purls: list) -> int:
+        """wyszukuje elementy dla podanych identyfikatorów purl, zwraca liczbę
+        wyszukiwanych (nieobecnych wcześniej w indeksie) wartości
+        """
+        self.prop_id = purl_prop_id
+        with self._lock:
+            missing = [purl for purl in dict.fromkeys(purls) if purl and purl not in self._items]
+        if self.complete:
+            return 0
+
+        for i in range(0, len(missing), SPARQL_BATCH_SIZE):
+            batch = missing[i:i + SPARQL_BATCH_SIZE]
+            values = " ".join(json.dumps(purl, ensure_ascii=False) for purl in batch)
+            query = f"SELECT ?item ?purl WHERE {{ VALUES ?purl {{ {values} }} ?item wdt:{purl_prop_id} ?purl . }}"
+            try:
+                results = execute_sparql_query(query)
+            except (requests.exceptions.RequestException, ValueError) as sparql_error:
+                print(f"ERROR: nie udało się pobrać elementów dla identyfikatorów purl: {sparql_error}")
+                return 0
+
+            with self._lock:
+                for purl in batch:
+                    self._items.setdefault(purl, [])
+                for result in results["results"]["bindings"]:
+                    qid = result["item"]["value"].split("/")[-1]
+                    purl = result["purl"]["value"]
+                    if qid not in self._items.setdefault(purl, []):
+                        self._items[purl].append(qid)
+
+        return len(missing)
+
+    def get(self, purl: str) -> list:
+        """zwraca listę elementów z identyfikatorem purl lub None jeżeli
+        wartość nie była jeszcze wyszukiwana
+        """
+        with self._lock:
+            items = self._items.get(purl)
+        if items is None and self.complete:
+            items = []
+        if items is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return list(items)
+
+    def add(self, purl: str, qid: str):
+        """rejestracja identyfikatora purl nowo utworzonego elementu"""
+        with self._lock:
+            items = self._items.setdefault(purl, [])
+            if qid not in items:
+                items.append(qid)
+
+    def update(self, entity: dict):
+        """rejestracja identyfikatorów purl z json encji (np. nowa deklaracja
+        'purl identifier' dodana do istniejącego elementu)
+        """
+        for claim in entity.get("claims", {}).get(self.prop_id, []):
+            if "datavalue" in claim["mainsnak"] and "remove" not in claim:
+                self.add(claim["mainsnak"]["datavalue"]["value"], entity["id"])
+
+    def report(self, purls: list) -> tuple:
+        """identyfikatory purl bez elementu i wskazujące więcej niż jeden
+        element (purl -> lista elementów), wartości niewyszukiwane są pomijane
+        """
+        missing = []
+        ambiguous = {}
+        with self._lock:
+            for purl in dict.fromkeys(purls):
+                items = self._items.get(purl)
+                if items is None and self.complete:
+                    items = []
+                if items is None:
+                    continue
+                if not items:
+                    missing.append(purl)
+                elif len(items) > 1:
+                    ambiguous[purl] = list(items)
+
+        return missing, ambiguous
+
+    def items(self) -> dict:
+        """kopia indeksu: purl -> lista elementów"""
+        with self._lock:
+            return copy.deepcopy(self._items)
+
+
+class LabelIndex:
+    """Indeks etykiet właściwości i elementów strukturalnych (definicyjnych):
+    wszystkie właściwości oraz elementy z deklaracją 'purl identifier' lub
+    z deklaracją 'instance of' wskazującą element z identyfikatorem purl.
+    Pobierany jednorazowo (stronicowane zapytania SPARQL), uzupełniany przy
+    zapisie encji w ENTITY_CACHE. Wyszukiwanie dokładnej etykiety - słownik.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._labels = {}
+        self._loaded = set()
+        self._lock = threading.RLock()
+        self.purl_prop_id = None
+        self.instance_prop_id = None
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, entity_id: str) -> bool:
+        return entity_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self) -> int:
+        """pobiera etykiety właściwości, a następnie elementów strukturalnych,
+        zwraca liczbę encji w indeksie
+        """
+        labels = """
+          OPTIONAL { ?entity rdfs:label ?label_en . FILTER(LANG(?label_en) = "en") }
+          OPTIONAL { ?entity rdfs:label ?label_pl . FILTER(LANG(?label_pl) = "pl") }
+          OPTIONAL { ?entity schema:description ?description_en . FILTER(LANG(?description_en) = "en") }
+        """
+        try:
+            properties = sparql_pages(
+                f"SELECT ?entity ?label_en ?label_pl ?description_en WHERE {{ "
+                f"?entity wikibase:propertyType ?type . {labels} }} ORDER BY ?entity"
+            )
+            with self._lock:
+                for result in properties:
+                    self._add_result(result, "property")
+                self._loaded.add("property")
+                self.purl_prop_id = self._first("purl identifier", "property")
+                self.instance_prop_id = self._first("instance of", "property")
+
+            if not self.purl_prop_id:
+                return len(self)
+
+            query = f"{{ ?entity wdt:{self.purl_prop_id} ?purl . }}"
+            if self.instance_prop_id:
+                query += (
+                    f" UNION {{ ?entity wdt:{self.instance_prop_id} ?class . "
+                    f"?class wdt:{self.purl_prop_id} ?class_purl . }}"
+                )
+            items = sparql_pages(
+                f"SELECT DISTINCT ?entity ?label_en ?label_pl ?description_en ?purl WHERE {{ "
+                f"{query} {labels} }} ORDER BY ?entity ?purl"
+            )
+        except (requests.exceptions.RequestException, ValueError, KeyError) as sparql_error:
+            print(f"ERROR: nie udało się pobrać indeksu etykiet: {sparql_error}")
+            return len(self)
+
+        with self._lock:
+            for result in items:
+                self._add_result(result, "item")
+            self._loaded.add("item")
+
+        return len(self)
+
+    def _add_result(self, result: dict, element_type: str):
+        """wiersz wyniku zapytania SPARQL do indeksu"""
+        entity_id = result["entity"]["value"].split("/")[-1]
+        entry = self._entries.get(entity_id)
+        if entry is None:
+            entry = {
+                "type": element_type,
+                "label_en": result.get("label_en", {}).get("value"),
+                "label_pl": result.get("label_pl", {}).get("value"),
+                "description_en": result.get("description_en", {}).get("value"),
+                "purl": [],
+            }
+            self._set(entity_id, entry)
+        purl = result.get("purl", {}).get("value")
+        if purl and purl not in entry["purl"]:
+            entry["purl"].append(purl)
+
+    def _set(self, entity_id: str, entry: dict):
+        """zapis pozycji indeksu wraz z indeksem etykiet"""
+        old = self._entries.get(entity_id)
+        if old is not None:
+            for lang in ("en", "pl"):
+                key = (old["type"], lang, old[f"label_{lang}"])
+                if entity_id in self._labels.get(key, []):
+                    self._labels[key].remove(entity_id)
+        self._entries[entity_id] = entry
+        for lang in ("en", "pl"):
+            if entry[f"label_{lang}"]:
+                ids = self._labels.setdefault((entry["type"], lang, entry[f"label_{lang}"]), [])
+                ids.append(entity_id)
+                ids.sort(key=lambda x: int(x[1:]))
+
+    def _first(self, label: str, element_type: str, lang: str = "en") -> str:
+        ids = self._labels.get((element_type, lang, label))
+        return ids[0] if ids else None
+
+    def get(self, label: str, element_type: str, lang: str = "en") -> list:
+        """identyfikatory encji o dokładnie takiej etykiecie (rosnąco), None
+        jeżeli indeks dla danego typu encji nie został pobrany
+        """
+        with self._lock:
+            if element_type not in self._loaded:
+                return None
+            ids = list(self._labels.get((element_type, lang, label), []))
+        if ids:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        return ids
+
+    def complete(self, element_type: str) -> bool:
+        """czy indeks zawiera wszystkie encje danego typu (tylko właściwości)"""
+        return element_type == "property" and element_type in self._loaded
+
+    def update(self, entity: dict):
+        """aktualizacja indeksu na podstawie json encji (nowa lub zmieniona
+        właściwość, element strukturalny)
+        """
+        entity_type = entity.get("type")
+        if entity_type not in ("property", "item"):
+            return
+
+        claims = entity.get("claims", {})
+        purls = [
+            claim["mainsnak"]["datavalue"]["value"]
+            for claim in claims.get(self.purl_prop_id, [])
+            if "datavalue" in claim["mainsnak"]
+        ]
+        with self._lock:
+            if entity_type == "item" and entity["id"] not in self._entries and not purls:
+                classes = [
+                    claim["mainsnak"]["datavalue"]["value"].get("id")
+                    for claim in claims.get(self.instance_prop_id, [])
+                    if "datavalue" in claim["mainsnak"]
+                ]
+                if not any(self._entries.get(x, {}).get("purl") for x in classes):
+                    return
+
+            entry = {
+                "type": entity_type,
+                "label_en": entity.get("labels", {}).get("en", {}).get("value"),
+                "label_pl": entity.get("labels", {}).get("pl", {}).get("value"),
+                "description_en": entity.get("descriptions", {}).get("en", {}).get("value"),
+                "purl": purls,
+            }
+            self._set(entity["id"], entry)
+
+
+# wspólny magazyn encji dla skryptów
+ENTITY_CACHE = EntityCache()
+
+# wspólna pamięć podręczna wyszukiwania etykiet
+LABEL_CACHE = LabelCache()
+
+# wspólny rejestr typów danych właściwości
+PROPERTY_TYPES = PropertyTypeRegistry()
+
+# wspólny indeks identyfikatorów purl
+PURL_INDEX = PurlIndex()
+
+# wspólny indeks etykiet właściwości i elementów strukturalnych
+LABEL_INDEX = LabelIndex()
+
+
+def save_snapshot(path=None, exclude=None) -> int:
+    """zapis migawki: encje z magazynu, indeks purl, typy właściwości;
+    migawka jest uzupełniana (encje z wcześniejszych uruchomień pozostają),
+    exclude - encje pomijane (zmienione w imporcie bez zapisu), encje
+    z tymczasowymi identyfikatorami nie są zapisywane; zwraca liczbę encji
+    w migawce
+    """
+    exclude = set(exclude or ())
+    path = path if path else SNAPSHOT_PATH
+    snapshot = {}
+    if Path(path).is_file():
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    if snapshot.get("api") != wbi_config["MEDIAWIKI_API_URL"]:
+        snapshot = {"api": wbi_config["MEDIAWIKI_API_URL"]}
+
+    entities = snapshot.setdefault("entities", {})
+    entities.update(
+        (entity_id, entity)
+        for entity_id, entity in ENTITY_CACHE.entities().items()
+        if entity_id not in exclude and not is_new_id(entity_id)
+    )
+    # migawki zapisane z encjami tymczasowymi przez wcześniejsze wersje skryptu
+    for entity_id in [x for x in entities if is_new_id(x)]:
+        del entities[entity_id]
+    purls = snapshot.setdefault("purls", {})
+    for purl, items in PURL_INDEX.items().items():
+        purls[purl] = [qid for qid in items if not is_new_id(qid)]
+    snapshot.setdefault("property_types", {}).update(
+        (p_id, datatype) for p_id, datatype in PROPERTY_TYPES.types().items() if not is_new_id(p_id)
+    )
+    core_props = wbi_core.ItemEngine.distinct_value_props.get(
+        wbi_config["SPARQL_ENDPOINT_URL"]
+    )
+    if core_props is not None:
+        snapshot["distinct_value_props"] = sorted(core_props)
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+
+    return len(snapshot["entities"])
+
+
+def load_snapshot(path=None) -> int:
+    """odczyt migawki do magazynu encji, indeksu purl i rejestru typów;
+    obsługiwany jest też zrzut encji Wikibase (lista encji w formacie json)
+    oraz odpowiedź wbgetentities, zwraca liczbę wczytanych encji
+    """
+    path = path if path else SNAPSHOT_PATH
+    with open(path, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+
+    if isinstance(snapshot, list):
+        snapshot = {"entities": {entity["id"]: entity for entity in snapshot}}
+
+    entities = snapshot.get("entities", {})
+    for entity in entities.values():
+        ENTITY_CACHE.store(entity)
+        if entity.get("type") == "property" and "datatype" in entity:
+            PROPERTY_TYPES.register(entity["id"], entity["datatype"], save=False)
+
+    for p_id, datatype in snapshot.get("property_types", {}).items():
+        PROPERTY_TYPES.register(p_id, datatype, save=False)
+
+    # właściwość 'purl identifier' - indeks purl uzupełniany przy zapisie encji
+    PURL_INDEX.prop_id = next(
+        (
+            entity["id"]
+            for entity in entities.values()
+            if entity.get("type") == "property"
+            and entity.get("labels", {}).get("en", {}).get("value") == "purl identifier"
+        ),
+        PURL_INDEX.prop_id,
+    )
+    purls = snapshot.get("purls")
+    if purls is None:
+        # zrzut encji - indeks purl budowany z deklaracji 'purl identifier'
+        for entity in entities.values():
+            PURL_INDEX.update(entity)
+    else:
+        for purl, items in purls.items():
+            for qid in items:
+                PURL_INDEX.add(purl, qid)
+
+    if "distinct_value_props" in snapshot:
+        wbi_core.ItemEngine.distinct_value_props[wbi_config["SPARQL_ENDPOINT_URL"]] = set(
+            snapshot["distinct_value_props"]
+        )
+
+    return len(entities)
+
+
+def set_offline(offline: bool = True):
+    """tryb offline: dane wyłącznie z magazynów w pamięci (np. wczytanej
+    migawki), bez zapytań do Wikibase; wyniki wyszukiwania etykiet tylko
+    w pamięci (nie mieszają się z wynikami z Wikibase w pliku);
+    offline = False - powrót do pracy z Wikibase (np. kolejny plik importu)
+    """
+    ENTITY_CACHE.offline = offline
+    PROPERTY_TYPES.offline = offline
+    PURL_INDEX.offline = offline
+    # wyniki wyszukiwania z poprzedniego trybu są nieaktualne (tylko pamięć)
+    LABEL_CACHE.persistent = False
+    LABEL_CACHE.clear()
+    LABEL_CACHE.persistent = not offline
+    if not offline:
+        return
+    wbi_core.ItemEngine.distinct_value_props.setdefault(
+        wbi_config["SPARQL_ENDPOINT_URL"], set()
+    )
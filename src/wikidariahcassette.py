@@ -0,0 +1,296 @@
+""" nagrywanie i odtwarzanie zapytań HTTP (kaseta SQLite) - praca skryptów
+    bez dostępu do Wikibase i VIAF
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+# parametry zapytań pomijane przy dopasowaniu znormalizowanym (tokeny,
+# dane logowania, parametry ogranicznika tempa zapytań)
+VOLATILE_PARAMS = {"token", "lgtoken", "lgname", "lgpassword", "maxlag", "requestid", "curtimestamp"}
+
+# parametry, których wartości nie są zapisywane w kasecie
+SECRET_PARAMS = {"token", "lgtoken", "lgpassword"}
+
+# nagłówki odpowiedzi pomijane w kasecie (treść zapisywana jest po dekompresji)
+SKIP_HEADERS = {"set-cookie", "content-encoding", "content-length", "transfer-encoding", "connection"}
+
+# zapis nagranych zapytań do pliku co tyle zapytań (i na końcu pracy skryptu)
+COMMIT_EVERY = 100
+
+
+class CassetteMiss(requests.exceptions.RequestException):
+    """brak nagranej odpowiedzi na zapytanie (tryb odtwarzania)"""
+
+
+def request_params(request: requests.PreparedRequest) -> list:
+    """parametry zapytania: z adresu i z treści formularza (POST)"""
+    params = parse_qsl(urlsplit(request.url).query, keep_blank_values=True)
+    body = request.body
+    if isinstance(body, bytes):
+        try:
+            body = body.decode("utf-8")
+        except UnicodeDecodeError:
+            return params
+    content_type = request.headers.get("Content-Type", "")
+    if body and "application/x-www-form-urlencoded" in content_type:
+        params += parse_qsl(body, keep_blank_values=True)
+
+    return params
+
+
+def normalize_value(value: str) -> str:
+    """wartość parametru w postaci kanonicznej: json z uporządkowanymi
+    kluczami, zapytanie SPARQL bez nadmiarowych odstępów
+    """
+    if value[:1] in ("{", "["):
+        try:
+            return json.dumps(json.loads(value), sort_keys=True, ensure_ascii=False)
+        except ValueError:
+            pass
+
+    return " ".join(value.split())
+
+
+def exact_key(request: requests.PreparedRequest) -> str:
+    """klucz dopasowania dokładnego: metoda, pełny adres i treść zapytania"""
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    digest = hashlib.sha1(f"{request.method} {request.url}\n".encode("utf-8"))
+    digest.update(body)
+
+    return digest.hexdigest()
+
+
+def normalized_key(request: requests.PreparedRequest) -> str:
+    """klucz dopasowania znormalizowanego: metoda, adres bez parametrów
+    i uporządkowane parametry w postaci kanonicznej bez VOLATILE_PARAMS
+    """
+    url = urlsplit(request.url)
+    params = sorted(
+        (key, normalize_value(value)) for key, value in request_params(request)
+        if key not in VOLATILE_PARAMS
+    )
+    text = f"{request.method} {url.scheme}://{url.netloc.lower()}{url.path}\n{json.dumps(params, ensure_ascii=False)}"
+    if not params and request.body:
+        # treść inna niż formularz (np. json)
+        body = request.body if isinstance(request.body, bytes) else request.body.encode("utf-8")
+        text += hashlib.sha1(body).hexdigest()
+
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def request_text(request: requests.PreparedRequest) -> str:
+    """opis zapytania zapisywany w kasecie (bez haseł i tokenów)"""
+    url = urlsplit(request.url)
+    params = [
+        (key, "***" if key in SECRET_PARAMS else value[:200])
+        for key, value in request_params(request)
+    ]
+
+    return f"{request.method} {url.scheme}://{url.netloc}{url.path} {json.dumps(params, ensure_ascii=False)}"
+
+
+class Cassette:
+    """Kaseta z nagranymi zapytaniami HTTP (plik SQLite). W trybie record
+    zapytania są wykonywane i zapisywane (opis zapytania, status, nagłówki,
+    skompresowana treść odpowiedzi - identyczne treści zapisywane raz),
+    w trybie replay odpowiedzi pochodzą wyłącznie z kasety. Dopasowanie:
+    exact - ta sama metoda, adres i treść zapytania, normalized (domyślnie)
+    - najpierw dokładne, potem bez tokenów i parametrów zmiennych, z json
+    i SPARQL w postaci kanonicznej. Kolejne zapytania o tym samym kluczu
+    otrzymują kolejne nagrane odpowiedzi (ostatnia jest powtarzana).
+    """
+
+    def __init__(self):
+        self.path = None
+        self.mode = None
+        self.match = "normalized"
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self._connection = None
+        self._pending = 0
+        self._position = {}
+        self._lock = threading.RLock()
+
+    @property
+    def recording(self) -> bool:
+        """tryb nagrywania"""
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        """tryb odtwarzania"""
+        return self.mode == "replay"
+
+    def open(self, path, mode: str = "replay", match: str = "normalized"):
+        """otwiera kasetę, mode: record (nowa kaseta) lub replay"""
+        if mode not in ("record", "replay"):
+            raise ValueError(f"nieznany tryb kasety: {mode}")
+        if match not in ("exact", "normalized"):
+            raise ValueError(f"nieznany sposób dopasowania zapytań: {match}")
+        if mode == "replay" and not Path(path).is_file():
+            raise FileNotFoundError(f"brak kasety: {path}")
+
+        self.close()
+        with self._lock:
+            self.path = Path(path)
+            self.mode = mode
+            self.match = match
+            self._position = {}
+            if mode == "record":
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                if self.path.exists():
+                    self.path.unlink()
+            self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS requests (
+                    id INTEGER PRIMARY KEY, exact_key TEXT, normalized_key TEXT,
+                    request TEXT, status INTEGER, reason TEXT, headers TEXT,
+                    body TEXT, elapsed REAL)"""
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS bodies (hash TEXT PRIMARY KEY, data BLOB)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS requests_exact ON requests (exact_key)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS requests_normalized ON requests (normalized_key)"
+            )
+            self._connection.commit()
+
+        atexit.register(self.close)
+
+    def close(self):
+        """zapisuje nagrane zapytania i zamyka kasetę"""
+        with self._lock:
+            if self._connection is None:
+                return
+            self._connection.commit()
+            self._connection.close()
+            self._connection = None
+            if self.recording:
+                print(f"CASSETTE: nagrano zapytań: {self.recorded} ({self.path})")
+            elif self.replaying:
+                print(f"CASSETTE: odtworzono zapytań: {self.replayed}, brak w kasecie: {self.misses} ({self.path})")
+            self.mode = None
+
+    def record(self, request: requests.PreparedRequest, response: requests.Response, elapsed: float):
+        """zapisuje zapytanie i odpowiedź (elapsed - czas odpowiedzi w sekundach)"""
+        content = response.content or b""
+        body_hash = hashlib.sha1(content).hexdigest()
+        headers = {key: value for key, value in response.headers.items() if key.lower() not in SKIP_HEADERS}
+        with self._lock:
+            if self._connection is None:
+                return
+            self._connection.execute(
+                "INSERT OR IGNORE INTO bodies VALUES (?, ?)", (body_hash, zlib.compress(content, 9))
+            )
+            self._connection.execute(
+                "INSERT INTO requests (exact_key, normalized_key, request, status, reason, headers, body, elapsed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (exact_key(request), normalized_key(request), request_text(request),
+                 response.status_code, response.reason, json.dumps(headers), body_hash,
+                 round(elapsed, 4)),
+            )
+            self.recorded += 1
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self._connection.commit()
+                self._pending = 0
+
+    def _find(self, column: str, key: str) -> tuple:
+        """kolejna nagrana odpowiedź dla klucza (ostatnia, gdy wykorzystano wszystkie)"""
+        rows = self._connection.execute(
+            f"SELECT status, reason, headers, body FROM requests WHERE {column}=? ORDER BY id", (key,)
+        ).fetchall()
+        if not rows:
+            return None
+        position = self._position.get((column, key), 0)
+        self._position[(column, key)] = position + 1
+
+        return rows[min(position, len(rows) - 1)]
+
+    def replay(self, request: requests.PreparedRequest) -> requests.Response:
+        """odpowiedź z kasety na zapytanie"""
+        with self._lock:
+            if self._connection is None:
+                raise CassetteMiss("kaseta zamknięta", request=request)
+            row = self._find("exact_key", exact_key(request))
+            if row is None and self.match == "normalized":
+                row = self._find("normalized_key", normalized_key(request))
+            if row is None:
+                self.misses += 1
+                raise CassetteMiss(f"brak zapytania w kasecie: {request_text(request)}", request=request)
+            status, reason, headers, body_hash = row
+            data = self._connection.execute("SELECT data FROM bodies WHERE hash=?", (body_hash,)).fetchone()[0]
+            self.replayed += 1
+
+        response = requests.Response()
+        response.status_code = status
+        response.reason = reason
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response._content = zlib.decompress(data)
+        response._content_consumed = True
+
+        return response
+
+
+class CassetteAdapter(HTTPAdapter):
+    """adapter HTTP sesji: zapytania wykonywane (i ewentualnie nagrywane)
+    lub odtwarzane z kasety
+    """
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        self.cassette = cassette
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if self.cassette.replaying:
+            response = self.cassette.replay(request)
+            response.connection = self
+            return response
+
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        if self.cassette.recording:
+            self.cassette.record(request, response, time.perf_counter() - start)
+
+        return response
+
+
+def open_from_env(cassette: Cassette) -> Cassette:
+    """kaseta wskazana zmiennymi środowiskowymi WIKIDARIAH_CASSETTE (plik),
+    WIKIDARIAH_CASSETTE_MODE (record/replay), WIKIDARIAH_CASSETTE_MATCH
+    (exact/normalized)
+    """
+    path = os.environ.get("WIKIDARIAH_CASSETTE")
+    if path:
+        cassette.open(path,
+                      mode=os.environ.get("WIKIDARIAH_CASSETTE_MODE", "replay"),
+                      match=os.environ.get("WIKIDARIAH_CASSETTE_MATCH", "normalized"))
+
+    return cassette
+
+
+# wspólna kaseta skryptów (wikidariahhttp)
+CASSETTE = open_from_env(Cassette())
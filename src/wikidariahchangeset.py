@@ -0,0 +1,274 @@
+""" zestawienie zmian (changeset) importu wykonywanego bez zapisu do Wikibase """
+
+import copy
+import json
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from wikibaseintegrator import wbi_core
+from wikidariahcache import ENTITY_CACHE, LABEL_CACHE, PROPERTY_TYPES, NEW_ID_START
+
+
+def snak_value(snak: dict) -> str:
+    """wartość snaka (wartości deklaracji, kwalifikatora, referencji) jako tekst"""
+    if snak.get("snaktype", "value") != "value":
+        return snak["snaktype"]
+
+    datavalue = snak["datavalue"]
+    value = datavalue["value"]
+    value_type = datavalue.get("type")
+    if value_type == "wikibase-entityid":
+        if "id" in value:
+            return value["id"]
+        prefix = "P" if value.get("entity-type") == "property" else "Q"
+        return f"{prefix}{value['numeric-id']}"
+    if value_type == "monolingualtext":
+        return f'{value["language"]}:"{value["text"]}"'
+    if value_type == "time":
+        return f'{value["time"]}/{value["precision"]}'
+    if value_type == "quantity":
+        unit = value.get("unit", "1")
+        return value["amount"] if unit == "1" else f'{value["amount"]} {unit.split("/")[-1]}'
+    if value_type == "globecoordinate":
+        return f'{value["latitude"]},{value["longitude"]}'
+    if isinstance(value, str):
+        return value
+
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def snak_list(snaks: dict) -> list:
+    """snaki (kwalifikatory, referencja) jako lista {property, value}"""
+    return [
+        {"property": prop_nr, "value": snak_value(snak)}
+        for prop_nr, prop_snaks in snaks.items()
+        for snak in prop_snaks
+    ]
+
+
+def reference_key(reference: dict) -> tuple:
+    """porównywalna postać referencji (niezależna od hash i kolejności)"""
+    return tuple(
+        sorted((item["property"], item["value"]) for item in snak_list(reference.get("snaks", {})))
+    )
+
+
+class Changeset:
+    """Zestawienie zmian, które import wprowadziłby w Wikibase: nowe encje,
+    zmiany etykiet/opisów/aliasów, nowe (i usuwane) deklaracje, nowe
+    kwalifikatory i referencje. Zmiany są nanoszone na encje w ENTITY_CACHE,
+    nowe encje otrzymują tymczasowe identyfikatory, więc kolejne wiersze
+    arkuszy widzą zmiany wprowadzone przez poprzednie.
+    """
+
+    def __init__(self):
+        self.changes = []
+        self._new_ids = Counter()
+        self._reserved = {}
+        self._local = threading.local()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def _next_id(self, prefix: str) -> str:
+        """kolejny wolny tymczasowy identyfikator"""
+        with self._lock:
+            self._new_ids[prefix] += 1
+            return f"{prefix}{NEW_ID_START + self._new_ids[prefix]}"
+
+    def reserve(self, owner, entity_type: str) -> str:
+        """rezerwacja identyfikatora nowej encji dla zadania owner (np. wiersza
+        arkusza) - identyfikatory rezerwowane w kolejności planu importu nie
+        zależą od kolejności wykonania zadań w wątkach
+        """
+        prefix = "P" if entity_type == "property" else "Q"
+        with self._lock:
+            self._reserved[owner] = self._next_id(prefix)
+            return self._reserved[owner]
+
+    def release(self):
+        """usunięcie niewykorzystanych rezerwacji (wiersze bez nowych encji)"""
+        with self._lock:
+            self._reserved.clear()
+
+    @contextmanager
+    def owner(self, owner):
+        """zadanie wykonywane w bieżącym wątku (nowa encja otrzyma
+        identyfikator zarezerwowany dla zadania)
+        """
+        previous = getattr(self._local, "owner", None)
+        self._local.owner = owner
+        try:
+            yield
+        finally:
+            self._local.owner = previous
+
+    def new_id(self, entity_type: str) -> str:
+        """tymczasowy identyfikator nowej encji: zarezerwowany dla bieżącego
+        zadania lub kolejny wolny
+        """
+        prefix = "P" if entity_type == "property" else "Q"
+        owner = getattr(self._local, "owner", None)
+        with self._lock:
+            reserved = self._reserved.get(owner) if owner is not None else None
+            if reserved and reserved.startswith(prefix):
+                del self._reserved[owner]
+                return reserved
+            return self._next_id(prefix)
+
+    def write(self, wd_item: wbi_core.ItemEngine, entity_type: str = "item",
+              property_datatype: str = None) -> str:
+        """zapis 'na sucho' obiektu ItemEngine: zmiany trafiają do zestawienia,
+        encja do ENTITY_CACHE, zwraca identyfikator encji (tymczasowy dla nowych)
+        """
+        if wd_item.item_id:
+            entity_id = wd_item.item_id
+            original = ENTITY_CACHE.get_json(entity_id)
+            working = copy.deepcopy(original)
+        else:
+            entity_id = self.new_id(entity_type)
+            original = {}
+            working = {"id": entity_id, "type": entity_type}
+            if entity_type == "property":
+                working["datatype"] = property_datatype
+
+        for key in ("labels", "descriptions", "aliases"):
+            working[key] = copy.deepcopy(wd_item.json_representation.get(key, {}))
+        working["claims"] = {}
+        for prop_nr, claims in wd_item.json_representation.get("claims", {}).items():
+            for claim in claims:
+                if "remove" in claim:
+                    continue
+                claim = copy.deepcopy(claim)
+                if "id" not in claim:
+                    claim["id"] = f"{entity_id}${uuid.uuid4()}"
+                working["claims"].setdefault(prop_nr, []).append(claim)
+
+        self.record(entity_id, original, working)
+        ENTITY_CACHE.store(working)
+        if not original and entity_type == "property":
+            PROPERTY_TYPES.register(entity_id, property_datatype, save=False)
+
+        return entity_id
+
+    def record(self, entity_id: str, original: dict, working: dict):
+        """zmiany encji: stan working w stosunku do original (pusty - nowa encja)"""
+        # wyniki wyszukiwania uwzględniające zmiany bez zapisu - tylko w pamięci
+        LABEL_CACHE.persistent = False
+        changes = []
+        if not original:
+            changes.append({
+                "action": "create",
+                "entity": entity_id,
+                "type": working.get("type"),
+                "datatype": working.get("datatype"),
+                "labels": {lang: value["value"] for lang, value in working.get("labels", {}).items()},
+                "descriptions": {lang: value["value"] for lang, value in working.get("descriptions", {}).items()},
+                "aliases": {
+                    lang: [alias["value"] for alias in aliases]
+                    for lang, aliases in working.get("aliases", {}).items()
+                },
+            })
+        else:
+            for key, term in (("labels", "label"), ("descriptions", "description")):
+                for lang, value in working.get(key, {}).items():
+                    old = original.get(key, {}).get(lang, {}).get("value")
+                    if old != value["value"]:
+                        changes.append({"action": "term", "entity": entity_id, "term": term,
+                                        "lang": lang, "old": old, "new": value["value"]})
+            for lang, aliases in working.get("aliases", {}).items():
+                old = [alias["value"] for alias in original.get("aliases", {}).get(lang, [])]
+                for alias in aliases:
+                    if alias["value"] not in old:
+                        changes.append({"action": "term", "entity": entity_id, "term": "alias",
+                                        "lang": lang, "old": None, "new": alias["value"]})
+
+        original_claims = {
+            claim["id"]: claim
+            for claims in original.get("claims", {}).values()
+            for claim in claims
+        }
+        working_ids = set()
+        for prop_nr, claims in working.get("claims", {}).items():
+            for claim in claims:
+                working_ids.add(claim["id"])
+                statement = {
+                    "entity": entity_id,
+                    "property": prop_nr,
+                    "value": snak_value(claim["mainsnak"]),
+                }
+                old = original_claims.get(claim["id"])
+                if old is None:
+                    changes.append({
+                        "action": "statement_add",
+                        **statement,
+                        "qualifiers": snak_list(claim.get("qualifiers", {})),
+                        "references": [snak_list(ref.get("snaks", {})) for ref in claim.get("references", [])],
+                    })
+                    continue
+
+                statement["statement"] = claim["id"]
+                old_qualifiers = snak_list(old.get("qualifiers", {}))
+                for qualifier in snak_list(claim.get("qualifiers", {})):
+                    if qualifier not in old_qualifiers:
+                        changes.append({"action": "qualifier_add", **statement, "qualifier": qualifier})
+                old_references = {reference_key(ref) for ref in old.get("references", [])}
+                for reference in claim.get("references", []):
+                    if reference_key(reference) not in old_references:
+                        changes.append({"action": "reference_add", **statement,
+                                        "reference": snak_list(reference.get("snaks", {}))})
+
+        for claim_id, claim in original_claims.items():
+            if claim_id not in working_ids:
+                changes.append({
+                    "action": "statement_remove",
+                    "entity": entity_id,
+                    "property": claim["mainsnak"]["property"],
+                    "value": snak_value(claim["mainsnak"]),
+                    "statement": claim_id,
+                })
+
+        # nowe etykiety i aliasy - nieaktualne wyniki wyszukiwania
+        if any(change["action"] in ("create", "term") for change in changes):
+            LABEL_CACHE.invalidate_id(entity_id)
+            for value in working.get("labels", {}).values():
+                LABEL_CACHE.invalidate(value["value"])
+            for aliases in working.get("aliases", {}).values():
+                for alias in aliases:
+                    LABEL_CACHE.invalidate(alias["value"])
+
+        with self._lock:
+            self.changes.extend(changes)
+
+        return changes
+
+    def entity_ids(self) -> set:
+        """identyfikatory encji zmienionych i utworzonych (tymczasowe)"""
+        with self._lock:
+            return {change["entity"] for change in self.changes}
+
+    def summary(self) -> dict:
+        """liczba zmian wg rodzaju"""
+        with self._lock:
+            return dict(Counter(change["action"] for change in self.changes))
+
+    def save(self, path, source: str = ""):
+        """zapis zestawienia zmian w pliku json, zmiany uporządkowane wg encji
+        (kolejność zmian encji zachowana) - niezależnie od kolejności
+        wykonania zadań w wątkach
+        """
+        with self._lock:
+            changes = sorted(
+                self.changes, key=lambda change: (change["entity"][0], int(change["entity"][1:]))
+            )
+            output = {"source": source, "summary": self.summary(), "changes": changes}
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=1)
+
+
+# wspólne zestawienie zmian dla skryptów
+CHANGESET = Changeset()
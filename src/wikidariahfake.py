@@ -0,0 +1,424 @@
+""" lokalna atrapa API MediaWiki/Wikibase i punktu SPARQL (benchmark importu) """
+
+import copy
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+from wikidariahcache import ONTOLOGY_DATATYPES
+
+
+# typ wartości (datavalue) dla typu danych właściwości
+VALUE_TYPES = {
+    "wikibase-item": "wikibase-entityid",
+    "wikibase-property": "wikibase-entityid",
+    "monolingualtext": "monolingualtext",
+    "time": "time",
+    "quantity": "quantity",
+    "globe-coordinate": "globecoordinate",
+}
+
+# typ danych właściwości -> typ w ontologii wikibase (wikibase:propertyType)
+ONTOLOGY_TYPES = {datatype: name for name, datatype in ONTOLOGY_DATATYPES.items()}
+
+# liczba wyników wyszukiwania na stronę (wbsearchentities)
+SEARCH_LIMIT = 50
+
+
+def sparql_strings(text: str) -> list:
+    """literały tekstowe (w cudzysłowach, jak w json) z fragmentu zapytania SPARQL"""
+    decoder = json.JSONDecoder()
+    values = []
+    pos = 0
+    while pos < len(text):
+        if text[pos].isspace():
+            pos += 1
+            continue
+        value, pos = decoder.raw_decode(text, pos)
+        values.append(value)
+
+    return values
+
+
+class FakeWikibase:
+    """Atrapa instancji Wikibase przechowująca encje w pamięci: API
+    (wbsearchentities, wbgetentities, wbeditentity, wbsetqualifier,
+    wbsetreference, query&meta=tokens, login) i punkt SPARQL obsługujący
+    zapytania skryptów (typy właściwości, indeks etykiet, indeks purl).
+    Każda odpowiedź jest opóźniana o latency sekund, liczniki zapytań wg
+    rodzaju i przesłanych bajtów - requests, bytes_received, bytes_sent.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.entities = {}
+        self.revision = 0
+        self.requests = Counter()
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.url = None
+        self._next_id = Counter()
+        self._claims = {}
+        self._server = None
+        self._lock = threading.RLock()
+
+    def load(self, entities) -> int:
+        """encje początkowe (np. z migawki cache/snapshot.json)"""
+        with self._lock:
+            for entity in entities:
+                entity = copy.deepcopy(entity)
+                if "missing" in entity:
+                    continue
+                self.entities[entity["id"]] = entity
+                prefix, number = entity["id"][0], int(entity["id"][1:])
+                self._next_id[prefix] = max(self._next_id[prefix], number)
+                self.revision = max(self.revision, entity.get("lastrevid", 0))
+                for claims in entity.get("claims", {}).values():
+                    for claim in claims:
+                        self._claims[claim["id"]] = entity["id"]
+
+        return len(self.entities)
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """uruchomienie serwera HTTP w osobnym wątku, zwraca adres instancji
+        (API: {adres}/api.php, SPARQL: {adres}/bigdata/sparql)
+        """
+        wikibase = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """obsługa zapytań HTTP (keep-alive)"""
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                wikibase.handle(self)
+
+            def do_POST(self):
+                wikibase.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+        return self.url
+
+    def stop(self):
+        """zatrzymanie serwera"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def handle(self, request: BaseHTTPRequestHandler):
+        """zapytanie HTTP: parametry z adresu i treści (formularz), odpowiedź json"""
+        url = urlparse(request.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        params.update({key: values[-1] for key, values in parse_qs(body.decode("utf-8")).items()})
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if url.path.endswith("/sparql"):
+            kind = "sparql"
+            output = self.sparql(params.get("query", ""))
+        else:
+            kind = params.get("action", "")
+            if kind == "query" and params.get("meta") == "tokens":
+                kind = "token"
+            try:
+                output = self.api(params)
+            except (KeyError, ValueError) as api_error:
+                output = {"error": {"code": "badvalue", "info": str(api_error)}}
+
+        data = json.dumps(output, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            self.requests[kind] += 1
+            self.bytes_received += len(request.requestline) + length
+            self.bytes_sent += len(data)
+
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json; charset=utf-8")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    def api(self, params: dict) -> dict:
+        """akcje API MediaWiki/Wikibase"""
+        action = params.get("action")
+        if action == "query" and params.get("meta") == "tokens":
+            return {"query": {"tokens": {"csrftoken": "fake+\\", "logintoken": "fake+\\"}}}
+        if action == "login":
+            return {"login": {"result": "Success", "lgusername": params.get("lgname", "")}}
+        if action == "wbsearchentities":
+            return self.search(params)
+        if action == "wbgetentities":
+            with self._lock:
+                return {
+                    "entities": {
+                        entity_id: copy.deepcopy(self.entities.get(entity_id, {"id": entity_id, "missing": ""}))
+                        for entity_id in params["ids"].split("|")
+                    },
+                    "success": 1,
+                }
+        if action == "wbeditentity":
+            return self.edit_entity(params)
+        if action == "wbsetqualifier":
+            return self.set_qualifier(params)
+        if action == "wbsetreference":
+            return self.set_reference(params)
+
+        return {"error": {"code": "badvalue", "info": f"Unrecognized value for parameter 'action': {action}"}}
+
+    def search(self, params: dict) -> dict:
+        """wbsearchentities: etykiety i aliasy zaczynające się od szukanego
+        tekstu (bez rozróżniania wielkości liter), dokładne dopasowania najpierw
+        """
+        text = params["search"].casefold()
+        lang = params.get("language", "en")
+        entity_type = params.get("type", "item")
+        found = []
+        with self._lock:
+            for entity_id, entity in self.entities.items():
+                if entity.get("type") != entity_type:
+                    continue
+                names = [entity.get("labels", {}).get(lang, {}).get("value", "")]
+                names += [alias["value"] for alias in entity.get("aliases", {}).get(lang, [])]
+                names = [name for name in names if name.casefold().startswith(text)]
+                if names:
+                    exact = any(name.casefold() == text for name in names)
+                    found.append((not exact, int(entity_id[1:]), entity_id, names[0]))
+
+        found.sort()
+        offset = int(params.get("continue", 0) or 0)
+        page = found[offset:offset + SEARCH_LIMIT]
+        output = {
+            "search": [
+                {"id": entity_id, "label": label, "match": {"type": "label", "language": lang, "text": label}}
+                for _, _, entity_id, label in page
+            ],
+            "success": 1,
+        }
+        if offset + SEARCH_LIMIT < len(found):
+            output["search-continue"] = offset + SEARCH_LIMIT
+
+        return output
+
+    def edit_entity(self, params: dict) -> dict:
+        """wbeditentity: nowa encja (new) lub zmiana encji (id)"""
+        data = json.loads(params.get("data", "{}"))
+        with self._lock:
+            if "new" in params:
+                prefix = "P" if params["new"] == "property" else "Q"
+                self._next_id[prefix] += 1
+                entity_id = f"{prefix}{self._next_id[prefix]}"
+                entity = {"id": entity_id, "type": params["new"], "labels": {}, "descriptions": {},
+                          "aliases": {}, "claims": {}}
+                if params["new"] == "property":
+                    entity["datatype"] = data.get("datatype", "string")
+                else:
+                    entity["sitelinks"] = {}
+            else:
+                entity_id = params["id"]
+                if entity_id not in self.entities:
+                    return {"error": {"code": "no-such-entity", "info": f"Could not find an entity with the ID \"{entity_id}\"."}}
+                entity = self.entities[entity_id]
+
+            for key in ("labels", "descriptions"):
+                for lang, value in data.get(key, {}).items():
+                    if "remove" in value or not value.get("value"):
+                        entity[key].pop(lang, None)
+                    else:
+                        entity[key][lang] = {"language": lang, "value": value["value"]}
+
+            aliases = data.get("aliases", {})
+            if isinstance(aliases, list):
+                grouped = {}
+                for alias in aliases:
+                    grouped.setdefault(alias["language"], []).append(alias)
+                aliases = grouped
+            for lang, values in aliases.items():
+                if any("add" in alias or "remove" in alias for alias in values):
+                    current = entity["aliases"].setdefault(lang, [])
+                    for alias in values:
+                        old = [x for x in current if x["value"] == alias["value"]]
+                        if "remove" in alias:
+                            for x in old:
+                                current.remove(x)
+                        elif not old:
+                            current.append({"language": lang, "value": alias["value"]})
+                else:
+                    entity["aliases"][lang] = [{"language": lang, "value": alias["value"]} for alias in values]
+                if not entity["aliases"][lang]:
+                    entity["aliases"].pop(lang)
+
+            claims = data.get("claims", {})
+            if isinstance(claims, dict):
+                claims = [claim for prop_claims in claims.values() for claim in prop_claims]
+            for claim in claims:
+                self._set_claim(entity, claim)
+
+            self.revision += 1
+            entity["lastrevid"] = self.revision
+            self.entities[entity_id] = entity
+
+            return {"entity": copy.deepcopy(entity), "success": 1}
+
+    def _set_claim(self, entity: dict, claim: dict):
+        """nowa, zmieniona lub usuwana (remove) deklaracja encji"""
+        claim = copy.deepcopy(claim)
+        claim_id = claim.get("id")
+        if claim_id and claim_id in self._claims:
+            for prop_claims in entity["claims"].values():
+                for old in list(prop_claims):
+                    if old["id"] == claim_id:
+                        prop_claims.remove(old)
+            if "remove" in claim:
+                del self._claims[claim_id]
+                return
+        if "remove" in claim:
+            return
+
+        if not claim_id:
+            claim["id"] = claim_id = f"{entity['id']}${uuid.uuid4()}"
+        claim.setdefault("type", "statement")
+        claim.setdefault("rank", "normal")
+        prop_nr = claim["mainsnak"]["property"]
+        entity["claims"].setdefault(prop_nr, []).append(claim)
+        self._claims[claim_id] = entity["id"]
+
+    def _find_claim(self, claim_id: str) -> tuple:
+        """encja i deklaracja o podanym identyfikatorze (GUID)"""
+        entity = self.entities[self._claims[claim_id]]
+        for prop_claims in entity["claims"].values():
+            for claim in prop_claims:
+                if claim["id"] == claim_id:
+                    return entity, claim
+
+        raise KeyError(claim_id)
+
+    def _snak(self, prop_nr: str, snaktype: str, value) -> dict:
+        """snak kwalifikatora (typ wartości wg typu danych właściwości)"""
+        datatype = self.entities.get(prop_nr, {}).get("datatype", "string")
+        snak = {"snaktype": snaktype, "property": prop_nr, "datatype": datatype}
+        if snaktype == "value":
+            snak["datavalue"] = {"value": value, "type": VALUE_TYPES.get(datatype, "string")}
+
+        return snak
+
+    def set_qualifier(self, params: dict) -> dict:
+        """wbsetqualifier: nowy kwalifikator deklaracji"""
+        with self._lock:
+            if params["claim"] not in self._claims:
+                return {"error": {"code": "no-such-claim", "info": "Could not find the claim"}}
+            entity, claim = self._find_claim(params["claim"])
+            value = json.loads(params["value"]) if "value" in params else None
+            snak = self._snak(params["property"], params.get("snaktype", "value"), value)
+            claim.setdefault("qualifiers", {}).setdefault(params["property"], []).append(snak)
+            claim.setdefault("qualifiers-order", [])
+            if params["property"] not in claim["qualifiers-order"]:
+                claim["qualifiers-order"].append(params["property"])
+            self.revision += 1
+            entity["lastrevid"] = self.revision
+
+            return {"pageinfo": {"lastrevid": self.revision}, "success": 1, "claim": copy.deepcopy(claim)}
+
+    def set_reference(self, params: dict) -> dict:
+        """wbsetreference: nowa referencja deklaracji"""
+        with self._lock:
+            if params["statement"] not in self._claims:
+                return {"error": {"code": "no-such-claim", "info": "Could not find the statement"}}
+            entity, claim = self._find_claim(params["statement"])
+            snaks = json.loads(params["snaks"])
+            reference = {"hash": uuid.uuid4().hex, "snaks": snaks, "snaks-order": list(snaks)}
+            claim.setdefault("references", []).append(reference)
+            self.revision += 1
+            entity["lastrevid"] = self.revision
+
+            return {"pageinfo": {"lastrevid": self.revision}, "success": 1, "reference": copy.deepcopy(reference)}
+
+    def _entity_uri(self, entity_id: str) -> dict:
+        return {"type": "uri", "value": f"{self.url}/entity/{entity_id}"}
+
+    def _values(self, entity: dict, prop_nr: str) -> list:
+        """wartości deklaracji właściwości (tekst lub identyfikator encji)"""
+        values = []
+        for claim in entity.get("claims", {}).get(prop_nr, []):
+            datavalue = claim["mainsnak"].get("datavalue")
+            if datavalue is None:
+                continue
+            value = datavalue["value"]
+            values.append(value.get("id", f"Q{value.get('numeric-id')}") if isinstance(value, dict) else value)
+
+        return values
+
+    def _labels(self, entity: dict) -> dict:
+        """etykiety en/pl i opis en jako wiersz wyniku SPARQL"""
+        row = {}
+        for name, key, lang in (("label_en", "labels", "en"), ("label_pl", "labels", "pl"),
+                                ("description_en", "descriptions", "en")):
+            value = entity.get(key, {}).get(lang, {}).get("value")
+            if value:
+                row[name] = {"type": "literal", "value": value, "xml:lang": lang}
+
+        return row
+
+    def sparql(self, query: str) -> dict:
+        """zapytania SPARQL skryptów: typy danych właściwości, etykiety
+        właściwości i elementów strukturalnych, identyfikatory purl; pozostałe
+        zapytania - pusty wynik
+        """
+        props = re.findall(r"wdt:(P\d+)", query)
+        bindings = []
+        with self._lock:
+            entities = sorted(self.entities.values(), key=lambda x: (x["id"][0], int(x["id"][1:])))
+            if "?property wikibase:propertyType" in query:
+                for entity in entities:
+                    if entity.get("type") == "property":
+                        bindings.append({
+                            "property": self._entity_uri(entity["id"]),
+                            "type": {"type": "uri", "value": f"http://wikiba.se/ontology#{ONTOLOGY_TYPES.get(entity['datatype'], 'String')}"},
+                        })
+            elif "?entity wikibase:propertyType" in query:
+                for entity in entities:
+                    if entity.get("type") == "property":
+                        bindings.append({"entity": self._entity_uri(entity["id"]), **self._labels(entity)})
+            elif "?entity" in query and props:
+                purl_prop = props[0]
+                instance_prop = props[1] if len(props) > 1 else None
+                classes = {entity["id"] for entity in entities if self._values(entity, purl_prop)}
+                for entity in entities:
+                    row = {"entity": self._entity_uri(entity["id"]), **self._labels(entity)}
+                    purls = self._values(entity, purl_prop)
+                    for purl in purls:
+                        bindings.append({**row, "purl": {"type": "literal", "value": purl}})
+                    if instance_prop and not purls and classes & set(self._values(entity, instance_prop)):
+                        bindings.append(row)
+            elif "?item ?purl" in query and props:
+                match = re.search(r"VALUES \?purl \{(.*?)\} \?item", query)
+                wanted = set(sparql_strings(match.group(1))) if match else None
+                for entity in entities:
+                    for purl in self._values(entity, props[0]):
+                        if wanted is None or purl in wanted:
+                            bindings.append({"item": self._entity_uri(entity["id"]),
+                                             "purl": {"type": "literal", "value": purl}})
+            elif "?item WHERE" in query and props:
+                match = re.search(r'wdt:P\d+ "(.*)"', query)
+                for entity in entities:
+                    if match and match.group(1) in self._values(entity, props[0]):
+                        bindings.append({"item": self._entity_uri(entity["id"])})
+
+        offset = re.search(r"OFFSET (\d+)", query)
+        limit = re.search(r"LIMIT (\d+)", query)
+        start = int(offset.group(1)) if offset else 0
+        bindings = bindings[start:start + int(limit.group(1))] if limit else bindings[start:]
+
+        return {"head": {"vars": []}, "results": {"bindings": bindings}}
@@ -0,0 +1,107 @@
+""" wspólna warstwa HTTP: sesja z pulą połączeń, keep-alive, gzip, limity
+    czasu, liczniki zapytań (wikidariahstats), nagrywanie i odtwarzanie
+    zapytań (wikidariahcassette)
+"""
+
+import time
+import requests
+from wikibaseintegrator import wbi_functions, wbi_login
+from wikibaseintegrator.wbi_config import config as wbi_config
+from wikidariahstats import STATS
+from wikidariahcassette import CASSETTE, CassetteAdapter
+
+
+# limit czasu (w sekundach) nawiązania połączenia i odczytu odpowiedzi
+HTTP_TIMEOUT = (10, 120)
+
+# liczba pul połączeń (hostów) i liczba połączeń w puli jednego hosta
+# (nie mniej niż liczba wątków importu)
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+
+def configure_session(session: requests.Session, timeout: tuple = HTTP_TIMEOUT) -> requests.Session:
+    """sesja z pulą połączeń, keep-alive, kompresją gzip i domyślnym limitem
+    czasu zapytań (np. sesja logowania wbi_login.Login), zapytania nagrywane
+    lub odtwarzane gdy otwarta jest kaseta (CASSETTE)
+    """
+    if getattr(session, "http_configured", False):
+        return session
+
+    adapter = CassetteAdapter(CASSETTE, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    })
+    if "python-requests" in session.headers.get("User-Agent", "python-requests"):
+        session.headers["User-Agent"] = wbi_config["USER_AGENT_DEFAULT"]
+
+    send = session.request
+
+    def request(method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = timeout
+        # liczniki zapytań (rodzaj, czas, bajty, funkcja zlecająca)
+        response = None
+        start = time.perf_counter()
+        try:
+            response = send(method, url, **kwargs)
+        finally:
+            STATS.api_call(method, url, kwargs, response, time.perf_counter() - start)
+
+        return response
+
+    session.request = request
+    session.http_configured = True
+
+    return session
+
+
+class SessionRequests:
+    """Moduł requests widziany przez wikibaseintegrator: zapytania bez sesji
+    logowania (wyszukiwanie, pobieranie encji, SPARQL) idą przez wspólną sesję,
+    pozostałe atrybuty (exceptions, Response) z modułu requests.
+    """
+
+    def __init__(self, session: requests.Session):
+        self._session = session
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+    def session(self) -> requests.Session:
+        """wspólna sesja zamiast nowej sesji dla każdego zapytania"""
+        return self._session
+
+    # pylint: disable=invalid-name
+    def Session(self) -> requests.Session:
+        """nowa sesja (logowanie wbi_login.Login - własne ciasteczka) z parametrami
+        wspólnej sesji
+        """
+        return configure_session(requests.Session())
+
+    def get(self, url, **kwargs) -> requests.Response:
+        """zapytanie GET przez wspólną sesję"""
+        return self._session.get(url, **kwargs)
+
+    def post(self, url, **kwargs) -> requests.Response:
+        """zapytanie POST przez wspólną sesję"""
+        return self._session.post(url, **kwargs)
+
+
+def install(session: requests.Session = None) -> requests.Session:
+    """zapytania wikibaseintegrator bez sesji logowania wykonywane przez
+    wspólną sesję (domyślnie HTTP_SESSION), sesja logowania z tymi samymi
+    parametrami (także logowanie nagrywane i odtwarzane z kasety)
+    """
+    session = configure_session(session if session is not None else HTTP_SESSION)
+    wbi_functions.requests = SessionRequests(session)
+    wbi_login.requests = SessionRequests(session)
+
+    return session
+
+
+# wspólna sesja HTTP dla skryptów (Wikibase, SPARQL, VIAF)
+HTTP_SESSION = configure_session(requests.Session())
@@ -0,0 +1,185 @@
+""" dziennik zdarzeń skryptów (jsonl) z poziomami ważności: komunikaty
+    wyświetlane przez skrypt, wyniki wierszy arkuszy, zapytania API
+"""
+
+import atexit
+import json
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# poziomy ważności zdarzeń
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+# poziom komunikatów (print) wg prefiksu, pozostałe komunikaty - info
+MESSAGE_LEVELS = {"ERROR": "error", "Error": "error", "SKIP": "debug"}
+
+# zapis bufora pliku na dysk co tyle zdarzeń (i zawsze po zdarzeniu error)
+FLUSH_EVERY = 1000
+
+
+def message_level(text: str) -> str:
+    """poziom komunikatu wg prefiksu (np. 'ERROR: ...', 'ERROR, ...', 'SKIP: ...')"""
+    prefix = re.split(r"[:, ]", text.lstrip(), 1)[0]
+
+    return MESSAGE_LEVELS.get(prefix, "info")
+
+
+class EventStream:
+    """Strumień zastępujący sys.stdout: każda wyświetlana linia trafia do
+    dziennika zdarzeń (EventLog.message), na ekran tylko linie o poziomie
+    nie niższym niż poziom konsoli. Linie są składane osobno w każdym wątku.
+    """
+
+    def __init__(self, log, stream):
+        self._log = log
+        self._stream = stream
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def write(self, text: str) -> int:
+        """dopisanie tekstu, pełne linie przekazywane do dziennika"""
+        buffer = getattr(self._local, "buffer", "") + text
+        lines = buffer.split("\n")
+        self._local.buffer = lines.pop()
+        for line in lines:
+            self._log.message(line)
+
+        return len(text)
+
+    def flush(self):
+        """zapis niepełnej linii bieżącego wątku"""
+        buffer = getattr(self._local, "buffer", "")
+        if buffer:
+            self._local.buffer = ""
+            self._log.message(buffer)
+        self._stream.flush()
+
+
+class EventLog:
+    """Dziennik zdarzeń w pliku jsonl (jedno zdarzenie w linii): czas, poziom
+    (debug, info, warning, error), rodzaj zdarzenia (message, row, api,
+    workbook), kontekst (plik, arkusz, wiersz - ustalany dla bieżącego wątku)
+    i pola zdarzenia. Po otwarciu dziennika komunikaty wyświetlane przez
+    skrypt (print) zapisywane są jako zdarzenia message z poziomem wg prefiksu
+    (ERROR, SKIP), na ekranie pozostają tylko komunikaty o poziomie nie
+    niższym niż poziom konsoli.
+    """
+
+    def __init__(self):
+        self.path = None
+        self.level = LEVELS["debug"]
+        self.console = LEVELS["debug"]
+        self.counts = {level: 0 for level in LEVELS}
+        self._file = None
+        self._stream = None
+        self._pending = 0
+        self._globals = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def open(self, path, level: str = "debug", console: str = "info"):
+        """otwiera dziennik (dopisywanie), level - najniższy poziom zdarzeń
+        zapisywanych w pliku, console - najniższy poziom komunikatów
+        wyświetlanych na ekranie
+        """
+        if level not in LEVELS or console not in LEVELS:
+            raise ValueError(f"nieznany poziom dziennika: {level}, {console}")
+
+        self.close()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.level = LEVELS[level]
+        self.console = LEVELS[console]
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._stream = sys.stdout
+        sys.stdout = EventStream(self, self._stream)
+        atexit.register(self.close)
+
+    def close(self):
+        """zapis bufora, przywrócenie sys.stdout i zamknięcie pliku"""
+        if self._stream is not None:
+            sys.stdout.flush()
+            sys.stdout = self._stream
+            self._stream = None
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def bind(self, **fields):
+        """kontekst wszystkich kolejnych zdarzeń (np. plik importu)"""
+        self._globals.update(fields)
+
+    @contextmanager
+    def context(self, **fields):
+        """kontekst zdarzeń bieżącego wątku (np. arkusz i wiersz)"""
+        previous = getattr(self._local, "context", {})
+        previous_messages = getattr(self._local, "messages", {})
+        self._local.context = {**previous, **fields}
+        self._local.messages = {}
+        try:
+            yield
+        finally:
+            self._local.context = previous
+            self._local.messages = previous_messages
+
+    def last_message(self) -> str:
+        """ostatni komunikat błędu (a gdy go brak - ostatni komunikat)
+        wyświetlony w bieżącym wątku w bieżącym kontekście, np. przyczyna
+        niepowodzenia wiersza arkusza
+        """
+        messages = getattr(self._local, "messages", {})
+
+        return messages.get("error") or messages.get("info")
+
+    def enabled(self, level: str) -> bool:
+        """czy zdarzenia o poziomie level są zapisywane"""
+        return self._file is not None and LEVELS[level] >= self.level
+
+    def event(self, level: str, event: str, **fields):
+        """zapis zdarzenia"""
+        with self._lock:
+            self.counts[level] += 1
+        if not self.enabled(level):
+            return
+
+        now = time.time()
+        record = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)) + f".{int(now * 1000) % 1000:03d}",
+            "level": level,
+            "event": event,
+            **self._globals,
+            **getattr(self._local, "context", {}),
+            **fields,
+        }
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._pending += 1
+            if level == "error" or self._pending >= FLUSH_EVERY:
+                self._file.flush()
+                self._pending = 0
+
+    def message(self, text: str):
+        """komunikat skryptu: zapis w dzienniku, na ekranie wg poziomu konsoli"""
+        level = message_level(text)
+        if self._stream is not None and LEVELS[level] >= self.console:
+            self._stream.write(text + "\n")
+        if text.strip():
+            messages = getattr(self._local, "messages", None)
+            if messages is not None:
+                messages["error" if level == "error" else "info"] = text.strip()
+            self.event(level, "message", message=text)
+
+
+# wspólny dziennik zdarzeń skryptów
+EVENT_LOG = EventLog()
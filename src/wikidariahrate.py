@@ -0,0 +1,204 @@
+""" wspólny ogranicznik tempa zapytań do Wikibase (AIMD) """
+
+import email.utils
+import threading
+import time
+import requests
+from wikibaseintegrator.wbi_config import config as wbi_config
+
+
+# tempo minimalne i maksymalne (zapytań na sekundę), tempo początkowe -
+# maksymalne, ograniczane dopiero przez sygnały przeciążenia serwera
+RATE_MIN = 0.1
+RATE_MAX = 50.0
+RATE_START = RATE_MAX
+
+# AIMD: przyrost tempa w czasie udanych zapytań (zapytań/s na sekundę, więc
+# niezależny od liczby zapytań) i mnożnik tempa oraz liczby równoczesnych
+# zapytań po sygnale przeciążenia serwera
+RATE_INCREASE = 5.0
+RATE_DECREASE = 0.5
+
+# maksymalna liczba równoczesnych zapytań
+CONCURRENCY_MAX = 8
+
+# liczba ponowień zapytania odrzuconego przez serwer (maxlag, limit zapytań)
+MAX_RETRIES = 10
+
+# przerwa (w sekundach) gdy serwer nie podał czasu oczekiwania
+RETRY_AFTER = 5
+
+
+def header_seconds(value: str, now: float = None) -> float:
+    """czas oczekiwania z nagłówka Retry-After / X-RateLimit-Reset: liczba
+    sekund, czas unix lub data HTTP, None jeżeli nie da się odczytać
+    """
+    if not value:
+        return None
+    now = now if now else time.time()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - now)
+        except (TypeError, ValueError):
+            return None
+
+    # duże wartości to czas unix (X-RateLimit-Reset)
+    if seconds > 1e9:
+        return max(0.0, seconds - now)
+
+    return max(0.0, seconds)
+
+
+class RateLimiter:
+    """Ogranicznik tempa zapytań do API Wikibase wspólny dla wszystkich wątków.
+    Tempo (zapytań/s) i liczba równoczesnych zapytań są regulowane metodą AIMD:
+    udane zapytania zwiększają tempo o stałą wartość na sekundę, sygnał przeciążenia
+    serwera (maxlag, limit zapytań, HTTP 429/503, X-RateLimit-Remaining: 0)
+    zmniejsza je o połowę i wstrzymuje zapytania na czas wskazany przez serwer
+    (Retry-After, lag). Zapytania odrzucone są ponawiane.
+    """
+
+    def __init__(self):
+        self.rate = RATE_START
+        self.concurrency = float(CONCURRENCY_MAX)
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.max_rate = RATE_START
+        self._inflight = 0
+        self._next = 0.0
+        self._increased = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """oczekiwanie na wolne miejsce i termin kolejnego zapytania"""
+        with self._cond:
+            while self._inflight >= max(1, int(self.concurrency)):
+                self._cond.wait()
+            self._inflight += 1
+            now = time.monotonic()
+            start = max(now, self._next, self._paused_until)
+            self._next = start + 1.0 / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+    def release(self, ok: bool):
+        """koniec zapytania, udane zapytanie zwiększa tempo proporcjonalnie
+        do czasu od poprzedniej zmiany tempa
+        """
+        with self._cond:
+            self._inflight -= 1
+            self.requests += 1
+            now = time.monotonic()
+            if ok:
+                self.rate = min(RATE_MAX, self.rate + RATE_INCREASE * (now - self._increased))
+                self.concurrency = min(CONCURRENCY_MAX, self.concurrency + 1.0 / self.concurrency)
+                self.max_rate = max(self.max_rate, self.rate)
+            self._increased = now
+            self._cond.notify()
+
+    def congestion(self, delay: float):
+        """sygnał przeciążenia: zmniejszenie tempa i przerwa w zapytaniach"""
+        with self._cond:
+            self.throttled += 1
+            self.rate = max(RATE_MIN, self.rate * RATE_DECREASE)
+            self.concurrency = max(1.0, self.concurrency * RATE_DECREASE)
+            self._increased = time.monotonic()
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def check(self, response: requests.Response) -> tuple:
+        """sygnały serwera w odpowiedzi, zwraca (czy ponowić, przerwa w sekundach)"""
+        headers = response.headers
+        retry_after = header_seconds(headers.get("Retry-After"))
+        if response.status_code in (429, 503):
+            return True, retry_after if retry_after is not None else RETRY_AFTER
+
+        if "json" in headers.get("Content-Type", ""):
+            try:
+                error = response.json().get("error", {})
+            except ValueError:
+                error = {}
+            if isinstance(error, dict):
+                messages = {x.get("name") for x in error.get("messages", [])}
+                if error.get("code") == "maxlag":
+                    lag = error.get("lag")
+                    return True, retry_after if retry_after is not None else float(lag or RETRY_AFTER)
+                if error.get("code") == "ratelimited" or "actionthrottledtext" in messages:
+                    return True, retry_after if retry_after is not None else RETRY_AFTER
+
+        # limit wyczerpany - bieżące zapytanie wykonane, kolejne po resecie
+        if headers.get("X-RateLimit-Remaining") == "0":
+            reset = header_seconds(headers.get("X-RateLimit-Reset"))
+            return False, reset if reset is not None else RETRY_AFTER
+
+        return False, None
+
+    def request(self, send, method: str, url: str, **kwargs) -> requests.Response:
+        """zapytanie wykonywane funkcją send (np. requests.Session.request)
+        w tempie ogranicznika, z parametrem maxlag dla API Wikibase
+        """
+        if wbi_config["MAXLAG"] > 0 and url == wbi_config["MEDIAWIKI_API_URL"]:
+            for key in ("data", "params"):
+                if isinstance(kwargs.get(key), dict):
+                    kwargs[key].setdefault("maxlag", wbi_config["MAXLAG"])
+                    break
+
+        response = None
+        for attempt in range(MAX_RETRIES + 1):
+            self.acquire()
+            try:
+                response = send(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                # brak połączenia lub odpowiedzi - sygnał przeciążenia, ponowienie
+                self.release(False)
+                self.congestion(RETRY_AFTER)
+                if attempt == MAX_RETRIES:
+                    raise
+                continue
+            except BaseException:
+                # inne wyjątki (np. ChunkedEncodingError, brak w kasecie) -
+                # zwolnienie miejsca, bez ponowienia
+                self.release(False)
+                raise
+
+            retry, delay = self.check(response)
+            self.release(delay is None)
+            if delay is not None:
+                self.congestion(delay)
+            if not retry:
+                break
+            self.retries += 1
+            print(f"RATE: serwer ogranicza zapytania, przerwa {delay:.1f} s, tempo: {self.rate:.2f}/s")
+
+        return response
+
+    def install(self, session: requests.Session) -> requests.Session:
+        """zapytania sesji (np. sesji logowania wbi_login.Login) wykonywane
+        w tempie ogranicznika
+        """
+        if getattr(session, "rate_limiter", None) is self:
+            return session
+        send = session.request
+        session.request = lambda method, url, **kwargs: self.request(send, method, url, **kwargs)
+        session.rate_limiter = self
+
+        return session
+
+    def stats(self) -> dict:
+        """bieżące tempo i liczniki zapytań"""
+        with self._cond:
+            return {
+                "rate": round(self.rate, 2),
+                "max_rate": round(self.max_rate, 2),
+                "concurrency": int(self.concurrency),
+                "requests": self.requests,
+                "retries": self.retries,
+                "throttled": self.throttled,
+            }
+
+
+# wspólny ogranicznik tempa dla skryptów
+RATE_LIMITER = RateLimiter()
@@ -0,0 +1,253 @@
+""" pomiary czasu (etapy, wiersze arkuszy) i liczniki zapytań API skryptów """
+
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from wikibaseintegrator.wbi_config import config as wbi_config
+from wikidariahcache import ENTITY_CACHE, LABEL_CACHE, LABEL_INDEX, PURL_INDEX
+from wikidariahlog import EVENT_LOG
+
+
+# akcje API zapisujące encje (wbsetqualifier i wbsetreference liczone osobno)
+WRITE_ACTIONS = {
+    "wbeditentity", "wbcreateclaim", "wbsetclaim", "wbsetclaimvalue",
+    "wbremoveclaims", "wbsetlabel", "wbsetdescription", "wbsetaliases",
+    "wbremovequalifiers", "wbremovereferences",
+}
+
+# liczba najwolniejszych wierszy i funkcji zlecających najwięcej zapytań w raporcie
+TOP_ROWS = 10
+TOP_CALLERS = 15
+
+# moduły warstwy HTTP pomijane przy ustalaniu funkcji, która zleciła zapytanie
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+HTTP_MODULES = {"wikidariahstats", "wikidariahhttp", "wikidariahrate", "wikidariahasync"}
+
+
+def call_kind(url: str, params: dict) -> str:
+    """rodzaj zapytania: search, wbgetentities, sparql, token, write,
+    wbsetqualifier, wbsetreference, inne akcje API lub http (np. VIAF)
+    """
+    url = url.split("?")[0]
+    if url == wbi_config["SPARQL_ENDPOINT_URL"]:
+        return "sparql"
+    if url != wbi_config["MEDIAWIKI_API_URL"]:
+        return "http"
+
+    action = params.get("action", "")
+    if action == "query" and "tokens" in str(params.get("meta", "")):
+        return "token"
+    if action == "wbsearchentities":
+        return "search"
+    if action in WRITE_ACTIONS:
+        return "write"
+
+    return action or "api"
+
+
+def call_params(kwargs: dict) -> dict:
+    """parametry zapytania (data dla POST, params dla GET)"""
+    for key in ("data", "params"):
+        if isinstance(kwargs.get(key), dict):
+            return kwargs[key]
+
+    return {}
+
+
+def request_size(kwargs: dict) -> int:
+    """przybliżona liczba bajtów wysyłanych w zapytaniu"""
+    data = kwargs.get("data")
+    if isinstance(data, dict):
+        return sum(len(str(key)) + len(str(value)) + 2 for key, value in data.items())
+    if isinstance(data, (str, bytes)):
+        return len(data)
+
+    return 0
+
+
+def caller_name() -> str:
+    """funkcja skryptu (moduł.funkcja), która zleciła zapytanie"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        module = os.path.splitext(os.path.basename(path))[0]
+        if os.path.dirname(os.path.abspath(path)) == SRC_DIR and module not in HTTP_MODULES:
+            return f"{module}.{getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)}"
+        frame = frame.f_back
+
+    return "?"
+
+
+def hit_ratio(cache) -> dict:
+    """trafienia i chybienia pamięci podręcznej"""
+    total = cache.hits + cache.misses
+    return {
+        "hits": cache.hits,
+        "misses": cache.misses,
+        "ratio": round(cache.hits / total, 3) if total else None,
+    }
+
+
+class RunStats:
+    """Pomiary pracy skryptu: czas etapów (łącznie i dla bieżącego pliku),
+    czas i liczba zapytań API każdego wiersza arkusza, liczniki zapytań wg
+    rodzaju (search, wbgetentities, sparql, token, write, wbsetqualifier,
+    wbsetreference) i funkcji, która je zleciła, liczba przesłanych bajtów
+    oraz skuteczność pamięci podręcznych.
+    """
+
+    def __init__(self):
+        self.phases = Counter()
+        self.calls = Counter()
+        self.call_time = Counter()
+        self.callers = defaultdict(Counter)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.rows = Counter()
+        self.row_time = Counter()
+        self.row_calls = Counter()
+        self.slow_rows = []
+        self.file = None
+        self.files = defaultdict(lambda: {"phases": Counter(), "calls": Counter()})
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def begin_file(self, name: str):
+        """kolejne etapy i zapytania dotyczą pliku name"""
+        self.file = str(name)
+
+    def file_stats(self, name: str) -> dict:
+        """czas etapów i liczba zapytań wg rodzaju dla pliku"""
+        with self._lock:
+            stats = self.files[str(name)]
+            return {
+                "phases": {key: round(value, 3) for key, value in stats["phases"].items()},
+                "calls": dict(stats["calls"]),
+            }
+
+    @contextmanager
+    def phase(self, name: str):
+        """pomiar czasu etapu pracy skryptu"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phases[name] += elapsed
+                if self.file is not None:
+                    self.files[self.file]["phases"][name] += elapsed
+
+    @contextmanager
+    def row(self, sheet: str, name: str):
+        """pomiar czasu i liczby zapytań API wiersza arkusza (w bieżącym wątku),
+        zwraca liczniki zapytań wiersza wg rodzaju
+        """
+        calls = Counter()
+        self._local.calls = calls
+        start = time.perf_counter()
+        try:
+            yield calls
+        finally:
+            elapsed = time.perf_counter() - start
+            self._local.calls = None
+            with self._lock:
+                self.rows[sheet] += 1
+                self.row_time[sheet] += elapsed
+                self.row_calls[sheet] += sum(calls.values())
+                self.slow_rows.append((elapsed, sheet, name, dict(calls)))
+                if len(self.slow_rows) > TOP_ROWS * 10:
+                    self.slow_rows = sorted(self.slow_rows, key=lambda x: -x[0])[:TOP_ROWS]
+
+    def api_call(self, method: str, url: str, kwargs: dict, response, elapsed: float):
+        """zapytanie HTTP wykonane przez wspólną warstwę HTTP (wikidariahhttp)"""
+        params = call_params(kwargs)
+        kind = call_kind(url, params)
+        caller = caller_name()
+        received = len(response.content) if response is not None else 0
+        sent = request_size(kwargs)
+        status = response.status_code if response is not None else None
+        level = "debug" if status is not None and status < 400 else "warning"
+        if EVENT_LOG.enabled(level):
+            EVENT_LOG.event(level, "api", action=params.get("action") or kind, kind=kind,
+                            status=status, elapsed=round(elapsed, 4), caller=caller,
+                            sent=sent, received=received)
+        row_calls = getattr(self._local, "calls", None)
+        if row_calls is not None:
+            row_calls[kind] += 1
+        with self._lock:
+            self.calls[kind] += 1
+            self.call_time[kind] += elapsed
+            self.callers[caller][kind] += 1
+            self.bytes_sent += sent
+            self.bytes_received += received
+            if self.file is not None:
+                self.files[self.file]["calls"][kind] += 1
+
+    def report(self) -> dict:
+        """pomiary jako słownik (raport json)"""
+        with self._lock:
+            rows = sum(self.rows.values())
+            calls = sum(self.calls.values())
+            callers = sorted(self.callers.items(), key=lambda x: -sum(x[1].values()))
+            return {
+                "phases": {key: round(value, 3) for key, value in self.phases.items()},
+                "calls": dict(self.calls),
+                "call_time": {key: round(value, 3) for key, value in self.call_time.items()},
+                "calls_per_row": round(calls / rows, 2) if rows else None,
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+                "rows": {
+                    sheet: {
+                        "rows": count,
+                        "time": round(self.row_time[sheet], 3),
+                        "avg_time": round(self.row_time[sheet] / count, 4),
+                        "calls_per_row": round(self.row_calls[sheet] / count, 2),
+                    }
+                    for sheet, count in self.rows.items()
+                },
+                "slow_rows": [
+                    {"time": round(elapsed, 3), "sheet": sheet, "name": name, "calls": row_calls}
+                    for elapsed, sheet, name, row_calls in sorted(self.slow_rows, key=lambda x: -x[0])[:TOP_ROWS]
+                ],
+                "callers": {caller: dict(kinds) for caller, kinds in callers[:TOP_CALLERS]},
+                "caches": {
+                    "entity_cache": hit_ratio(ENTITY_CACHE),
+                    "label_cache": hit_ratio(LABEL_CACHE),
+                    "label_index": hit_ratio(LABEL_INDEX),
+                    "purl_index": hit_ratio(PURL_INDEX),
+                },
+            }
+
+    def summary(self) -> dict:
+        """wyświetla podsumowanie pomiarów, zwraca raport (report)"""
+        report = self.report()
+        phases = ", ".join(f"{key}: {value:.2f} s" for key, value in report["phases"].items())
+        print(f"STATS: etapy: {phases}")
+        for sheet, row in report["rows"].items():
+            print(
+                f"STATS: {sheet}: wiersze: {row['rows']}, czas: {row['time']:.2f} s, "
+                f"średnio: {row['avg_time'] * 1000:.1f} ms, zapytania/wiersz: {row['calls_per_row']}"
+            )
+        calls = ", ".join(f"{key}: {value}" for key, value in sorted(report["calls"].items()))
+        print(
+            f"STATS: zapytania: {sum(report['calls'].values())} ({calls}), "
+            f"na wiersz: {report['calls_per_row']}, wysłane: {report['bytes_sent']} B, "
+            f"odebrane: {report['bytes_received']} B"
+        )
+        for caller, kinds in list(report["callers"].items())[:5]:
+            print(f"STATS: {caller}: {dict(kinds)}")
+        caches = ", ".join(
+            f"{key}: {value['ratio'] if value['ratio'] is not None else '-'}"
+            for key, value in report["caches"].items()
+        )
+        print(f"STATS: trafienia pamięci podręcznych: {caches}")
+
+        return report
+
+
+# wspólne pomiary dla skryptów
+STATS = RunStats()
@@ -1,10 +1,11 @@
 """ funkcje pomocniczne do obsługi skryptów wikibase """
 
 import re
-from wikibaseintegrator import wbi_core
 from wikibaseintegrator.wbi_exceptions import (MWApiError)
 from wikibaseintegrator.wbi_functions import search_entities
 from wikibaseintegrator.wbi_functions import execute_sparql_query
+from wikibaseintegrator.wbi_functions import mediawiki_api_call_helper
+from wikidariahcache import ENTITY_CACHE, LABEL_CACHE, is_new_id
 
 
 def element_exists(element_id: str) -> bool:
@@ -16,7 +17,7 @@ def element_exists(element_id: str) -> bool:
     zwraca: True/False
     """
     try:
-        my_first_wikidata_item = wbi_core.ItemEngine(item_id=element_id)
+        my_first_wikidata_item = ENTITY_CACHE.get_item(element_id)
         data = my_first_wikidata_item.get_json_representation()
     except (MWApiError, KeyError):
         data = None
@@ -34,33 +35,67 @@ def element_search(search_string: str, element_type: str, lang: str, **kwargs) -
         element_search('Maria Bielińska', 'item', 'en', description='historyk')
         jeżeli podano argument strict=True to zwróci NOT FOUND także gdy znaleziona
         zostanie częściowo dopasowana właściwość lub element
+        argument results - lista identyfikatorów znalezionych wcześniej
+        (search_ids), np. w wyszukiwaniu zbiorczym (wikidariahasync)
 
     Zwraca tuple np.: (True, 'P133') lub (False, 'NOT FOUND')
     """
-    description = ''
-    aliases = strict = purl_id = False
-    if kwargs:
-        if 'description' in kwargs:
-            description = kwargs['description']
-        if 'aliases' in kwargs:
-            aliases = kwargs['aliases']
-        if 'strict' in kwargs:
-            strict = kwargs['strict']
-        if 'purl_id' in kwargs:
-            purl_id = kwargs['purl_id']
+    # wynik wyszukiwania może być już zapamiętany w pamięci podręcznej
+    cache_key = search_key(search_string, element_type, lang, **kwargs)
+    cached = LABEL_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    search_string, element_type, lang, description, strict, aliases = cache_key
+    results = kwargs.get('results')
+    if results is None:
+        results = search_ids(search_string, element_type, lang, aliases)
+    result = _element_search(results, search_string, lang, description,
+                             aliases, strict)
+    LABEL_CACHE.set(cache_key, result)
+
+    return result
+
+
+def search_key(search_string: str, element_type: str, lang: str, **kwargs) -> tuple:
+    """ klucz wyszukiwania element_search (pamięci podręcznej LABEL_CACHE):
+        (search_string, element_type, lang, description, strict, aliases)
+    """
+    description = kwargs.get('description', '')
+    aliases = kwargs.get('aliases', False)
+    strict = kwargs.get('strict', False)
 
     # jeżeli search_string jest zbyt długi to tylko 243 pierwsze znaki
     if len(search_string) > 240:
         search_string = search_string[:241]
 
+    return search_string, element_type, lang, description, strict, aliases
+
+
+def search_ids(search_string: str, element_type: str, lang: str, aliases: bool = False) -> list:
+    """ identyfikatory encji znalezione dla tekstu (wbsearchentities lub
+        ENTITY_CACHE w trybie offline)
+    """
+    if ENTITY_CACHE.offline:
+        return ENTITY_CACHE.search(search_string, element_type, lang, aliases)
+
     results = search_entities(search_string, language=lang,
                               search_type=element_type, max_results=50)
+    # encje utworzone w imporcie bez zapisu istnieją tylko w ENTITY_CACHE
+    results += [x for x in ENTITY_CACHE.search(search_string, element_type, lang, aliases)
+                if is_new_id(x)]
+
+    return results
 
+
+def _element_search(results: list, search_string: str, lang: str,
+                    description: str, aliases: bool, strict: bool) -> tuple:
+    """ wybór kodu item lub property spośród wyników wyszukiwania """
     if len(results) == 0:
         return False, "NOT FOUND"
 
     if len(results) == 1:
-        wikidata_item = wbi_core.ItemEngine(item_id=results[0])
+        wikidata_item = ENTITY_CACHE.get_item(results[0])
         data = wikidata_item.get_json_representation()
         if lang in data['labels']:
             value = data["labels"][lang]["value"]
@@ -98,9 +133,12 @@ def element_search(search_string: str, element_type: str, lang: str, **kwargs) -
         #return False, f"AMBIGIOUS ID FOUND {results}"
         return True, results[0]
 
+    # wszystkie znalezione encje pobierane zbiorczo (wbgetentities po 50)
+    ENTITY_CACHE.load_many(results)
+
     exact_id = ''
     for qid in results:
-        wikidata_item = wbi_core.ItemEngine(item_id=qid)
+        wikidata_item = ENTITY_CACHE.get_item(qid)
         data = wikidata_item.get_json_representation()
         if lang in data['labels']:
             value = data["labels"][lang]["value"]
@@ -277,7 +315,7 @@ def get_claim_id(qid: str, claim_property: str, claim_value: str) -> list:
     claim_id = []
 
     try:
-        wikibase_item = wbi_core.ItemEngine(item_id=qid)
+        wikibase_item = ENTITY_CACHE.get_item(qid)
         property_list = wikibase_item.get_property_list()
         if claim_property not in property_list:
             return None
@@ -309,3 +347,43 @@ def search_by_purl(purl_prop_id:str, purl_value: str) -> tuple:
         return True, search_result
 
     return False, f'ERROR: brak wyniku lub niejednoznaczny wynik wyszukiwania elementu z identyfikatorem Purl (znaleziono: {len(output)}).'
+
+
+def get_token(my_login, refresh: bool = False) -> str:
+    """ zwraca token CSRF sesji, token jest pobierany raz (podczas logowania)
+        i zapamiętywany w obiekcie login, ponownie jest pobierany tylko gdy
+        refresh=True (po błędzie 'badtoken' zwróconym przez API)
+    """
+    if refresh or not my_login.edit_token:
+        my_login.generate_edit_credentials()
+
+    return my_login.edit_token
+
+
+def is_badtoken(api_error: MWApiError) -> bool:
+    """ czy błąd API oznacza nieważny token CSRF """
+    error = api_error.error_msg.get('error', {}) if isinstance(api_error.error_msg, dict) else {}
+
+    return error.get('code') == 'badtoken'
+
+
+def write_api_call(params: dict, my_login) -> dict:
+    """ wywołanie API modyfikującego dane (np. wbsetqualifier, wbsetreference)
+        z tokenem CSRF sesji, w przypadku błędu 'badtoken' token jest
+        odświeżany a zapytanie powtórzone
+    """
+    params['token'] = get_token(my_login)
+    try:
+        return mediawiki_api_call_helper(data=params, login=my_login,
+                                         mediawiki_api_url=None, user_agent=None,
+                                         allow_anonymous=False)
+    except MWApiError as api_error:
+        if not is_badtoken(api_error):
+            raise
+
+    params['token'] = get_token(my_login, refresh=True)
+
+    return mediawiki_api_call_helper(data=params, login=my_login,
+                                     mediawiki_api_url=None, user_agent=None,
+                                     allow_anonymous=False)
+
@@ -0,0 +1,8 @@
+""" wspólne ustawienia testów: skrypty importu z katalogu src """
+
+import sys
+from pathlib import Path
+
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
@@ -0,0 +1,145 @@
+""" testy kasety zapytań HTTP (wikidariahcassette): klucze dopasowania
+    dokładnego i znormalizowanego, nagrywanie i odtwarzanie
+"""
+
+import json
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+from wikidariahcassette import (
+    Cassette, CassetteMiss, exact_key, normalized_key, request_text,
+)
+
+
+API = "http://localhost:8080/api.php"
+SPARQL = "http://localhost:8080/bigdata/sparql"
+
+
+def post(data: dict, url: str = API) -> requests.PreparedRequest:
+    """zapytanie POST z formularzem"""
+    return requests.Request("POST", url, data=data).prepare()
+
+
+def get(params: dict, url: str = API) -> requests.PreparedRequest:
+    """zapytanie GET z parametrami w adresie"""
+    return requests.Request("GET", url, params=params).prepare()
+
+
+def response(body: dict, status: int = 200) -> requests.Response:
+    """odpowiedź json"""
+    result = requests.Response()
+    result.status_code = status
+    result.reason = "OK"
+    result.headers = CaseInsensitiveDict({"Content-Type": "application/json; charset=utf-8"})
+    result._content = json.dumps(body).encode("utf-8")
+    return result
+
+
+def edit(token: str, data: str = '{"labels": {"en": {"language": "en", "value": "A"}}}') -> requests.PreparedRequest:
+    """zapis encji z tokenem"""
+    return post({"action": "wbeditentity", "id": "Q1", "data": data, "token": token, "format": "json"})
+
+
+def test_exact_key():
+    assert exact_key(edit("a+\\")) == exact_key(edit("a+\\"))
+    assert exact_key(edit("a+\\")) != exact_key(edit("b+\\"))
+    assert exact_key(get({"action": "wbgetentities", "ids": "Q1"})) != exact_key(
+        get({"action": "wbgetentities", "ids": "Q2"})
+    )
+
+
+def test_normalized_key_ignores_volatile_params():
+    assert normalized_key(edit("a+\\")) == normalized_key(edit("b+\\"))
+    assert normalized_key(get({"action": "query", "maxlag": "5", "format": "json"})) == normalized_key(
+        get({"format": "json", "action": "query"})
+    )
+
+
+def test_normalized_key_canonical_values():
+    # json z inną kolejnością kluczy i odstępami
+    assert normalized_key(edit("a", '{"labels": {"en": {"language": "en", "value": "A"}}}')) == normalized_key(
+        edit("a", '{"labels":{"en":{"value":"A","language":"en"}}}')
+    )
+    # zapytanie SPARQL z innymi odstępami
+    assert normalized_key(get({"query": "SELECT ?x\n  WHERE { ?x ?p ?o }"}, SPARQL)) == normalized_key(
+        get({"query": "SELECT ?x WHERE { ?x ?p ?o }"}, SPARQL)
+    )
+
+
+def test_normalized_key_keeps_values_and_address():
+    assert normalized_key(edit("a", '{"labels": {}}')) != normalized_key(edit("a", '{"aliases": {}}'))
+    assert normalized_key(get({"ids": "Q1"})) != normalized_key(get({"ids": "Q1"}, SPARQL))
+    assert normalized_key(get({"ids": "Q1"})) != normalized_key(post({"ids": "Q1"}))
+
+
+def test_request_text_hides_secrets():
+    text = request_text(post({"action": "login", "lgname": "bot", "lgpassword": "secret", "lgtoken": "t"}))
+
+    assert "secret" not in text
+    assert '"lgpassword", "***"' in text
+    assert '"lgname", "bot"' in text
+
+
+@pytest.fixture
+def cassette_path(tmp_path):
+    """kaseta z dwiema odpowiedziami na zapis encji i odpowiedzią na odczyt"""
+    path = tmp_path / "cassette.sqlite"
+    cassette = Cassette()
+    cassette.open(path, mode="record")
+    cassette.record(edit("token-1"), response({"entity": {"id": "Q1", "lastrevid": 1}}), 0.1)
+    cassette.record(edit("token-1"), response({"entity": {"id": "Q1", "lastrevid": 2}}), 0.1)
+    cassette.record(get({"action": "wbgetentities", "ids": "Q1"}), response({"entities": {}}), 0.1)
+    cassette.close()
+    assert cassette.recorded == 3
+
+    return path
+
+
+def test_replay_exact(cassette_path):
+    cassette = Cassette()
+    cassette.open(cassette_path, mode="replay", match="exact")
+
+    assert cassette.replay(get({"action": "wbgetentities", "ids": "Q1"})).json() == {"entities": {}}
+    assert cassette.replay(edit("token-1")).json()["entity"]["lastrevid"] == 1
+    with pytest.raises(CassetteMiss):
+        cassette.replay(edit("token-2"))
+    cassette.close()
+    assert cassette.misses == 1
+
+
+def test_replay_normalized(cassette_path):
+    cassette = Cassette()
+    cassette.open(cassette_path, mode="replay")
+
+    # inny token - dopasowanie znormalizowane, kolejne nagrane odpowiedzi,
+    # ostatnia powtarzana
+    revisions = [cassette.replay(edit(f"token-{i}")).json()["entity"]["lastrevid"] for i in (2, 3, 4)]
+    assert revisions == [1, 2, 2]
+    with pytest.raises(CassetteMiss):
+        cassette.replay(get({"action": "wbgetentities", "ids": "Q2"}))
+    cassette.close()
+    assert (cassette.replayed, cassette.misses) == (3, 1)
+
+
+def test_replayed_response(cassette_path):
+    cassette = Cassette()
+    cassette.open(cassette_path, mode="replay")
+    request = get({"action": "wbgetentities", "ids": "Q1"})
+
+    result = cassette.replay(request)
+    cassette.close()
+
+    assert result.status_code == 200
+    assert result.headers["content-type"].startswith("application/json")
+    assert result.encoding == "utf-8"
+    assert result.url == request.url
+
+
+def test_open_errors(tmp_path):
+    cassette = Cassette()
+    with pytest.raises(FileNotFoundError):
+        cassette.open(tmp_path / "missing.sqlite", mode="replay")
+    with pytest.raises(ValueError):
+        cassette.open(tmp_path / "cassette.sqlite", mode="append")
+    with pytest.raises(ValueError):
+        cassette.open(tmp_path / "cassette.sqlite", mode="record", match="fuzzy")
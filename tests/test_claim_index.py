@@ -0,0 +1,113 @@
+""" testy wartości kanonicznych (snak_key, value_key) i indeksu deklaracji
+    encji (ClaimIndex)
+"""
+
+import pytest
+
+pytest.importorskip("wikibaseintegrator")
+
+from wikidariahcache import ClaimIndex, snak_key, value_key  # noqa: E402
+
+
+def snak(prop_nr: str, value, value_type: str) -> dict:
+    """snak z wartością"""
+    return {
+        "snaktype": "value",
+        "property": prop_nr,
+        "datavalue": {"value": value, "type": value_type},
+    }
+
+
+ENTITY = {
+    "id": "Q1",
+    "claims": {
+        "P1": [
+            {
+                "id": "Q1$1",
+                "mainsnak": snak("P1", {"entity-type": "item", "numeric-id": 5, "id": "Q5"}, "wikibase-entityid"),
+                "qualifiers": {
+                    "P2": [snak("P2", {"time": "+1539-12-08T00:00:00Z", "precision": 11}, "time")],
+                },
+                "references": [
+                    {"snaks": {"P3": [snak("P3", "https://example.org", "string")]}},
+                ],
+            },
+            {
+                "id": "Q1$2",
+                "mainsnak": snak("P1", {"entity-type": "item", "numeric-id": 6}, "wikibase-entityid"),
+            },
+        ],
+        "P4": [
+            {"id": "Q1$3", "mainsnak": snak("P4", {"language": "pl", "text": "tekst"}, "monolingualtext")},
+        ],
+        "P5": [
+            {"id": "Q1$4", "mainsnak": snak("P5", "usunięta", "string"), "remove": ""},
+        ],
+    },
+}
+
+
+@pytest.mark.parametrize("value, value_type, expected", [
+    ({"entity-type": "item", "numeric-id": 5, "id": "Q5"}, "wikibase-entityid", "Q5"),
+    ({"entity-type": "property", "numeric-id": 7}, "wikibase-entityid", "P7"),
+    ({"language": "pl", "text": "tekst"}, "monolingualtext", 'pl:"tekst"'),
+    ({"time": "+1539-12-08T00:00:00Z", "precision": 11}, "time", "+1539-12-08T00:00:00Z/11"),
+    ({"amount": "+12", "unit": "1"}, "quantity", "12"),
+    ({"amount": "-1.5", "unit": "1"}, "quantity", "-1.5"),
+    ({"latitude": 51.2, "longitude": 20.1}, "globecoordinate", "51.2,20.1"),
+    ("https://example.org", "string", "https://example.org"),
+])
+def test_snak_key(value, value_type, expected):
+    assert snak_key(snak("P1", value, value_type)) == expected
+
+
+def test_snak_key_somevalue_novalue():
+    assert snak_key({"snaktype": "somevalue", "property": "P1"}) == "somevalue"
+    assert snak_key({"snaktype": "novalue", "property": "P1"}) == "novalue"
+
+
+@pytest.mark.parametrize("value, expected", [
+    ('pl:"tekst"', 'pl:"tekst"'),
+    ('pl: "tekst"', 'pl:"tekst"'),
+    ("pl:”tekst”", 'pl:"tekst"'),
+    ('de-at:"Wien"', 'de-at:"Wien"'),
+    (12, "12"),
+    ("Q5", "Q5"),
+])
+def test_value_key(value, expected):
+    assert value_key(value) == expected
+
+
+def test_value_key_matches_snak_key():
+    monolingual = snak("P4", {"language": "pl", "text": "tekst"}, "monolingualtext")
+    assert value_key('pl: ”tekst”') == snak_key(monolingual)
+
+
+def test_claim_index_has():
+    index = ClaimIndex(ENTITY)
+
+    assert index.has("P1")
+    assert index.has("P1", "Q5")
+    assert index.has("P1", "Q6")
+    assert index.has("P4", 'pl: "tekst"')
+    assert not index.has("P1", "Q7")
+    assert not index.has("P9")
+    # deklaracje oznaczone do usunięcia są pomijane
+    assert not index.has("P5")
+
+
+def test_claim_index_claim_id():
+    index = ClaimIndex(ENTITY)
+
+    assert index.claim_id("P1", "Q6") == "Q1$2"
+    assert index.claim_id("P1", "Q7") == ""
+
+
+def test_claim_index_qualifiers_and_references():
+    index = ClaimIndex(ENTITY)
+
+    assert index.qualifiers("P1", "Q5") == {("P2", "+1539-12-08T00:00:00Z/11")}
+    assert index.qualifiers("P1", "Q6") == set()
+    assert index.has_reference("P1", "Q5", "P3", "https://example.org")
+    assert not index.has_reference("P1", "Q5", "P3", "https://example.com")
+    assert not index.has_reference("P1", "Q6", "P3", "https://example.org")
@@ -0,0 +1,119 @@
+""" testy odcisków wierszy (WDHJournal.fingerprint, open_fingerprints,
+    rows): pomijanie wierszy niezmienionych i ponowne przetwarzanie wierszy,
+    których encje zmieniły się po imporcie
+"""
+
+import json
+import pytest
+
+pytest.importorskip("wikibaseintegrator")
+
+import property_import  # noqa: E402
+from property_import import WDHItem, WDHJournal, WDHTask  # noqa: E402
+from wikidariahcache import ENTITY_CACHE, set_offline  # noqa: E402
+
+
+# encja spoza zakresu identyfikatorów innych testów
+ENTITY_ID = "Q777001"
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    """pliki dziennika i odcisków, rewizje encji tylko z pamięci (offline)"""
+    monkeypatch.chdir(tmp_path)
+    set_offline(True)
+    property_import.GLOBAL_ITEM.clear()
+    store_revision(5)
+    yield tmp_path / "journal.jsonl", tmp_path / "fingerprints.json"
+    property_import.GLOBAL_ITEM.clear()
+    set_offline(False)
+
+
+def store_revision(revision: int):
+    """encja wiersza w magazynie encji w podanej rewizji"""
+    ENTITY_CACHE.store({
+        "id": ENTITY_ID,
+        "type": "item",
+        "lastrevid": revision,
+        "labels": {"en": {"language": "en", "value": "A"}},
+    })
+
+
+def create_a():
+    """wiersz tworzący (zmieniający) element A"""
+    property_import.GLOBAL_ITEM["A/"] = ENTITY_ID
+    return True
+
+
+def run_import(paths, label: str = "A", write: bool = True) -> tuple:
+    """import jednego wiersza Q_list, zwraca dziennik i czy wiersz wykonano"""
+    journal_path, fingerprint_path = paths
+    journal = WDHJournal()
+    journal.open(journal_path, write=write, fingerprint_path=fingerprint_path)
+    row = WDHItem(label, "desc")
+    remaining = journal.rows("Q_list", [row])
+    for item in remaining:
+        journal.run(WDHTask(f"ITEM: {label}", create_a, f"item|{label}", row=item))
+    journal.close()
+
+    return journal, bool(remaining)
+
+
+def test_fingerprint():
+    fingerprint = WDHJournal.fingerprint("key", {"Q1": 5, "P2": 7})
+
+    assert fingerprint == WDHJournal.fingerprint("key", {"P2": 7, "Q1": 5})
+    assert fingerprint != WDHJournal.fingerprint("key", {"Q1": 6, "P2": 7})
+    assert fingerprint != WDHJournal.fingerprint("other", {"Q1": 5, "P2": 7})
+
+
+def test_fingerprint_saved_after_import(paths):
+    run_import(paths)
+
+    with open(paths[1], "r", encoding="utf-8") as f:
+        rows = json.load(f)["rows"]
+    (record,) = rows.values()
+    assert record["entities"] == [ENTITY_ID]
+    assert record["entity"] == ENTITY_ID
+    assert record["global"] == ["item", "A/"]
+
+
+def test_unchanged_row_is_skipped(paths):
+    run_import(paths)
+    property_import.GLOBAL_ITEM.clear()
+
+    journal, executed = run_import(paths)
+
+    assert not executed
+    assert journal.unchanged == 1
+    # identyfikator elementu pominiętego wiersza odtworzony z odcisku
+    assert property_import.GLOBAL_ITEM == {"A/": ENTITY_ID}
+
+
+def test_row_is_processed_after_entity_revision_change(paths):
+    run_import(paths)
+    store_revision(6)
+
+    journal, executed = run_import(paths)
+
+    assert executed
+    assert journal.unchanged == 0
+    # nowy odcisk z bieżącą rewizją - kolejny import pomija wiersz
+    journal, executed = run_import(paths)
+    assert not executed
+    assert journal.unchanged == 1
+
+
+def test_changed_row_is_processed(paths):
+    run_import(paths)
+
+    journal, executed = run_import(paths, label="A (changed)")
+
+    assert executed
+    assert journal.unchanged == 0
+
+
+def test_dry_run_does_not_save_fingerprints(paths):
+    run_import(paths, write=False)
+
+    assert not paths[1].exists()
@@ -0,0 +1,181 @@
+""" import arkusza do lokalnej atrapy API Wikibase (wikidariahfake):
+    encje po imporcie, ponowny import pomija wiersze niezmienione
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+pytest.importorskip("wikibaseintegrator")
+openpyxl = pytest.importorskip("openpyxl")
+
+from benchmark_import import BASIC_PROPERTIES, IMPORT_SCRIPT  # noqa: E402
+from wikidariahcache import NEW_ID_START  # noqa: E402
+from wikidariahfake import FakeWikibase  # noqa: E402
+
+
+SHEETS = {
+    "P_list": [
+        ("Label_en", "Label_pl", "Datatype", "Description_en", "Description_pl", "Wiki_id", "Inverse_property"),
+        ("part of", "część", "wikibase-item", "part of something", "część czegoś", None, None),
+        ("title", "tytuł", "monolingualtext", "title of a work", "tytuł dzieła", None, None),
+    ],
+    "P_statements": [
+        ("Label_en", "P", "Value", "Reference_property", "Reference_value"),
+    ],
+    "Q_list": [
+        ("Label_pl", "Label_en", "Instance of", "Description_en", "Description_pl", "Wiki_id"),
+        ("Polska", "Poland", None, "country", "państwo", None),
+        ("Kraków", "Krakow", None, "city", "miasto", None),
+    ],
+    "Q_statements": [
+        ("Label_en", "P", "Value", "Qualifier", "Qualifier_value"),
+        ("Krakow", "part of", "Poland", None, None),
+        ("Krakow", "title", 'pl:"Kraków"', None, None),
+        ("Krakow", "Aen", "Cracow", None, None),
+    ],
+    "Globals": [
+        ("Sheet", "Reference_property", "Reference_value"),
+    ],
+}
+
+# liczba wierszy arkuszy
+ROWS = sum(len(rows) - 1 for rows in SHEETS.values())
+
+
+@pytest.fixture
+def fake():
+    """atrapa Wikibase z właściwościami podstawowymi (jak w benchmarku)"""
+    wikibase = FakeWikibase()
+    for label, datatype in BASIC_PROPERTIES:
+        data = {"labels": {"en": {"language": "en", "value": label}}, "datatype": datatype}
+        wikibase.edit_entity({"new": "property", "data": json.dumps(data)})
+    wikibase.start()
+    yield wikibase
+    wikibase.stop()
+
+
+def save_workbook(path: Path, sheets: dict) -> Path:
+    """zapis arkusza importu"""
+    book = openpyxl.Workbook()
+    book.remove(book.active)
+    for name, rows in sheets.items():
+        sheet = book.create_sheet(name)
+        for row in rows:
+            sheet.append(row)
+    book.save(path)
+
+    return path
+
+
+@pytest.fixture
+def workbook(tmp_path) -> Path:
+    """arkusz importu"""
+    return save_workbook(tmp_path / "test.xlsx", SHEETS)
+
+
+def run_import(fake: FakeWikibase, workbook, tag: str, write: bool = True) -> dict:
+    """import z zapisem do atrapy (osobny proces; write = False - bez zapisu),
+    zwraca podsumowanie raportu
+    """
+    workbooks = workbook if isinstance(workbook, list) else [workbook]
+    work_dir = workbooks[0].parent / "work"
+    work_dir.mkdir(exist_ok=True)
+    report_path = work_dir / f"report_{tag}.json"
+    env = dict(os.environ, WIKIDARIAH_URL=fake.url, WIKIDARIAH_WORKERS="2",
+               PYTHONPATH=os.pathsep.join(x for x in sys.path if x))
+    env.pop("WIKIDARIAH_WRITE", None)
+    if write:
+        env["WIKIDARIAH_WRITE"] = "1"
+    process = subprocess.run(
+        [sys.executable, str(IMPORT_SCRIPT.resolve()), *map(str, workbooks),
+         "--report", str(report_path), "--log", str(work_dir / f"log_{tag}.jsonl"),
+         "--changeset", str(work_dir / f"changeset_{tag}.json")],
+        cwd=work_dir, env=env, capture_output=True, text=True, timeout=300, check=False,
+    )
+    assert process.returncode == 0, process.stdout[-3000:] + process.stderr[-3000:]
+    with open(report_path, "r", encoding="utf-8") as f:
+        return json.load(f)["total"]
+
+
+def entity_by_label(fake: FakeWikibase, label: str) -> dict:
+    """encja atrapy o etykiecie (en)"""
+    found = [x for x in fake.entities.values() if x["labels"].get("en", {}).get("value") == label]
+    assert len(found) == 1, label
+    return found[0]
+
+
+def claim_values(entity: dict, prop_nr: str) -> list:
+    """wartości deklaracji właściwości"""
+    return [claim["mainsnak"]["datavalue"]["value"] for claim in entity["claims"].get(prop_nr, [])]
+
+
+def test_import_and_rerun(fake, workbook):
+    total = run_import(fake, workbook, "first")
+
+    assert total["rows"] == ROWS
+    assert total["done"] == ROWS
+    assert total["errors"] == 0
+    part_of = entity_by_label(fake, "part of")
+    title = entity_by_label(fake, "title")
+    poland = entity_by_label(fake, "Poland")
+    krakow = entity_by_label(fake, "Krakow")
+    assert part_of["datatype"] == "wikibase-item"
+    assert title["datatype"] == "monolingualtext"
+    assert poland["labels"]["pl"]["value"] == "Polska"
+    assert krakow["descriptions"]["pl"]["value"] == "miasto"
+    assert [x["id"] for x in claim_values(krakow, part_of["id"])] == [poland["id"]]
+    assert claim_values(krakow, title["id"]) == [{"text": "Kraków", "language": "pl"}]
+    assert [x["value"] for x in krakow["aliases"]["en"]] == ["Cracow"]
+
+    # ponowny import: wszystkie wiersze niezmienione, bez zapisów
+    entities = json.dumps(fake.entities, sort_keys=True)
+    fake.requests.clear()
+    total = run_import(fake, workbook, "second")
+
+    assert total["unchanged"] == ROWS
+    assert total["done"] == 0
+    assert fake.requests["wbeditentity"] == 0
+    assert "wbsearchentities" not in fake.requests
+    assert json.dumps(fake.entities, sort_keys=True) == entities
+
+    # zmiana elementu poza importem: ponownie tylko wiersze tego elementu,
+    # bez powtórzonych deklaracji
+    fake.edit_entity({"id": krakow["id"], "data": json.dumps(
+        {"labels": {"de": {"language": "de", "value": "Krakau"}}}
+    )})
+    total = run_import(fake, workbook, "third")
+
+    assert 0 < total["done"] < ROWS
+    assert total["unchanged"] == ROWS - total["done"]
+    krakow = entity_by_label(fake, "Krakow")
+    assert len(krakow["claims"][part_of["id"]]) == 1
+    assert len(krakow["claims"][title["id"]]) == 1
+    assert krakow["labels"]["de"]["value"] == "Krakau"
+
+
+def test_dry_run_of_two_workbooks_keeps_snapshot_clean(fake, workbook):
+    # drugi arkusz odwołuje się do elementu utworzonego (na sucho) w pierwszym
+    second = save_workbook(workbook.parent / "second.xlsx", {
+        **SHEETS,
+        "P_list": SHEETS["P_list"][:1],
+        "Q_list": [SHEETS["Q_list"][0], ("Warszawa", "Warsaw", None, "city", "miasto", None)],
+        "Q_statements": [SHEETS["Q_statements"][0], ("Warsaw", "part of", "Poland", None, None)],
+    })
+
+    total = run_import(fake, [workbook, second], "dry", write=False)
+
+    assert total["errors"] == 0
+    assert "wbeditentity" not in fake.requests
+    work_dir = workbook.parent / "work"
+    with open(work_dir / "changeset_dry.json", "r", encoding="utf-8") as f:
+        assert json.load(f)["summary"]["create"] == 5
+    with open(work_dir / "cache" / "snapshot.json", "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    ids = [*snapshot["entities"], *snapshot["property_types"],
+           *(qid for items in snapshot["purls"].values() for qid in items)]
+    assert ids
+    assert not [x for x in ids if int(x[1:]) > NEW_ID_START]
@@ -0,0 +1,132 @@
+""" testy dziennika importu (WDHJournal): wyniki wierszy, wznawianie importu
+    (--resume), wiersze zapisywane zbiorczo (WDHEntityEdit)
+"""
+
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("wikibaseintegrator")
+
+import property_import  # noqa: E402
+from property_import import WDHItem, WDHJournal, WDHTask  # noqa: E402
+from wikibaseintegrator.wbi_config import config as wbi_config  # noqa: E402
+
+
+@pytest.fixture
+def journal_path(tmp_path, monkeypatch):
+    """plik dziennika, czyste słowniki GLOBAL_ITEM i GLOBAL_PROPERTY"""
+    monkeypatch.chdir(tmp_path)
+    property_import.GLOBAL_ITEM.clear()
+    property_import.GLOBAL_PROPERTY.clear()
+    yield tmp_path / "journal.jsonl"
+    property_import.GLOBAL_ITEM.clear()
+    property_import.GLOBAL_PROPERTY.clear()
+
+
+def create_a():
+    """wiersz tworzący element A (wynik w GLOBAL_ITEM)"""
+    property_import.GLOBAL_ITEM["A/"] = "Q1"
+    return True
+
+
+def failing():
+    """wiersz zakończony wyjątkiem"""
+    raise RuntimeError("błąd wiersza")
+
+
+def run_import(journal_path, resume: bool = False) -> tuple:
+    """import arkusza Q_list: wiersz poprawny, taki sam wiersz zakończony
+    niepowodzeniem (False) i wiersz zakończony wyjątkiem; zwraca dziennik
+    i nazwy wierszy wykonanych
+    """
+    rows = [WDHItem("A", "first"), WDHItem("A", "first"), WDHItem("B", "second")]
+    funcs = [create_a, lambda: False, failing]
+    journal = WDHJournal()
+    journal.open(journal_path, write=True)
+    remaining = {id(row) for row in journal.rows("Q_list", rows, resume=resume)}
+    executed = []
+    for i, (row, func) in enumerate(zip(rows, funcs)):
+        if id(row) not in remaining:
+            continue
+        executed.append(i)
+        task = WDHTask(f"ITEM: {row.label_en}", func, f"item|{row.label_en}", row=row)
+        try:
+            journal.run(task)
+        except RuntimeError:
+            pass
+    journal.close()
+
+    return journal, executed
+
+
+def test_results_are_recorded(journal_path):
+    journal, executed = run_import(journal_path)
+
+    assert executed == [0, 1, 2]
+    assert journal.stats == {"done": 1, "error": 2}
+    assert journal_path.is_file()
+    assert WDHJournal().open(journal_path) == 1
+
+
+def test_resume_skips_rows_done_before(journal_path):
+    run_import(journal_path)
+    property_import.GLOBAL_ITEM.clear()
+
+    journal, executed = run_import(journal_path, resume=True)
+
+    # identyczny drugi wiersz jest osobnym wierszem (numer powtórzenia)
+    assert executed == [1, 2]
+    assert journal.skipped == 1
+    # identyfikator elementu z pominiętego wiersza odtworzony z dziennika
+    assert property_import.GLOBAL_ITEM == {"A/": "Q1"}
+
+
+def test_without_resume_all_rows_are_processed(journal_path):
+    run_import(journal_path)
+
+    journal, executed = run_import(journal_path)
+
+    assert executed == [0, 1, 2]
+    assert journal.skipped == 0
+
+
+def test_journal_of_another_wikibase_is_ignored(journal_path, monkeypatch):
+    run_import(journal_path)
+    monkeypatch.setitem(wbi_config, "MEDIAWIKI_API_URL", "http://localhost:1/api.php")
+
+    assert WDHJournal().open(journal_path) == 0
+
+
+def test_dry_run_does_not_write_journal(journal_path):
+    journal = WDHJournal()
+    journal.open(journal_path, write=False)
+    row = WDHItem("A", "first")
+    journal.rows("Q_list", [row])
+    journal.run(WDHTask("ITEM: A", create_a, "item|A", row=row))
+    journal.close()
+
+    assert journal.stats == {"done": 1}
+    assert not journal_path.exists()
+
+
+def test_staged_row_is_recorded_after_entity_write(journal_path):
+    journal = WDHJournal()
+    journal.open(journal_path, write=True)
+    rows = [WDHItem("A", "first"), WDHItem("B", "second")]
+    journal.rows("Q_statements", rows)
+    entity_edit = SimpleNamespace(entity_id="Q1", rows=set())
+
+    def stage():
+        journal.stage(entity_edit)
+        return True
+
+    for row in rows:
+        journal.run(WDHTask(f"ITEM: {row.label_en}", stage, "Q1", row=row))
+    # wiersze czekają na zbiorczy zapis encji
+    assert journal.stats == {}
+    assert len(entity_edit.rows) == 2
+
+    journal.commit(entity_edit.rows, False)
+    journal.close()
+    assert journal.stats == {"error": 2}
+    assert WDHJournal().open(journal_path) == 0
@@ -0,0 +1,46 @@
+""" testy pamięci podręcznej wyszukiwania etykiet (LabelCache): zapis
+    w bazie SQLite, tymczasowe identyfikatory nowych encji tylko w pamięci
+"""
+
+import sqlite3
+import pytest
+
+pytest.importorskip("wikibaseintegrator")
+
+from wikidariahcache import NEW_ID_START, LabelCache, is_new_id  # noqa: E402
+
+
+def key(label: str) -> tuple:
+    """klucz wyszukiwania elementu po etykiecie angielskiej"""
+    return label, "item", "en", None, False, False
+
+
+def stored_values(path) -> list:
+    """wartości zapisane w bazie"""
+    with sqlite3.connect(str(path)) as db:
+        return sorted(row[0] for row in db.execute("SELECT value FROM labels"))
+
+
+def test_is_new_id():
+    assert is_new_id(f"Q{NEW_ID_START + 1}")
+    assert is_new_id(f"P{NEW_ID_START + 12}")
+    assert not is_new_id("Q1")
+    assert not is_new_id("NOT FOUND")
+    assert not is_new_id(None)
+
+
+def test_new_id_is_not_persisted(tmp_path):
+    path = tmp_path / "label_cache.sqlite"
+    cache = LabelCache(path)
+    new_id = f"Q{NEW_ID_START + 1}"
+
+    cache.set(key("A"), (True, "Q1"))
+    cache.set(key("B"), (True, new_id))
+    cache.set(key("C"), (False, "NOT FOUND"))
+
+    # w bieżącym uruchomieniu wynik jest dostępny
+    assert cache.get(key("B")) == (True, new_id)
+    assert stored_values(path) == ["NOT FOUND", "Q1"]
+    # kolejne uruchomienie nie zna encji z importu bez zapisu
+    assert LabelCache(path).get(key("B")) is None
+    assert LabelCache(path).get(key("A")) == (True, "Q1")
@@ -0,0 +1,90 @@
+""" testy planu importu (WDHPlanner): kolejność topologiczna, przerywanie
+    cykli, nierozpoznane odwołania
+"""
+
+import pytest
+
+pytest.importorskip("wikibaseintegrator")
+
+import property_import  # noqa: E402
+from wikidariahcache import set_offline  # noqa: E402
+
+
+@pytest.fixture
+def planner(tmp_path, monkeypatch):
+    """pusty plan, wyszukiwanie nazw tylko w pamięci (bez Wikibase)"""
+    monkeypatch.chdir(tmp_path)
+    set_offline(True)
+    yield property_import.WDHPlanner([], [], [], [])
+    set_offline(False)
+
+
+def add_task(planner, name: str, key: str, refs: list = None, provides: list = None):
+    """zadanie planu bez działania"""
+    task = property_import.WDHTask(name, lambda: True, key, provides=provides)
+    planner.add(task, refs or [])
+
+
+def task_order(planner) -> list:
+    """nazwy zadań w kolejności planu"""
+    deps = planner.dependencies()
+    return [planner.tasks[i].name for i in planner.topological_order(deps)]
+
+
+def test_order_without_dependencies_keeps_sheet_order(planner):
+    for name in ("A", "B", "C"):
+        add_task(planner, name, f"item|{name}", provides=[("item", name)])
+
+    assert task_order(planner) == ["A", "B", "C"]
+    assert not planner.cycles
+    assert not planner.unresolved
+
+
+def test_row_waits_for_entity_created_later(planner):
+    add_task(planner, "A", "item|A", refs=[("item", "B", False, True)], provides=[("item", "A")])
+    add_task(planner, "B", "item|B", provides=[("item", "B")])
+    add_task(planner, "A: statement", "item|A", refs=[("item", "A", False, True)])
+
+    assert task_order(planner) == ["B", "A", "A: statement"]
+    assert not planner.cycles
+
+
+def test_rows_of_the_same_entity_keep_sheet_order(planner):
+    add_task(planner, "A", "item|A", provides=[("item", "A")])
+    add_task(planner, "A: 1", "item|A", refs=[("item", "C", False, True)])
+    add_task(planner, "A: 2", "item|A")
+    add_task(planner, "C", "item|C", provides=[("item", "C")])
+
+    order = task_order(planner)
+    assert order.index("C") < order.index("A: 1") < order.index("A: 2")
+
+
+def test_cycle_is_broken_in_sheet_order(planner):
+    add_task(planner, "A", "item|A", refs=[("item", "B", False, True)], provides=[("item", "A")])
+    add_task(planner, "B", "item|B", refs=[("item", "A", False, True)], provides=[("item", "B")])
+
+    assert task_order(planner) == ["A", "B"]
+    assert planner.cycles == ["A -> B"]
+
+
+def test_soft_reference_does_not_reorder_rows(planner):
+    # właściwość odwrotna dodawana w późniejszym wierszu
+    add_task(planner, "P1", "property|P1", refs=[("property", "P2", False, False)],
+             provides=[("property", "P1")])
+    add_task(planner, "P2", "property|P2", refs=[("property", "P1", False, False)],
+             provides=[("property", "P2")])
+
+    deps = planner.dependencies()
+    assert deps == [set(), {0}]
+    assert [planner.tasks[i].name for i in planner.topological_order(deps)] == ["P1", "P2"]
+    assert not planner.cycles
+
+
+def test_unresolved_references_are_reported(planner):
+    add_task(planner, "A", "item|A", provides=[("item", "A")],
+             refs=[("item", "Q5", False, True), ("item", "somevalue", False, True),
+                   ("item", "A", False, True), ("item", "Nowhere", False, True),
+                   ("property", "missing inverse", False, False)])
+
+    task_order(planner)
+    assert planner.unresolved == ["A -> item: Nowhere"]
@@ -0,0 +1,84 @@
+""" testy ogranicznika tempa zapytań (wikidariahrate): zwalnianie miejsc
+    równoczesnych zapytań przy wyjątkach, ponawianie po przekroczeniu czasu
+"""
+
+import pytest
+import requests
+
+pytest.importorskip("wikibaseintegrator")
+
+import wikidariahrate  # noqa: E402
+from wikidariahrate import RateLimiter  # noqa: E402
+
+
+URL = "http://localhost:1/other"
+
+
+@pytest.fixture(autouse=True)
+def no_pause(monkeypatch):
+    """ponowienia bez przerw, tempo nie spada poniżej maksymalnego"""
+    monkeypatch.setattr(wikidariahrate, "RETRY_AFTER", 0)
+    monkeypatch.setattr(wikidariahrate, "RATE_MIN", wikidariahrate.RATE_MAX)
+    monkeypatch.setattr(wikidariahrate, "MAX_RETRIES", 3)
+
+
+def ok_response() -> requests.Response:
+    """odpowiedź bez sygnałów przeciążenia"""
+    response = requests.Response()
+    response.status_code = 200
+    return response
+
+
+def sender(*errors):
+    """funkcja send zgłaszająca kolejno wyjątki, potem zwracająca odpowiedź"""
+    calls = []
+
+    def send(method, url, **kwargs):
+        calls.append((method, url))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return ok_response()
+
+    return send, calls
+
+
+def test_timeout_is_retried_with_congestion():
+    limiter = RateLimiter()
+    send, calls = sender(requests.exceptions.ReadTimeout("timeout"))
+
+    response = limiter.request(send, "GET", URL)
+
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert limiter.throttled == 1
+    assert limiter._inflight == 0
+
+
+def test_timeout_after_all_retries_releases_slots():
+    limiter = RateLimiter()
+    send, calls = sender(*[requests.exceptions.ReadTimeout("timeout")] * 8)
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        limiter.request(send, "GET", URL)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        limiter.request(send, "GET", URL)
+
+    assert len(calls) == 8
+    assert limiter._inflight == 0
+    # po przeciążeniu limit równoczesnych zapytań to 1 - kolejne zapytanie
+    # nie czeka na miejsce zajęte przez nieudane zapytania
+    assert int(limiter.concurrency) == 1
+    assert limiter.request(send, "GET", URL).status_code == 200
+
+
+def test_other_exception_releases_slot_without_retry():
+    limiter = RateLimiter()
+    send, calls = sender(requests.exceptions.ChunkedEncodingError("broken"))
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        limiter.request(send, "GET", URL)
+
+    assert len(calls) == 1
+    assert limiter.throttled == 0
+    assert limiter._inflight == 0
+    assert limiter.request(send, "GET", URL).status_code == 200